@@ -1,29 +1,162 @@
 import os
-from flask import Flask, request, jsonify
+import json
+import uuid
+from flask import Flask, Response, request, jsonify, stream_with_context
 from flask_cors import CORS
 
-from src.workflows.router_workflow import create_router_graph
+from src.flint import with_tables
+from src.jobs import get_job_store
+from src.jobs.worker import get_job_workers
+from src.llm import get_client_pool, get_response_cache, hedging_stats, single_flight_stats, token_usage
+from src.routing import get_semantic_cache
+from src.serving import prefork, process_stats, readiness, start_job_workers, warm
+from src.telemetry import metrics, tracing
+from src.workflows.registry import get_router_graph
+from src.workflows.regulation_workflow import speculation_stats
+from src.workflows.router_workflow import create_router_state
+from src.workflows.answer import answer
+from src.workflows.sessions import get_session_store
+from src.workflows.streaming import stream_answer
+from src.workflows.batch import answer_batch
 
 app = Flask(__name__)
 CORS(app)
 
+# Compile all workflows and load indexes and caches once at startup, requests reuse them.
+# Under gunicorn this runs in the master and the forked workers share the result
+warm()
+
+# Answer queued jobs in this process unless JOB_WORKERS=0 leaves them to worker processes,
+# pre-forked workers start theirs after the fork
+job_workers = get_job_workers()
+if not prefork():
+    start_job_workers()
+
+# Requests may ask for a per-node trace with "debug": true, only honoured in development
+# or when REQUEST_TRACE_ENABLED=true since traces include timing internals
+trace_enabled = (
+    os.getenv("REQUEST_TRACE_ENABLED", "false").lower() == "true"
+    or os.getenv("ENVIRONMENT", "production") == "development"
+)
+
 @app.route("/answer", methods=["POST"])
 def chat():
-    """Handle chat requests and return responses"""
+    """
+    Handle chat requests and return responses
+    "session": true starts a conversation, follow-ups pass the returned "session_id"
+    """
     data = request.json
     message = data.get("question", "")
+    session_id = data.get("session_id") or (uuid.uuid4().hex if data.get("session") else None)
 
-    workflow = create_router_graph()
-    state = {
-        "message": message,
-        "question_type": None,
-        "response": None,
-        "error": None
-    }
-    result = workflow.invoke(state)
+    debug = trace_enabled and bool(data.get("debug"))
+    if debug:
+        # Traced requests run on their own so the trace only holds their spans
+        with tracing() as trace:
+            if session_id is not None:
+                result = answer(message, session_id)
+            else:
+                result = get_router_graph().invoke(create_router_state(message))
+    else:
+        result = answer(message, session_id)
     result = result["response"] if not result.get("error") else {"error": result["error"]}
+    if data.get("format") == "table":
+        result = with_tables(result)
+
+    body = {"response": result}
+    if session_id is not None:
+        body["session_id"] = session_id
+    if debug:
+        body["trace"] = trace.to_dict()
+    return jsonify(body)
+
+
+@app.route("/answer/batch", methods=["POST"])
+def chat_batch():
+    """Handle a batch of questions and return one result per question, in order"""
+    data = request.json
+    questions = data.get("questions", [])
+    max_questions = int(os.getenv("BATCH_MAX_QUESTIONS", 200))
+    if not isinstance(questions, list) or len(questions) > max_questions:
+        return jsonify({"error": f"questions must be a list of at most {max_questions} items"}), 400
+    concurrency = data.get("concurrency")
+    if concurrency is not None and (type(concurrency) is not int or concurrency < 1):
+        return jsonify({"error": "concurrency must be a positive integer"}), 400
+
+    results = answer_batch([str(question) for question in questions], concurrency)
+    if data.get("format") == "table":
+        results = [
+            {**item, "response": with_tables(item["response"])} if "response" in item else item
+            for item in results
+        ]
+    return jsonify({"responses": results})
+
+
+@app.route("/answer/stream", methods=["POST"])
+def chat_stream():
+    """Handle chat requests and stream progress and answer tokens as Server-Sent Events"""
+    data = request.json
+    message = data.get("question", "")
 
-    return jsonify({"response": result})
+    def events():
+        for event in stream_answer(message):
+            yield f"event: {event['event']}\ndata: {json.dumps(event['data'])}\n\n"
+
+    return Response(
+        stream_with_context(events()),
+        mimetype="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+
+@app.route("/jobs", methods=["POST"])
+def submit_job():
+    """Queue a question and return its job ID at once, the answer is fetched from /jobs/<id>"""
+    data = request.json
+    job = get_job_store().submit(data.get("question", ""))
+    return jsonify({"job_id": job.id, "status": job.status}), 202
+
+
+@app.route("/jobs/<job_id>")
+def get_job(job_id):
+    """Job status and result, with ?wait=<seconds> waiting for the job to finish (long poll)"""
+    store = get_job_store()
+    try:
+        wait = store.parse_wait(request.args.get("wait"))
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    job = store.wait(job_id, wait) if wait > 0 else store.get(job_id)
+    if job is None:
+        return jsonify({"error": "Unknown job"}), 404
+    job = job.to_dict()
+    if job["result"] is not None and request.args.get("format") == "table":
+        job["result"] = with_tables(job["result"])
+    return jsonify(job)
+
+
+@app.route('/stats')
+def stats():
+    """Runtime statistics of the shared LLM client layer"""
+    cache = get_response_cache()
+    semantic_cache = get_semantic_cache()
+    return jsonify({
+        "llm_pool": get_client_pool().stats(),
+        "llm_cache": cache.stats() if cache is not None else None,
+        "speculation": speculation_stats.stats(),
+        "tokens": token_usage.stats(),
+        "single_flight": single_flight_stats(),
+        "hedging": hedging_stats(),
+        "semantic_cache": semantic_cache.stats() if semantic_cache is not None else None,
+        "jobs": {**get_job_store().stats(), **job_workers.stats()},
+        "sessions": get_session_store().stats(),
+        "process": {**process_stats(), "warmup_seconds": readiness.warmup_seconds},
+    })
+
+
+@app.route('/metrics')
+def prometheus_metrics():
+    """Node and LLM call latency, token and error metrics in the Prometheus text format"""
+    return Response(metrics.render(), mimetype="text/plain; version=0.0.4")
 
 
 @app.route('/health')
@@ -31,6 +164,12 @@ def health_check():
     """Health check endpoint"""
     return "OK", 200
 
+
+@app.route('/ready')
+def ready_check():
+    """Readiness endpoint, 503 until this worker has warmed up and can take traffic"""
+    return jsonify(readiness.to_dict()), 200 if readiness.ready else 503
+
 if __name__ == "__main__":
     # Determine environment and set debug mode accordingly
     environment = os.getenv('ENVIRONMENT', 'production')
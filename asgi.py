@@ -0,0 +1,98 @@
+"""
+ASGI entry point serving the workflows through the async execution path.
+
+Every request awaits the shared router graph with ainvoke, so a single process
+keeps hundreds of questions in flight while waiting on OpenAI instead of
+blocking one thread per question.
+
+Run with:
+    uvicorn asgi:app --host 0.0.0.0 --port 8000
+"""
+
+import uuid
+
+from starlette.applications import Starlette
+from starlette.middleware import Middleware
+from starlette.middleware.cors import CORSMiddleware
+from starlette.requests import Request
+from starlette.responses import JSONResponse, PlainTextResponse
+from starlette.routing import Route
+
+from src.flint import with_tables
+from src.jobs import get_job_store
+from src.serving import readiness, start_job_workers, warm
+from src.telemetry import metrics
+from src.workflows.answer import aanswer
+
+
+async def chat(request: Request) -> JSONResponse:
+    """
+    Handle chat requests and return responses
+    "session": true starts a conversation, follow-ups pass the returned "session_id"
+    """
+    data = await request.json()
+    message = data.get("question", "")
+    session_id = data.get("session_id") or (uuid.uuid4().hex if data.get("session") else None)
+
+    result = await aanswer(message, session_id)
+    result = result["response"] if not result.get("error") else {"error": result["error"]}
+    if data.get("format") == "table":
+        result = with_tables(result)
+
+    if session_id is not None:
+        return JSONResponse({"response": result, "session_id": session_id})
+    return JSONResponse({"response": result})
+
+
+async def submit_job(request: Request) -> JSONResponse:
+    """Queue a question and return its job ID at once, the answer is fetched from /jobs/{job_id}"""
+    data = await request.json()
+    job = get_job_store().submit(data.get("question", ""))
+    return JSONResponse({"job_id": job.id, "status": job.status}, status_code=202)
+
+
+async def get_job(request: Request) -> JSONResponse:
+    """Job status and result, with ?wait=<seconds> waiting for the job to finish (long poll)"""
+    store = get_job_store()
+    try:
+        wait = store.parse_wait(request.query_params.get("wait"))
+    except ValueError as e:
+        return JSONResponse({"error": str(e)}, status_code=400)
+    job_id = request.path_params["job_id"]
+    job = await store.await_job(job_id, wait) if wait > 0 else store.get(job_id)
+    if job is None:
+        return JSONResponse({"error": "Unknown job"}, status_code=404)
+    job = job.to_dict()
+    if job["result"] is not None and request.query_params.get("format") == "table":
+        job["result"] = with_tables(job["result"])
+    return JSONResponse(job)
+
+
+async def prometheus_metrics(request: Request) -> PlainTextResponse:
+    """Node and LLM call latency, token and error metrics in the Prometheus text format"""
+    return PlainTextResponse(metrics.render(), media_type="text/plain; version=0.0.4")
+
+
+async def health_check(request: Request) -> PlainTextResponse:
+    """Health check endpoint"""
+    return PlainTextResponse("OK")
+
+
+async def ready_check(request: Request) -> JSONResponse:
+    """Readiness endpoint, 503 until this process has warmed up and can take traffic"""
+    return JSONResponse(readiness.to_dict(), status_code=200 if readiness.ready else 503)
+
+
+app = Starlette(
+    routes=[
+        Route("/answer", chat, methods=["POST"]),
+        Route("/jobs", submit_job, methods=["POST"]),
+        Route("/jobs/{job_id}", get_job),
+        Route("/metrics", prometheus_metrics),
+        Route("/health", health_check),
+        Route("/ready", ready_check),
+    ],
+    middleware=[Middleware(CORSMiddleware, allow_origins=["*"], allow_methods=["*"], allow_headers=["*"])],
+    # Compile all workflows and load indexes and caches once at startup, requests reuse them
+    on_startup=[warm, start_job_workers],
+)
@@ -0,0 +1,149 @@
+"""
+Cold start time and per-worker memory of the pre-forked gunicorn server.
+
+Measures how long a fresh interpreter takes to import the app (which warms it
+up), then starts gunicorn with --workers N, once with the app preloaded in the
+master and once imported by every worker, and reports for each:
+- seconds from launch until every worker answers /ready with 200
+- RSS, PSS and private memory of the master and each worker from
+  /proc/<pid>/smaps_rollup (Linux only); with preloading most of a worker's
+  RSS is shared with the master, which its PSS and private memory show
+- a /answer round trip through one worker
+
+--stub points every process at the local stub server so nothing reaches OpenAI.
+
+Usage:
+    python -m benchmarks.cold_start --output cold_start.json [--workers 4] [--stub]
+"""
+
+import argparse
+import json
+import os
+import socket
+import subprocess
+import sys
+import time
+from pathlib import Path
+import httpx
+
+from .stub_server import StubServer
+
+ROOT = Path(__file__).resolve().parent.parent
+
+
+def free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def memory(pid: int) -> dict:
+    """RSS, PSS and private memory of a process in KB"""
+    stats = {"pid": pid, "rss_kb": 0, "pss_kb": 0, "private_kb": 0}
+    with open(f"/proc/{pid}/smaps_rollup", encoding="utf-8") as f:
+        for line in f:
+            name, _, value = line.partition(":")
+            if name == "Rss":
+                stats["rss_kb"] = int(value.split()[0])
+            elif name == "Pss":
+                stats["pss_kb"] = int(value.split()[0])
+            elif name in ("Private_Clean", "Private_Dirty"):
+                stats["private_kb"] += int(value.split()[0])
+    return stats
+
+
+def children(pid: int) -> list[int]:
+    with open(f"/proc/{pid}/task/{pid}/children", encoding="utf-8") as f:
+        return [int(child) for child in f.read().split()]
+
+
+def import_time(env: dict) -> float:
+    """Seconds a fresh interpreter needs to import and warm up the app"""
+    code = "import time; start = time.perf_counter(); import app; print(time.perf_counter() - start)"
+    result = subprocess.run(
+        [sys.executable, "-c", code], cwd=ROOT, env=env, capture_output=True, text=True, check=True
+    )
+    return float(result.stdout.strip().splitlines()[-1])
+
+
+def serve(workers: int, preload: bool, env: dict, timeout: float = 120) -> dict:
+    """Starts gunicorn, waits for every worker to be ready and measures it"""
+    port = free_port()
+    env = {**env, "SERVER_HOST": "127.0.0.1", "SERVER_PORT": str(port), "SERVER_WORKERS": str(workers),
+           "SERVER_PRELOAD": "true" if preload else "false"}
+    start = time.perf_counter()
+    process = subprocess.Popen(
+        [sys.executable, "-m", "gunicorn", "app:app"], cwd=ROOT, env=env,
+        stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+    )
+    url = f"http://127.0.0.1:{port}"
+    ready_pids: set[int] = set()
+    try:
+        with httpx.Client(timeout=5) as client:
+            # New connections are spread over the workers, keep asking until each one answered ready
+            while len(ready_pids) < workers:
+                if time.perf_counter() - start > timeout:
+                    raise TimeoutError(f"{len(ready_pids)} of {workers} workers ready after {timeout}s")
+                try:
+                    response = client.get(f"{url}/ready", headers={"Connection": "close"})
+                    if response.status_code == 200:
+                        ready_pids.add(response.json()["pid"])
+                except httpx.TransportError:
+                    time.sleep(0.05)
+            ready = time.perf_counter() - start
+            answer_start = time.perf_counter()
+            answered = client.post(f"{url}/answer", json={"question": "How to improve business efficiency?"}, timeout=60)
+            answer_ms = (time.perf_counter() - answer_start) * 1000
+        report = {
+            "preload": preload,
+            "workers": workers,
+            "ready_seconds": round(ready, 3),
+            "first_answer_ms": round(answer_ms, 1),
+            "first_answer_status": answered.status_code,
+            "master": memory(process.pid),
+            "worker_memory": [memory(pid) for pid in children(process.pid)],
+        }
+        worker_memory = report["worker_memory"]
+        for key in ("rss_kb", "pss_kb", "private_kb"):
+            report[f"worker_mean_{key}"] = round(sum(m[key] for m in worker_memory) / max(len(worker_memory), 1))
+        report["total_pss_kb"] = report["master"]["pss_kb"] + sum(m["pss_kb"] for m in worker_memory)
+        return report
+    finally:
+        process.terminate()
+        process.wait(30)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Cold start time and per-worker memory of the gunicorn server")
+    parser.add_argument("--output", default="cold_start.json")
+    parser.add_argument("--workers", type=int, default=4)
+    parser.add_argument("--stub", action="store_true", help="Run against the local stub server")
+    args = parser.parse_args()
+
+    stub = None
+    env = dict(os.environ)
+    if args.stub:
+        stub = StubServer().start()
+        stub.config.latency, stub.config.tokens_per_second = 0.05, 0
+        env["OPENAI_BASE_URL"] = stub.base_url
+        env.setdefault("OPENAI_API_KEY", "stub")
+    try:
+        report = {"import_seconds": round(import_time(env), 3)}
+        for preload in (True, False):
+            result = serve(args.workers, preload, env)
+            report["preload" if preload else "no_preload"] = result
+            print(
+                f"{'preload' if preload else 'no preload'}: {args.workers} workers ready in "
+                f"{result['ready_seconds']}s, worker RSS {result['worker_mean_rss_kb'] // 1024} MB, "
+                f"PSS {result['worker_mean_pss_kb'] // 1024} MB, private {result['worker_mean_private_kb'] // 1024} MB, "
+                f"total PSS {result['total_pss_kb'] // 1024} MB"
+            )
+    finally:
+        if stub is not None:
+            stub.shutdown()
+    print(f"Import and warm-up in a fresh interpreter: {report['import_seconds']}s")
+    Path(args.output).write_text(json.dumps(report, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,133 @@
+"""
+Compares the fused pipeline (one call for classification and actor
+identification) with the serial one (a router call, then an actor call).
+
+Every question is classified both ways against the same retrieved regulation.
+The report gives the agreement on the category, on the actor verdict, and on
+the resulting route (general answer, FLINT formatting or "no actors"), taking
+the serial pipeline as the reference, together with the LLM calls and latency
+each pipeline spent. Runs against whatever OPENAI_BASE_URL points to; --stub
+starts the local stub server for a dry run.
+
+Usage:
+    python -m benchmarks.fused_accuracy --output fused_accuracy.json [--questions my_questions.txt] [--stub]
+"""
+
+import argparse
+import json
+import os
+import time
+from pathlib import Path
+
+# Every question must reach the API, the local classifier and caches would hide differences
+os.environ["LLM_CACHE_ENABLED"] = "false"
+os.environ["LLM_SINGLE_FLIGHT"] = "false"
+os.environ["ROUTER_CONFIDENCE_THRESHOLD"] = "2"
+os.environ["ROUTER_LABEL_LOG"] = ""
+
+from .load_test import percentiles
+from .stub_server import StubServer
+
+CORPORA = Path(__file__).resolve().parent / "corpora"
+
+
+def route(category: str, actor_analysis: str | None) -> str:
+    if category != "REGULATION_QUESTION":
+        return "general"
+    return "format" if actor_analysis == "Yes" else "no_actors"
+
+
+def compare(questions: list[str]) -> dict:
+    """Classifies every question with both pipelines and scores the fused one against the serial one"""
+    from src.agents import ActorIdentificationAgent, RegulationAgent, RouterAgent, TriageAgent
+
+    router, actor_agent, triage = RouterAgent(), ActorIdentificationAgent(), TriageAgent()
+    regulation_agent = RegulationAgent()
+    rows, serial_latency, fused_latency = [], [], []
+    serial_calls = fused_calls = 0
+
+    for question in questions:
+        regulation = regulation_agent.analyze_regulation(question)
+
+        start = time.perf_counter()
+        category = router.classify_question(question)["type"]
+        serial_calls += 1
+        verdict = None
+        if category == "REGULATION_QUESTION":
+            verdict = "Yes" if actor_agent.identify(regulation).strip() == "Yes" else "No"
+            serial_calls += 1
+        serial_latency.append(time.perf_counter() - start)
+
+        start = time.perf_counter()
+        fused = triage.triage(question, regulation)
+        fused_calls += 1
+        fused_latency.append(time.perf_counter() - start)
+
+        rows.append({
+            "question": question,
+            "serial": {"category": category, "actor_analysis": verdict, "route": route(category, verdict)},
+            "fused": {
+                "category": fused["type"],
+                "actor_analysis": fused["actor_analysis"],
+                "route": route(fused["type"], fused["actor_analysis"]),
+            },
+        })
+
+    both_regulation = [
+        row for row in rows
+        if row["serial"]["category"] == row["fused"]["category"] == "REGULATION_QUESTION"
+    ]
+    return {
+        "questions": len(rows),
+        "category_agreement": _share(rows, lambda row: row["serial"]["category"] == row["fused"]["category"]),
+        "actor_agreement": _share(
+            both_regulation, lambda row: row["serial"]["actor_analysis"] == row["fused"]["actor_analysis"]
+        ),
+        "route_agreement": _share(rows, lambda row: row["serial"]["route"] == row["fused"]["route"]),
+        "serial": {"llm_calls": serial_calls, "latency": percentiles(serial_latency)},
+        "fused": {"llm_calls": fused_calls, "latency": percentiles(fused_latency)},
+        "disagreements": [row for row in rows if row["serial"]["route"] != row["fused"]["route"]],
+    }
+
+
+def _share(rows: list, predicate) -> float | None:
+    return sum(1 for row in rows if predicate(row)) / len(rows) if rows else None
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Accuracy of the fused pipeline against the serial one")
+    parser.add_argument("--output", default="fused_accuracy.json")
+    parser.add_argument("--questions", help="File with one question per line (default: the benchmark corpora)")
+    parser.add_argument("--stub", action="store_true", help="Run against the local stub server")
+    args = parser.parse_args()
+
+    if args.questions:
+        questions = Path(args.questions).read_text().splitlines()
+    else:
+        questions = (CORPORA / "regulation.txt").read_text().splitlines() + (CORPORA / "general.txt").read_text().splitlines()
+    questions = [question.strip() for question in questions if question.strip()]
+
+    stub = None
+    if args.stub:
+        stub = StubServer().start()
+        stub.config.latency, stub.config.tokens_per_second = 0.05, 0
+        os.environ["OPENAI_BASE_URL"] = stub.base_url
+        os.environ.setdefault("OPENAI_API_KEY", "benchmark")
+    try:
+        report = compare(questions)
+    finally:
+        if stub is not None:
+            stub.shutdown()
+
+    Path(args.output).write_text(json.dumps(report, indent=2))
+    print(f"category agreement: {report['category_agreement']:.1%}")
+    if report["actor_agreement"] is not None:
+        print(f"actor agreement:    {report['actor_agreement']:.1%}")
+    print(f"route agreement:    {report['route_agreement']:.1%}")
+    print(f"LLM calls:          serial {report['serial']['llm_calls']}, fused {report['fused']['llm_calls']}")
+    print(f"p50 latency (ms):   serial {report['serial']['latency']['p50_ms']:.0f}, fused {report['fused']['latency']['p50_ms']:.0f}")
+    print(f"Results written to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,93 @@
+"""
+Concurrent load test comparing the sync (Flask) and async (ASGI) servers.
+
+Start both servers against the same OpenAI endpoint, then run e.g.:
+    python -m flask run --port 5000 --with-threads
+    uvicorn asgi:app --port 8000
+    python -m benchmarks.load_test --target sync=http://localhost:5000 \
+        --target async=http://localhost:8000 --requests 400 --concurrency 200
+"""
+
+import argparse
+import asyncio
+import statistics
+import time
+import httpx
+
+QUESTIONS = [
+    "What are the recordkeeping requirements under 40 CFR 721.80?",
+    "Who has to apply for a barber shop license under ORC 4709.09?",
+    "How to improve business efficiency?",
+    "What are the reporting deadlines for significant new uses?",
+]
+
+
+def percentiles(latencies: list[float]) -> dict:
+    """Latency percentiles in milliseconds, latencies in seconds"""
+    latencies = sorted(latencies)
+    pct = lambda p: latencies[min(len(latencies) - 1, int(p * len(latencies)))] * 1000 if latencies else 0.0
+    return {
+        "p50_ms": pct(0.50),
+        "p95_ms": pct(0.95),
+        "p99_ms": pct(0.99),
+        "mean_ms": statistics.mean(latencies) * 1000 if latencies else 0.0,
+    }
+
+
+def summarize(latencies: list[float], elapsed: float, errors: int) -> dict:
+    """Throughput, latency percentiles and errors of a run"""
+    return {
+        "requests_per_second": len(latencies) / elapsed if elapsed else 0.0,
+        **percentiles(latencies),
+        "errors": errors,
+    }
+
+
+async def run_target(
+    url: str,
+    requests: int,
+    concurrency: int,
+    timeout: float,
+    questions: list[str] | None = None,
+) -> dict:
+    """Sends requests to one server with bounded concurrency and collects latencies"""
+    questions = questions or QUESTIONS
+    latencies, errors = [], 0
+    semaphore = asyncio.Semaphore(concurrency)
+    limits = httpx.Limits(max_connections=concurrency, max_keepalive_connections=concurrency)
+
+    async with httpx.AsyncClient(base_url=url, limits=limits, timeout=timeout) as client:
+        async def one(i: int) -> None:
+            nonlocal errors
+            async with semaphore:
+                start = time.perf_counter()
+                try:
+                    response = await client.post("/answer", json={"question": questions[i % len(questions)]})
+                    response.raise_for_status()
+                    latencies.append(time.perf_counter() - start)
+                except httpx.HTTPError:
+                    errors += 1
+
+        start = time.perf_counter()
+        await asyncio.gather(*(one(i) for i in range(requests)))
+        elapsed = time.perf_counter() - start
+
+    return summarize(latencies, elapsed, errors)
+
+
+async def main():
+    parser = argparse.ArgumentParser(description="Compare sync and async /answer throughput")
+    parser.add_argument("--target", action="append", required=True, help="name=url, repeatable")
+    parser.add_argument("--requests", type=int, default=400)
+    parser.add_argument("--concurrency", type=int, default=200)
+    parser.add_argument("--timeout", type=float, default=300)
+    args = parser.parse_args()
+
+    for target in args.target:
+        name, url = target.split("=", 1)
+        report = await run_target(url, args.requests, args.concurrency, args.timeout)
+        print(f"{name:8s} " + "  ".join(f"{key}={value:.1f}" for key, value in report.items()))
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
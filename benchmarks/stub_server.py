@@ -0,0 +1,246 @@
+"""
+Local OpenAI-compatible chat completions server for benchmarks.
+
+Answers /v1/chat/completions with canned content shaped like the real agents'
+answers (router labels, the actor verdict, FLINT frames, general answers), so
+the workflows run end to end without spending money. Latency, generation speed
+and error rate are configurable to model different provider conditions.
+
+Usage:
+    python -m benchmarks.stub_server --port 8765 --latency 0.3 --tokens-per-second 80 --error-rate 0.01
+    OPENAI_BASE_URL=http://127.0.0.1:8765/v1 OPENAI_API_KEY=stub python app.py
+"""
+
+import argparse
+import json
+import random
+import re
+import threading
+import time
+from collections import deque
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+# Questions mentioning these are labelled REGULATION_QUESTION by the stub router
+REGULATION_HINTS = re.compile(r"\b(cfr|orc|regulat\w*|complian\w*|licen[cs]\w*|section|permit\w*|statut\w*|rule)\b", re.I)
+NUMBERED = re.compile(r"^\d+\.\s+(.*)$", re.M)
+
+
+class StubConfig:
+    """
+    Behaviour of the stub, may be changed while the server runs
+    - latency: Seconds before the first token
+    - tokens_per_second: Generation speed after the first token (0 for instant)
+    - error_rate: Fraction of requests answered with a 500 error
+    - completion_tokens: Length of FLINT and general answers
+    - rpm_limit: Requests per minute before answering 429, advertised in
+      x-ratelimit-* headers like the real API (0 for no limit)
+    """
+
+    def __init__(self, latency: float = 0.3, tokens_per_second: float = 80, error_rate: float = 0.0, completion_tokens: int = 300, seed: int | None = None, rpm_limit: int = 0):
+        self.latency = latency
+        self.tokens_per_second = tokens_per_second
+        self.error_rate = error_rate
+        self.completion_tokens = completion_tokens
+        self.rpm_limit = rpm_limit
+        self.random = random.Random(seed)
+        self.requests = 0
+        self.errors = 0
+        self.rate_limited = 0
+        self._window = deque()
+        self._lock = threading.Lock()
+
+    def admit(self) -> tuple[bool, dict]:
+        """Applies the requests-per-minute limit, returns whether the request is admitted and its rate-limit headers"""
+        if not self.rpm_limit:
+            return True, {}
+        now = time.monotonic()
+        with self._lock:
+            while self._window and self._window[0] <= now - 60:
+                self._window.popleft()
+            admitted = len(self._window) < self.rpm_limit
+            if admitted:
+                self._window.append(now)
+            else:
+                self.rate_limited += 1
+            reset = self._window[0] + 60 - now if self._window else 0
+            headers = {
+                "x-ratelimit-limit-requests": str(self.rpm_limit),
+                "x-ratelimit-remaining-requests": str(self.rpm_limit - len(self._window)),
+                "x-ratelimit-reset-requests": f"{reset:.3f}s",
+            }
+        return admitted, headers
+
+    def fail(self) -> bool:
+        """Counts a request and decides whether it fails"""
+        with self._lock:
+            self.requests += 1
+            failed = self.random.random() < self.error_rate
+            if failed:
+                self.errors += 1
+            return failed
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {"requests": self.requests, "errors": self.errors, "rate_limited": self.rate_limited}
+
+
+def answer(body: dict, config: StubConfig) -> list[str]:
+    """Returns the answer tokens for a chat completion request"""
+    system = next((m["content"] for m in body["messages"] if m["role"] == "system"), "")
+    user = body["messages"][-1]["content"]
+
+    if body.get("response_format", {}).get("json_schema", {}).get("name") == "triage":
+        question = user.split("\n", 1)[0]
+        category = "REGULATION_QUESTION" if REGULATION_HINTS.search(question) else "OTHER"
+        return [json.dumps({"category": category, "has_actor": True})]
+    if "follow-up question" in system:
+        # Follow-ups in a session stay with the regulation under discussion
+        return ["SAME\n"] + ["answer "] * config.completion_tokens
+    if "Classify the question" in system:
+        questions = NUMBERED.findall(user) or [user]
+        labels = ["REGULATION_QUESTION" if REGULATION_HINTS.search(q) else "OTHER" for q in questions]
+        return [json.dumps(labels)] if user.startswith("Questions:") else labels[:1]
+    if "analysing legal regulations" in system:
+        return ["Yes"]
+    if body.get("response_format"):
+        act = {
+            "act": "Apply for a license", "action": "apply", "actor": "Applicant", "object": "License",
+            "recipient": "Board", "precondition": "Fee paid", "creating_postcondition": "License issued",
+            "terminating_postcondition": "Non-compliance", "sources": "stub",
+        }
+        frames = {"acts": [act], "facts": [{"function": "has paid the fee", "sources": "stub"}], "duties": []}
+        # Pad to roughly the configured length so generation time is comparable to text mode
+        return [json.dumps(frames)] + [" "] * max(0, config.completion_tokens // 2 - 60)
+    word = "frame" if "FLINT" in system else "answer"
+    return [f"{word} "] * config.completion_tokens
+
+
+class StubHandler(BaseHTTPRequestHandler):
+    """Handles chat completion requests according to the server's StubConfig"""
+
+    protocol_version = "HTTP/1.1"
+    rate_headers: dict = {}
+
+    def log_message(self, *args):
+        pass
+
+    def do_POST(self):
+        config: StubConfig = self.server.config
+        body = json.loads(self.rfile.read(int(self.headers.get("content-length", 0))))
+        admitted, self.rate_headers = config.admit()
+        if not admitted:
+            self._json(429, {"error": {"message": "stub rate limit", "type": "requests"}})
+            return
+        if config.fail():
+            self._json(500, {"error": {"message": "stub failure", "type": "server_error"}})
+            return
+
+        tokens = answer(body, config)
+        finish_reason = "stop"
+        if body.get("max_tokens") and len(tokens) > body["max_tokens"]:
+            tokens, finish_reason = tokens[:body["max_tokens"]], "length"
+        time.sleep(config.latency)
+        prompt_tokens = sum(len(m["content"]) for m in body["messages"]) // 4
+        if body.get("stream"):
+            self._stream(tokens, config, finish_reason)
+            return
+        if config.tokens_per_second:
+            time.sleep(len(tokens) / config.tokens_per_second)
+        self._json(200, {
+            "id": "stub",
+            "object": "chat.completion",
+            "created": int(time.time()),
+            "model": body.get("model", "stub"),
+            "choices": [{"index": 0, "message": {"role": "assistant", "content": "".join(tokens)}, "finish_reason": finish_reason}],
+            "usage": {"prompt_tokens": prompt_tokens, "completion_tokens": len(tokens), "total_tokens": prompt_tokens + len(tokens)},
+        })
+
+    def _stream(self, tokens: list[str], config: StubConfig, finish_reason: str) -> None:
+        self.send_response(200)
+        self.send_header("content-type", "text/event-stream")
+        self.send_header("transfer-encoding", "chunked")
+        self._rate_headers()
+        self.end_headers()
+        delay = 1 / config.tokens_per_second if config.tokens_per_second else 0
+        for token in tokens:
+            chunk = {
+                "id": "stub",
+                "object": "chat.completion.chunk",
+                "created": int(time.time()),
+                "model": "stub",
+                "choices": [{"index": 0, "delta": {"content": token}, "finish_reason": None}],
+            }
+            self._chunk(f"data: {json.dumps(chunk)}\n\n")
+            time.sleep(delay)
+        chunk = {
+            "id": "stub",
+            "object": "chat.completion.chunk",
+            "created": int(time.time()),
+            "model": "stub",
+            "choices": [{"index": 0, "delta": {}, "finish_reason": finish_reason}],
+        }
+        self._chunk(f"data: {json.dumps(chunk)}\n\n")
+        self._chunk("data: [DONE]\n\n")
+        self._chunk("")
+
+    def _rate_headers(self) -> None:
+        for name, value in self.rate_headers.items():
+            self.send_header(name, value)
+
+    def _chunk(self, data: str) -> None:
+        payload = data.encode("utf-8")
+        self.wfile.write(f"{len(payload):x}\r\n".encode() + payload + b"\r\n")
+        self.wfile.flush()
+
+    def _json(self, status: int, payload: dict) -> None:
+        data = json.dumps(payload).encode("utf-8")
+        self.send_response(status)
+        self.send_header("content-type", "application/json")
+        self.send_header("content-length", str(len(data)))
+        self._rate_headers()
+        self.end_headers()
+        self.wfile.write(data)
+
+
+class StubServer(ThreadingHTTPServer):
+    """Threaded stub server, one thread per connection"""
+
+    daemon_threads = True
+    # The default backlog of 5 would turn benchmark concurrency into connection errors
+    request_queue_size = 1024
+
+    def __init__(self, host: str = "127.0.0.1", port: int = 0, config: StubConfig | None = None):
+        super().__init__((host, port), StubHandler)
+        self.config = config or StubConfig()
+
+    @property
+    def base_url(self) -> str:
+        host, port = self.server_address[:2]
+        return f"http://{host}:{port}/v1"
+
+    def start(self) -> "StubServer":
+        """Serves in a background thread"""
+        threading.Thread(target=self.serve_forever, daemon=True).start()
+        return self
+
+
+def main():
+    parser = argparse.ArgumentParser(description="OpenAI-compatible stub server for benchmarks")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--latency", type=float, default=0.3, help="Seconds before the first token")
+    parser.add_argument("--tokens-per-second", type=float, default=80, help="Generation speed, 0 for instant")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="Fraction of requests failing with a 500")
+    parser.add_argument("--completion-tokens", type=int, default=300, help="Length of FLINT and general answers")
+    parser.add_argument("--seed", type=int)
+    parser.add_argument("--rpm-limit", type=int, default=0, help="Requests per minute before answering 429, 0 for no limit")
+    args = parser.parse_args()
+
+    config = StubConfig(args.latency, args.tokens_per_second, args.error_rate, args.completion_tokens, args.seed, args.rpm_limit)
+    server = StubServer(args.host, args.port, config)
+    print(f"Stub OpenAI server on {server.base_url}")
+    server.serve_forever()
+
+
+if __name__ == "__main__":
+    main()
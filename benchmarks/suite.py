@@ -0,0 +1,259 @@
+"""
+Benchmark suite running the servers against the local stub LLM server.
+
+Scenarios:
+- cold_start: Time from process start until /health answers and until the first /answer completes
+- overhead: Per-request latency with an instant stub, i.e. everything except the LLM
+- concurrency: Throughput and latency percentiles for each concurrency level
+- streaming: Time to the first event and the first answer token of /answer/stream
+
+Questions are drawn from benchmarks/corpora with a fixed seed, so runs with the
+same arguments send the same questions and can be compared across releases.
+Results are written as JSON.
+
+Usage:
+    python -m benchmarks.suite --output results.json --server flask \
+        --latency 0.3 --tokens-per-second 80 --concurrency 1,8,32 --requests 200
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import platform
+import random
+import socket
+import subprocess
+import sys
+import time
+from pathlib import Path
+import httpx
+from .load_test import percentiles, run_target, summarize
+from .stub_server import StubConfig, StubServer
+
+ROOT = Path(__file__).resolve().parent.parent
+CORPORA = Path(__file__).resolve().parent / "corpora"
+SCENARIOS = ("cold_start", "overhead", "concurrency", "streaming")
+
+
+def load_questions(count: int, regulation_share: float, seed: int) -> list[str]:
+    """
+    Draws a replayable question mix from the corpora
+    Args:
+        count: Number of questions
+        regulation_share: Fraction of regulation questions, the rest are general
+        seed: Random seed, the same seed gives the same sequence
+    """
+    regulation = (CORPORA / "regulation.txt").read_text().splitlines()
+    general = (CORPORA / "general.txt").read_text().splitlines()
+    rng = random.Random(seed)
+    return [rng.choice(regulation if rng.random() < regulation_share else general) for _ in range(count)]
+
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+class ServerProcess:
+    """The Flask or ASGI server running in a subprocess, pointed at the stub"""
+
+    def __init__(self, kind: str, stub: StubServer, env: dict | None = None):
+        self.kind = kind
+        self.port = free_port()
+        self.url = f"http://127.0.0.1:{self.port}"
+        self.env = {
+            **os.environ,
+            "OPENAI_BASE_URL": stub.base_url,
+            "OPENAI_API_KEY": "benchmark",
+            "LLM_CACHE_ENABLED": "false",
+            "ROUTER_LABEL_LOG": "",
+            "SERVER_HOST": "127.0.0.1",
+            "SERVER_PORT": str(self.port),
+            **(env or {}),
+        }
+        self.process: subprocess.Popen | None = None
+
+    def start(self) -> float:
+        """Starts the server and returns the seconds until /health answers"""
+        if self.kind == "asgi":
+            command = [sys.executable, "-m", "uvicorn", "asgi:app", "--port", str(self.port), "--log-level", "warning"]
+        else:
+            command = [sys.executable, "app.py"]
+        start = time.perf_counter()
+        self.process = subprocess.Popen(
+            command, cwd=ROOT, env=self.env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL
+        )
+        while True:
+            if self.process.poll() is not None:
+                raise RuntimeError(f"{self.kind} server exited with code {self.process.returncode}")
+            try:
+                if httpx.get(f"{self.url}/health", timeout=1).status_code == 200:
+                    return time.perf_counter() - start
+            except httpx.HTTPError:
+                pass
+            time.sleep(0.02)
+
+    def stop(self) -> None:
+        if self.process is not None:
+            self.process.terminate()
+            self.process.wait(timeout=10)
+            self.process = None
+
+
+def cold_start(args, stub: StubServer, questions: list[str]) -> dict:
+    """Starts fresh server processes and times readiness and the first answer"""
+    ready, first_answer = [], []
+    for n in range(args.cold_starts):
+        server = ServerProcess(args.server, stub)
+        try:
+            ready.append(server.start())
+            start = time.perf_counter()
+            httpx.post(f"{server.url}/answer", json={"question": questions[n % len(questions)]}, timeout=args.timeout)
+            first_answer.append(ready[-1] + time.perf_counter() - start)
+        finally:
+            server.stop()
+    return {
+        "runs": args.cold_starts,
+        "ready": percentiles(ready),
+        "first_answer": percentiles(first_answer),
+    }
+
+
+def overhead(args, stub: StubServer, url: str, questions: list[str]) -> dict:
+    """Sequential requests against an instant stub, the remaining latency is our own"""
+    latency, tokens_per_second = stub.config.latency, stub.config.tokens_per_second
+    stub.config.latency, stub.config.tokens_per_second = 0.0, 0.0
+    try:
+        requests_before = stub.config.stats()["requests"]
+        latencies, errors = [], 0
+        start = time.perf_counter()
+        with httpx.Client(base_url=url, timeout=args.timeout) as client:
+            for question in questions[: args.overhead_requests]:
+                request_start = time.perf_counter()
+                try:
+                    client.post("/answer", json={"question": question}).raise_for_status()
+                    latencies.append(time.perf_counter() - request_start)
+                except httpx.HTTPError:
+                    errors += 1
+        report = summarize(latencies, time.perf_counter() - start, errors)
+        report["llm_calls_per_request"] = (stub.config.stats()["requests"] - requests_before) / max(1, args.overhead_requests)
+        return report
+    finally:
+        stub.config.latency, stub.config.tokens_per_second = latency, tokens_per_second
+
+
+def concurrency_sweep(args, url: str, questions: list[str]) -> list[dict]:
+    """Runs the load test once per concurrency level"""
+    results = []
+    for level in args.concurrency:
+        report = asyncio.run(run_target(url, args.requests, level, args.timeout, questions))
+        results.append({"concurrency": level, **report})
+        print(f"  concurrency {level:4d}: {report['requests_per_second']:.1f} rps, p95 {report['p95_ms']:.0f} ms")
+    return results
+
+
+async def streaming(args, url: str, questions: list[str]) -> dict:
+    """Times the first event and the first answer token of /answer/stream"""
+    first_event, first_token, totals, errors = [], [], [], 0
+    semaphore = asyncio.Semaphore(args.stream_concurrency)
+
+    async with httpx.AsyncClient(base_url=url, timeout=args.timeout) as client:
+        async def one(question: str) -> None:
+            nonlocal errors
+            async with semaphore:
+                start = time.perf_counter()
+                seen_event = seen_token = False
+                try:
+                    async with client.stream("POST", "/answer/stream", json={"question": question}) as response:
+                        response.raise_for_status()
+                        async for line in response.aiter_lines():
+                            if line.startswith("event:") and not seen_event:
+                                seen_event = True
+                                first_event.append(time.perf_counter() - start)
+                            if line == "event: token" and not seen_token:
+                                seen_token = True
+                                first_token.append(time.perf_counter() - start)
+                    totals.append(time.perf_counter() - start)
+                except httpx.HTTPError:
+                    errors += 1
+
+        start = time.perf_counter()
+        await asyncio.gather(*(one(question) for question in questions[: args.stream_requests]))
+        elapsed = time.perf_counter() - start
+
+    return {
+        "first_event": percentiles(first_event),
+        "first_token": percentiles(first_token),
+        "total": summarize(totals, elapsed, errors),
+    }
+
+
+def git_revision() -> str | None:
+    try:
+        return subprocess.check_output(["git", "rev-parse", "HEAD"], cwd=ROOT, text=True).strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the servers against a local stub LLM")
+    parser.add_argument("--output", default="benchmark_results.json")
+    parser.add_argument("--scenario", action="append", choices=SCENARIOS, help="Scenarios to run, repeatable (default: all)")
+    parser.add_argument("--server", choices=("flask", "asgi"), default="flask")
+    parser.add_argument("--latency", type=float, default=0.3, help="Stub seconds before the first token")
+    parser.add_argument("--tokens-per-second", type=float, default=80, help="Stub generation speed")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="Fraction of stub requests failing")
+    parser.add_argument("--completion-tokens", type=int, default=300, help="Length of stub FLINT and general answers")
+    parser.add_argument("--regulation-share", type=float, default=0.7, help="Fraction of regulation questions")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--requests", type=int, default=200, help="Requests per concurrency level")
+    parser.add_argument("--concurrency", type=lambda value: [int(v) for v in value.split(",")], default=[1, 8, 32])
+    parser.add_argument("--cold-starts", type=int, default=3)
+    parser.add_argument("--overhead-requests", type=int, default=50)
+    parser.add_argument("--stream-requests", type=int, default=20)
+    parser.add_argument("--stream-concurrency", type=int, default=4)
+    parser.add_argument("--timeout", type=float, default=300)
+    args = parser.parse_args()
+    scenarios = args.scenario or list(SCENARIOS)
+
+    config = StubConfig(args.latency, args.tokens_per_second, args.error_rate, args.completion_tokens, args.seed)
+    stub = StubServer(config=config).start()
+    questions = load_questions(max(args.requests, args.overhead_requests, args.stream_requests), args.regulation_share, args.seed)
+
+    results = {}
+    if "cold_start" in scenarios:
+        print("cold_start")
+        results["cold_start"] = cold_start(args, stub, questions)
+
+    server = ServerProcess(args.server, stub)
+    server.start()
+    try:
+        if "overhead" in scenarios:
+            print("overhead")
+            results["overhead"] = overhead(args, stub, server.url, questions)
+        if "concurrency" in scenarios:
+            print("concurrency")
+            results["concurrency"] = concurrency_sweep(args, server.url, questions)
+        if "streaming" in scenarios:
+            print("streaming")
+            results["streaming"] = asyncio.run(streaming(args, server.url, questions))
+    finally:
+        server.stop()
+        stub.shutdown()
+
+    report = {
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+        "revision": git_revision(),
+        "python": platform.python_version(),
+        "config": {key: value for key, value in vars(args).items() if key != "output"},
+        "stub": config.stats(),
+        "results": results,
+    }
+    Path(args.output).write_text(json.dumps(report, indent=2))
+    print(f"Results written to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,65 @@
+"""
+Measures the cost of building workflows per request versus reusing the
+compiled graphs from the workflow registry.
+
+LLM calls are replaced with canned answers so only the framework overhead
+(graph construction, compilation, agent setup and graph execution) is timed.
+
+Usage:
+    python -m benchmarks.workflow_overhead [--requests 200]
+"""
+
+import argparse
+import os
+import time
+
+os.environ.setdefault("OPENAI_API_KEY", "benchmark")
+
+from src.base import BaseClient
+from src.workflows.registry import WorkflowRegistry
+from src.workflows.router_workflow import create_router_graph, create_router_state
+
+
+def canned_invoke(self, prompt, max_tokens=0, timeout=None, system=None):
+    """Answers every prompt instantly so no network call is made"""
+    prompt = (system or "") + prompt
+    if "Classify the question" in prompt:
+        return "REGULATION_QUESTION"
+    if "Regulation to analyze" in prompt:
+        return "Yes"
+    return "ACT / FACT / DUTY frames"
+
+
+def time_ms(fn, repeat: int) -> float:
+    """Returns the mean wall time of fn in milliseconds"""
+    start = time.perf_counter()
+    for _ in range(repeat):
+        fn()
+    return (time.perf_counter() - start) * 1000 / repeat
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--requests", type=int, default=200)
+    args = parser.parse_args()
+
+    BaseClient.invoke = canned_invoke
+    question = "What are the recordkeeping requirements under 40 CFR 721.80?"
+
+    # Startup: compiling every workflow once
+    start = time.perf_counter()
+    registry = WorkflowRegistry()
+    registry.warm()
+    startup_ms = (time.perf_counter() - start) * 1000
+
+    per_request_build = time_ms(lambda: create_router_graph().invoke(create_router_state(question)), args.requests)
+    cached = time_ms(lambda: registry.get("router").invoke(create_router_state(question)), args.requests)
+
+    print(f"startup (compile all workflows once): {startup_ms:8.2f} ms")
+    print(f"per request, build graphs each time:  {per_request_build:8.2f} ms")
+    print(f"per request, registry graphs:         {cached:8.2f} ms")
+    print(f"saved per request:                    {per_request_build - cached:8.2f} ms")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,47 @@
+"""
+Production server configuration, run with:
+    gunicorn app:app
+
+The app is imported and warmed up once in the master (preload_app), then
+forked into workers sharing its memory copy-on-write. Every worker runs the
+Flask app with its own thread pool, since requests mostly wait on OpenAI.
+
+Sessions, jobs and the caches are kept in SQLite files under .cache, shared
+by all workers, so requests need no sticky routing. Identical questions in
+flight at the same time are only coalesced within a worker.
+
+- SERVER_HOST / SERVER_PORT: Address to bind (default: 0.0.0.0:5000)
+- SERVER_WORKERS: Worker processes (default: WEB_CONCURRENCY, or 2 per CPU up to 8)
+- SERVER_THREADS: Request threads per worker (default: 32)
+- SERVER_PRELOAD: Load the app in the master before forking (default: true)
+- SERVER_TIMEOUT: Seconds a silent worker is given before it is restarted (default: 120)
+"""
+
+import gc
+import os
+
+bind = f"{os.getenv('SERVER_HOST', '0.0.0.0')}:{os.getenv('SERVER_PORT', '5000')}"
+workers = int(os.getenv("SERVER_WORKERS") or os.getenv("WEB_CONCURRENCY") or min(2 * (os.cpu_count() or 1), 8))
+worker_class = "gthread"
+threads = int(os.getenv("SERVER_THREADS", 32))
+preload_app = os.getenv("SERVER_PRELOAD", "true").lower() == "true"
+timeout = int(os.getenv("SERVER_TIMEOUT", 120))
+graceful_timeout = 30
+accesslog = "-"
+
+# Read by the app, a preloaded app starts its job workers after the fork instead of at import.
+# Without preloading every worker imports and warms up the app itself
+os.environ["SERVER_PREFORK"] = "true" if preload_app else "false"
+
+
+def when_ready(server):
+    # Objects loaded so far are moved out of garbage collection, whose passes
+    # write to every tracked object and would copy their pages into each worker
+    gc.collect()
+    gc.freeze()
+
+
+def post_fork(server, worker):
+    if preload_app:
+        from src.serving import after_fork
+        after_fork()
@@ -3,6 +3,8 @@ from .general_agent import GeneralAgent
 from .regulation_agent import RegulationAgent
 from .flint_formatter_agent import FlintFormatterAgent
 from .actor_identification_agent import ActorIdentificationAgent
+from .triage_agent import TriageAgent
+from .follow_up_agent import FollowUpAgent
 
 __all__ = [
     "RouterAgent",
@@ -10,4 +12,6 @@ __all__ = [
     "RegulationAgent",
     "FlintFormatterAgent",
     "ActorIdentificationAgent",
+    "TriageAgent",
+    "FollowUpAgent",
 ]
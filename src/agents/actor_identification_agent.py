@@ -1,6 +1,9 @@
+import os
 from ..base import BaseClient
+from ..llm import truncate_tokens
 
-ACTOR_IDENTIFICATION_PROMPT = '''You are an expert AI agent specialized in analysing legal regulations.
+# Static instructions, identical for every call so the provider can cache the prefix
+ACTOR_IDENTIFICATION_SYSTEM_PROMPT = '''You are an expert AI agent specialized in analysing legal regulations.
 
 Key Definitions:
 Act: Describes what an agent can do, the conditions under which the act is valid, and the results of the act. Only by acting can you change something.
@@ -11,16 +14,47 @@ Task:
 Find the 'Actor' from the context with clear distinction between other definitions.
 Note: An 'Act' can never be an 'Actor' and an 'Action' can never be an 'Actor'.
 
-Regulation to analyze:
-{text}
-
 Rules:
 1. If an actor is present, return exactly "Yes"
 2. If no actor is found, return exactly "This is not a valid regulation"
 3. Must only return one of these two responses'''
 
+ACTOR_IDENTIFICATION_PROMPT = '''Regulation to analyze:
+{text}'''
+
+# "This is not a valid regulation" is the longest allowed answer
+IDENTIFICATION_MAX_TOKENS = 16
+
 
 class ActorIdentificationAgent(BaseClient):
+    """
+    Checks whether a regulation names an actor
+    - ACTOR_MAX_INPUT_TOKENS: Regulation text beyond this many tokens is truncated (default: 8000)
+    """
+
+    # A one-line verdict, duplicating a slow call is cheap
+    hedge_requests = True
+
+    def __init__(self, cache_responses: bool | None = None):
+        super().__init__(cache_responses)
+        self.max_input_tokens = int(os.getenv("ACTOR_MAX_INPUT_TOKENS", 8000))
+
     def identify(self, text: str) -> str:
         # return "This is not a valid regulation"
-        return self.invoke(ACTOR_IDENTIFICATION_PROMPT.format(text=text))
+        return self.invoke(
+            self._prompt(text),
+            max_tokens=IDENTIFICATION_MAX_TOKENS,
+            system=ACTOR_IDENTIFICATION_SYSTEM_PROMPT
+        )
+
+    async def aidentify(self, text: str) -> str:
+        """Async variant of identify"""
+        return await self.ainvoke(
+            self._prompt(text),
+            max_tokens=IDENTIFICATION_MAX_TOKENS,
+            system=ACTOR_IDENTIFICATION_SYSTEM_PROMPT
+        )
+
+    def _prompt(self, text: str) -> str:
+        # An actor shows up early in a regulation, the tail is not needed to find one
+        return ACTOR_IDENTIFICATION_PROMPT.format(text=truncate_tokens(text, self.max_input_tokens, self.model))
@@ -1,9 +1,15 @@
-from ..base import BaseClient
+import asyncio
+import contextvars
+import os
+import re
+from concurrent.futures import ThreadPoolExecutor
+from typing import AsyncIterator, Iterator
+from ..base import BaseClient, Completion
+from ..llm import PRIORITY_BULK, count_tokens, split_to_budget
+from ..flint.frames import FLINT_RESPONSE_FORMAT, FlintFrames
 
-
-class FlintFormatterAgent(BaseClient):
-    def format(self, text: str) -> str:
-        prompt = """
+# Static instructions and examples, identical for every call so the provider can cache the prefix
+FLINT_SYSTEM_PROMPT = """
         You are an expert AI legal assistant Based on the user's question, identify the Source of regulation,
         processing and reconstructing legal regulations into Multiple original regulation. 
             1. Multiple regulations are given in context, only consider one regulation.
@@ -78,8 +84,6 @@ class FlintFormatterAgent(BaseClient):
             15. Consider full single regulation for generation of output.
             16. Must not change the original text of the chunk, always give the chunk in its original form.
 
-            <context> {text}
-
             Example of Act, fact and duty Frame:
 
             Act Frame
@@ -155,4 +159,263 @@ class FlintFormatterAgent(BaseClient):
 
         """
 
-        return self.invoke(prompt.format(text=text))
+# Structured mode appends this to the same prefix, the frames come back as JSON only
+FLINT_JSON_SYSTEM_PROMPT = FLINT_SYSTEM_PROMPT + """
+            OUTPUT FORMAT (overrides the table and JSON file instructions above):
+            Return only one JSON object with the keys "acts", "facts" and "duties", each a list of frames.
+            Do not produce tables, summaries or any text outside the JSON object.
+            Use the frame properties as field names, e.g. "creating_postcondition", "duty_holder", "enforcing_act",
+            and put the references to sources in "sources".
+        """
+
+# Variable part of the request, sent after the static prefix
+FLINT_USER_PROMPT = "<context> {text}"
+PART_SEPARATOR = "\n\n"
+PARAGRAPH_BREAK = re.compile(r"\n\s*\n")
+
+
+class FlintFormatterAgent(BaseClient):
+    """
+    Converts regulation text into FLINT frames
+    - FLINT_MAX_INPUT_TOKENS: Token budget for the regulation text of one call (default: 8000)
+    - FLINT_OVERFLOW: What to do with text over budget, "split" generates frames for
+      each part and concatenates them, "truncate" keeps the first part (default: split)
+    - FLINT_OUTPUT_MODE: "text" for tables followed by JSON, "json" for schema
+      constrained JSON frames only, roughly halving generated tokens (default: text)
+    - FLINT_JSON_MAX_TOKENS: Maximum tokens of one generation in the json mode, JSON
+      cut off by this limit is regenerated from each half of the text (default: 4096)
+    - FLINT_MAP_REDUCE: Generate frames for each source section concurrently and
+      merge them, instead of one call over the whole text (default: false)
+    - FLINT_MAP_WORKERS: Concurrent section generations per regulation (default: 4)
+    """
+
+    # Long generations yield to the short calls every request waits on
+    priority = PRIORITY_BULK
+
+    def __init__(self, cache_responses: bool | None = None):
+        super().__init__(cache_responses)
+        self.max_input_tokens = int(os.getenv("FLINT_MAX_INPUT_TOKENS", 8000))
+        self.overflow = os.getenv("FLINT_OVERFLOW", "split").lower()
+        self.structured = os.getenv("FLINT_OUTPUT_MODE", "text").lower() == "json"
+        self.system_prompt = FLINT_JSON_SYSTEM_PROMPT if self.structured else FLINT_SYSTEM_PROMPT
+        self.response_format = FLINT_RESPONSE_FORMAT if self.structured else None
+        # Truncated text frames are still readable, truncated JSON is useless
+        self.output_tokens = int(os.getenv("FLINT_JSON_MAX_TOKENS", 4096)) if self.structured else 0
+        self.map_reduce = os.getenv("FLINT_MAP_REDUCE", "false").lower() == "true"
+        self.map_workers = int(os.getenv("FLINT_MAP_WORKERS", 4))
+
+    @property
+    def variant(self) -> str:
+        """Identifies the model and output mode, frames of different variants are not interchangeable"""
+        return f"{self.model}/json" if self.structured else self.model
+
+    def budget(self, text: str) -> list[str]:
+        """Splits or truncates regulation text into parts that fit the input budget"""
+        parts = split_to_budget(text, self.max_input_tokens, self.model)
+        return parts if self.overflow == "split" else parts[:1]
+
+    def parts(self, text: str, sources: list[str] | None = None) -> list[str]:
+        """
+        Regulation text of each call: one part per source section in map-reduce
+        mode, otherwise budget sized parts of the whole text
+        Args:
+            sources: Source IDs of the chunks the text was built from, sections
+                are only told apart by these
+        """
+        if not self.map_reduce:
+            return self.budget(text)
+        return [part for section in split_sections(text, sources) for part in self.budget(section)]
+
+    def cacheable(self, content: str) -> bool:
+        """JSON frames are only cached when they parse"""
+        if not self.structured:
+            return True
+        try:
+            FlintFrames.parse(content)
+            return True
+        except ValueError:
+            return False
+
+    def _complete_part(self, part: str) -> Completion:
+        completion = self.complete(
+            FLINT_USER_PROMPT.format(text=part),
+            self.output_tokens,
+            system=self.system_prompt,
+            response_format=self.response_format,
+        )
+        if not self._cut_off(completion):
+            return completion
+        halves = self._halves(part)
+        return self._resplit(completion, [self._complete_part(half) for half in halves])
+
+    async def _acomplete_part(self, part: str) -> Completion:
+        completion = await self.acomplete(
+            FLINT_USER_PROMPT.format(text=part),
+            self.output_tokens,
+            system=self.system_prompt,
+            response_format=self.response_format,
+        )
+        if not self._cut_off(completion):
+            return completion
+        halves = self._halves(part)
+        return self._resplit(completion, list(await asyncio.gather(*(self._acomplete_part(half) for half in halves))))
+
+    def _cut_off(self, completion: Completion) -> bool:
+        """JSON frames cut off by the token limit, text frames are kept as they are"""
+        return self.structured and completion.finish_reason == "length"
+
+    def _halves(self, part: str) -> list[str]:
+        """
+        Splits a part whose frames did not fit the output limit into two halves of whole paragraphs
+        Raises:
+            ValueError: The part is a single paragraph and cannot be split further
+        """
+        paragraphs = [paragraph for paragraph in PARAGRAPH_BREAK.split(part) if paragraph.strip()]
+        if len(paragraphs) < 2:
+            raise ValueError(
+                f"FLINT frames of a single paragraph exceed FLINT_JSON_MAX_TOKENS ({self.output_tokens})"
+            )
+        tokens = [count_tokens(paragraph, self.model) for paragraph in paragraphs]
+        total, used, cut = sum(tokens), 0, 1
+        for cut in range(1, len(paragraphs)):
+            used += tokens[cut - 1]
+            if used * 2 >= total:
+                break
+        return ["\n\n".join(paragraphs[:cut]), "\n\n".join(paragraphs[cut:])]
+
+    def _resplit(self, truncated: Completion, completions: list[Completion]) -> Completion:
+        """Merges the frames of both halves, counting the tokens of the truncated call too"""
+        merged = merge_completions(completions, self.structured)
+        return merged._replace(
+            prompt_tokens=merged.prompt_tokens + truncated.prompt_tokens,
+            completion_tokens=merged.completion_tokens + truncated.completion_tokens,
+            cached=False,
+        )
+
+    def _map(self, parts: list[str]) -> Iterator[Completion]:
+        """Generates frames for the parts, concurrently in map-reduce mode, yielding them in order"""
+        if not self.map_reduce or len(parts) == 1:
+            yield from map(self._complete_part, parts)
+            return
+        with ThreadPoolExecutor(max_workers=min(self.map_workers, len(parts))) as executor:
+            # Each part runs in a copy of the caller's context so the request deadline and trace apply
+            futures = [executor.submit(contextvars.copy_context().run, self._complete_part, part) for part in parts]
+            try:
+                for future in futures:
+                    yield future.result()
+            finally:
+                for future in futures:
+                    future.cancel()
+
+    async def _amap(self, parts: list[str]) -> list[Completion]:
+        """Async variant of _map"""
+        if not self.map_reduce:
+            return [await self._acomplete_part(part) for part in parts]
+        slots = asyncio.Semaphore(self.map_workers)
+
+        async def complete(part: str) -> Completion:
+            async with slots:
+                return await self._acomplete_part(part)
+
+        return list(await asyncio.gather(*(complete(part) for part in parts)))
+
+    def format(self, text: str, sources: list[str] | None = None) -> str:
+        """
+        Args:
+            text: Regulation text, chunks prefixed with their source ID
+            sources: Source IDs of those chunks, map-reduce mode generates one section per source
+        """
+        return self.format_completion(text, sources).text
+
+    def format_frames(self, text: str, sources: list[str] | None = None) -> FlintFrames:
+        """Generates typed frames, only available in the json output mode"""
+        if not self.structured:
+            raise ValueError("Typed frames require FLINT_OUTPUT_MODE=json")
+        return FlintFrames.parse(self.format(text, sources))
+
+    def format_completion(self, text: str, sources: list[str] | None = None) -> Completion:
+        """Same as format but also returns the token usage of the call(s)"""
+        return merge_completions(list(self._map(self.parts(text, sources))), self.structured)
+
+    def format_stream(self, text: str, sources: list[str] | None = None) -> Iterator[str]:
+        """
+        Same as format but yields the FLINT frames while they are generated
+        Partial JSON is of no use to clients, so the json mode yields the frames once
+        Map-reduce mode yields each section's frames once they and all earlier ones are done
+        """
+        if self.structured:
+            yield self.format(text, sources)
+            return
+        if self.map_reduce:
+            for n, completion in enumerate(self._map(self.parts(text, sources))):
+                if n:
+                    yield PART_SEPARATOR
+                yield completion.text
+            return
+        for n, part in enumerate(self.budget(text)):
+            if n:
+                yield PART_SEPARATOR
+            yield from self.stream(FLINT_USER_PROMPT.format(text=part), system=self.system_prompt)
+
+    async def aformat(self, text: str, sources: list[str] | None = None) -> str:
+        """Async variant of format"""
+        return (await self.aformat_completion(text, sources)).text
+
+    async def aformat_completion(self, text: str, sources: list[str] | None = None) -> Completion:
+        """Async variant of format_completion"""
+        return merge_completions(await self._amap(self.parts(text, sources)), self.structured)
+
+    async def aformat_stream(self, text: str, sources: list[str] | None = None) -> AsyncIterator[str]:
+        """Async variant of format_stream"""
+        if self.structured or self.map_reduce:
+            yield await self.aformat(text, sources)
+            return
+        for n, part in enumerate(self.budget(text)):
+            if n:
+                yield PART_SEPARATOR
+            async for token in self.astream(FLINT_USER_PROMPT.format(text=part), system=self.system_prompt):
+                yield token
+
+
+def split_sections(text: str, sources: list[str] | None = None) -> list[str]:
+    """
+    Groups regulation text entries by their source ID, in order of first appearance
+    Only the known source IDs of the retrieved chunks start an entry, as "<source>: "
+    (format_chunks), so IDs such as "§ 721.80" are recognized and paragraphs that
+    merely start with a word and a colon ("Note: ...") stay with their section
+    Args:
+        sources: Source IDs of the chunks, without them the text is one section
+    """
+    if not sources:
+        return [text]
+    prefixes = [f"{source}: " for source in dict.fromkeys(sources)]
+    sections: dict[str, list[str]] = {}
+    source = ""
+    for paragraph in text.split("\n\n"):
+        if not paragraph.strip():
+            continue
+        source = next((prefix for prefix in prefixes if paragraph.startswith(prefix)), source)
+        sections.setdefault(source, []).append(paragraph)
+    return ["\n\n".join(paragraphs) for paragraphs in sections.values()] or [text]
+
+
+def merge_completions(completions: list[Completion], structured: bool = False) -> Completion:
+    """
+    Combines the frames generated for each part or section of a regulation
+    Text frames are concatenated, JSON frames are validated and merged into one
+    compact object with duplicate FACT frames removed
+    """
+    if structured:
+        frames = FlintFrames()
+        for completion in completions:
+            frames.extend(FlintFrames.parse(completion.text))
+        frames.dedupe_facts()
+        text = frames.to_json()
+    else:
+        text = PART_SEPARATOR.join(completion.text for completion in completions)
+    return Completion(
+        text,
+        sum(completion.prompt_tokens for completion in completions),
+        sum(completion.completion_tokens for completion in completions),
+        all(completion.cached for completion in completions),
+    )
@@ -0,0 +1,92 @@
+import os
+import re
+from typing import NamedTuple
+from ..base import BaseClient
+from ..llm import PRIORITY_ROUTING, truncate_tokens
+
+# Static instructions, identical for every call so the provider can cache the prefix
+FOLLOW_UP_SYSTEM_PROMPT = '''You handle a follow-up question in a conversation about a regulation.
+
+First decide how the follow-up question is answered:
+SAME - The question is about the regulation already under discussion: its actors, duties, acts, conditions
+or terms, including questions referring to it as "that duty", "this section" or "it"
+NEW - The question is about a different regulation or regulatory topic
+OTHER - The question is not related to regulations
+
+Format: Return "SAME", "NEW" or "OTHER" on the first line.
+For SAME, answer the follow-up question on the next lines, using only the regulation and its FLINT frames.
+Name the actors, acts, duties and facts the answer relies on. For NEW and OTHER return nothing else.'''
+
+FOLLOW_UP_PROMPT = '''Earlier question: {previous}
+
+Regulation under discussion:
+{text}
+
+FLINT frames of the regulation:
+{frames}
+
+Follow-up question: {question}'''
+
+LABEL = re.compile(r"SAME|NEW|OTHER")
+
+
+class FollowUp(NamedTuple):
+    """How a follow-up question is answered, with the answer when it is about the session's regulation"""
+    label: str
+    answer: str | None = None
+
+
+class FollowUpAgent(BaseClient):
+    """
+    Handles a follow-up question in one call: decides whether it is about the
+    regulation its session already retrieved and, if so, answers it from the
+    session's regulation and FLINT frames
+    - FOLLOW_UP_CONTEXT_TOKENS: Tokens of the session's regulation and of its frames in the prompt (default: 3000 each)
+    - FOLLOW_UP_MAX_TOKENS: Maximum tokens of a label and answer (default: 600)
+    """
+
+    # Takes the place of the router's classification
+    priority = PRIORITY_ROUTING
+
+    def __init__(self):
+        super().__init__()
+        self.context_tokens = int(os.getenv("FOLLOW_UP_CONTEXT_TOKENS", 3000))
+        self.answer_tokens = int(os.getenv("FOLLOW_UP_MAX_TOKENS", 600))
+
+    def respond(self, question: str, session: dict) -> FollowUp:
+        """
+        Returns:
+            The label ("SAME", "NEW" or "OTHER") and, for SAME, the answer
+        """
+        return self._follow_up(self.invoke(
+            self._prompt(question, session),
+            max_tokens=self.answer_tokens,
+            system=FOLLOW_UP_SYSTEM_PROMPT
+        ))
+
+    async def arespond(self, question: str, session: dict) -> FollowUp:
+        """Async variant of respond"""
+        return self._follow_up(await self.ainvoke(
+            self._prompt(question, session),
+            max_tokens=self.answer_tokens,
+            system=FOLLOW_UP_SYSTEM_PROMPT
+        ))
+
+    def _prompt(self, question: str, session: dict) -> str:
+        return FOLLOW_UP_PROMPT.format(
+            previous=session["question"],
+            text=truncate_tokens(session["regulation_text"], self.context_tokens, self.model),
+            frames=truncate_tokens(session.get("flint_format") or "(none)", self.context_tokens, self.model),
+            question=question,
+        )
+
+    @staticmethod
+    def _follow_up(response: str) -> FollowUp:
+        label, _, answer = response.strip().partition("\n")
+        match = LABEL.search(label)
+        # Anything unexpected, including SAME without an answer, is answered from scratch, the safe choice
+        if match is None or (match.group(0) == "SAME" and not answer.strip()):
+            return FollowUp("NEW")
+        if match.group(0) != "SAME":
+            return FollowUp(match.group(0))
+        return FollowUp("SAME", answer.strip())
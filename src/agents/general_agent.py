@@ -1,12 +1,25 @@
+from typing import AsyncIterator, Iterator
 from ..base import BaseClient
 
-class GeneralAgent(BaseClient):
-    def answer(self, question: str) -> str:
-        prompt = """
-        You are a regulations assistant. Please answer this question:
-        {question}
-        
+# Static system prefix, the question follows as the user message
+GENERAL_SYSTEM_PROMPT = """
+        You are a regulations assistant. Please answer the user's question.
         Provide a clear and concise response.
         """
 
-        return self.invoke(prompt.format(question=question))
+class GeneralAgent(BaseClient):
+    def answer(self, question: str) -> str:
+        return self.invoke(question, system=GENERAL_SYSTEM_PROMPT)
+
+    def answer_stream(self, question: str) -> Iterator[str]:
+        """Same as answer but yields the response while it is generated"""
+        return self.stream(question, system=GENERAL_SYSTEM_PROMPT)
+
+
+    async def aanswer(self, question: str) -> str:
+        """Async variant of answer"""
+        return await self.ainvoke(question, system=GENERAL_SYSTEM_PROMPT)
+
+    def aanswer_stream(self, question: str) -> AsyncIterator[str]:
+        """Async variant of answer_stream"""
+        return self.astream(question, system=GENERAL_SYSTEM_PROMPT)
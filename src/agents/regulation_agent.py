@@ -1,9 +1,10 @@
+import asyncio
+import os
 from ..base import BaseClient
+from ..retrieval import BM25Index, Chunk, SearchHit, get_regulation_index
 
-
-class RegulationAgent(BaseClient):
-    def analyze_regulation(self, question: str) -> str:
-        return """
+# Used when no regulation index has been built yet
+FALLBACK_REGULATION = """
         (a) Chemical substance and significant new uses subject to reporting.
             (1) The chemical substance identified as alkanes, C21-34-branched and linear, 
                 chloro (PMN P-12-539; CAS No. 1417900-96-9) is subject to reporting under 
@@ -29,3 +30,57 @@ class RegulationAgent(BaseClient):
             (2) Limitations or revocation of certain notification requirements. The 
                 provisions of § 721.185 apply to this section.
         """
+
+
+class RegulationAgent(BaseClient):
+    """
+    Retrieves the regulation text relevant to a question from the local index
+    - REGULATION_TOP_K: Number of chunks retrieved per question (default: 5)
+    """
+
+    def __init__(self, index: BM25Index | None = None):
+        super().__init__()
+        self.index = index if index is not None else get_regulation_index()
+        self.top_k = int(os.getenv("REGULATION_TOP_K", 5))
+
+    def retrieve(self, question: str) -> list[SearchHit]:
+        """Returns the best matching regulation chunks for the question"""
+        if self.index is None:
+            return []
+        return self.index.search(question, k=self.top_k)
+
+    def source_text(self, source: str) -> str | None:
+        """Returns the full indexed text of one source, formatted like analyze_regulation"""
+        if self.index is None:
+            return None
+        chunks = self.index.source_chunks(source)
+        return format_chunks(chunks) if chunks else None
+
+    async def aretrieve(self, question: str) -> list[SearchHit]:
+        """Async variant of retrieve, the search runs in a worker thread"""
+        return await asyncio.to_thread(self.retrieve, question)
+
+    def analyze_regulation(self, question: str, hits: list[SearchHit] | None = None) -> str:
+        """
+        Returns the retrieved chunks, each prefixed with its source ID as the
+        FLINT prompt expects (e.g. "OCR_4709.09: ...")
+        Args:
+            question: User question
+            hits: Already retrieved chunks, retrieved here when None
+        Returns:
+            The regulation text, empty when the index has nothing matching the question
+        """
+        if self.index is None:
+            return FALLBACK_REGULATION
+        hits = self.retrieve(question) if hits is None else hits
+        return format_hits(hits)
+
+
+def format_hits(hits: list[SearchHit]) -> str:
+    """Joins retrieved chunks into regulation text, keeping their source IDs"""
+    return format_chunks([hit.chunk for hit in hits])
+
+
+def format_chunks(chunks: list[Chunk]) -> str:
+    """Joins chunks into regulation text, each prefixed with its source ID"""
+    return "\n\n".join(f"{chunk.source}: {chunk.text}" for chunk in chunks)
@@ -1,9 +1,11 @@
+import os
+import re
 from typing import Dict
 from ..base import BaseClient
+from ..llm import PRIORITY_ROUTING
+from ..routing import QuestionClassifier, get_question_classifier, log_labelled_question
 
-class RouterAgent(BaseClient):
-    def classify_question(self, question: str) -> Dict:
-        prompt = """Classify the question into one of these categories:
+ROUTER_CATEGORIES = """Classify the question into one of these categories:
 
         REGULATION_QUESTION - Questions that involve:
         - Regulatory compliance requirements
@@ -25,13 +27,118 @@ class RouterAgent(BaseClient):
         - "How to improve business efficiency?"
         - "What are the current market trends?"
         - "How to handle customer complaints?"
+"""
 
-        Question: {question}
+# Static system prefixes, the question(s) follow as the user message
+ROUTER_SYSTEM_PROMPT = ROUTER_CATEGORIES + """
         Format: Return only "REGULATION_QUESTION" or "OTHER"
         """
-        response = self.invoke(prompt.format(question=question))
-        qtype = response.strip()
+
+BATCH_ROUTER_SYSTEM_PROMPT = ROUTER_CATEGORIES + """
+        Format: Return only a JSON array with one "REGULATION_QUESTION" or "OTHER" per question, in order
+        """
+
+ROUTER_PROMPT = "Question: {question}"
+BATCH_ROUTER_PROMPT = "Questions:\n{questions}"
+
+# "REGULATION_QUESTION" is a handful of tokens, no need for the default budget
+CLASSIFICATION_MAX_TOKENS = 10
+LABEL = re.compile(r"REGULATION_QUESTION|OTHER")
+
+class RouterAgent(BaseClient):
+    """
+    Classifies questions, locally when the trained classifier is confident
+    - ROUTER_CONFIDENCE_THRESHOLD: Minimum local confidence to skip the LLM (default: 0.9)
+    """
+
+    # A single label, duplicating a slow call is cheap
+    hedge_requests = True
+    # Every request needs its classification first
+    priority = PRIORITY_ROUTING
+
+    def __init__(self, classifier: QuestionClassifier | None = None):
+        super().__init__()
+        self.classifier = classifier if classifier is not None else get_question_classifier()
+        self.threshold = float(os.getenv("ROUTER_CONFIDENCE_THRESHOLD", 0.9))
+
+    def classify_question(self, question: str) -> Dict:
+        local = self._classify_locally(question)
+        if local is not None:
+            return local
+
+        response = self.invoke(
+            ROUTER_PROMPT.format(question=question),
+            max_tokens=CLASSIFICATION_MAX_TOKENS,
+            system=ROUTER_SYSTEM_PROMPT
+        )
+        return self._llm_classification(question, response)
+
+    async def aclassify_question(self, question: str) -> Dict:
+        """Async variant of classify_question"""
+        local = self._classify_locally(question)
+        if local is not None:
+            return local
+
+        response = await self.ainvoke(
+            ROUTER_PROMPT.format(question=question),
+            max_tokens=CLASSIFICATION_MAX_TOKENS,
+            system=ROUTER_SYSTEM_PROMPT
+        )
+        return self._llm_classification(question, response)
+
+    def classify_questions(self, questions: list[str]) -> list[Dict]:
+        """
+        Classifies many questions with at most one LLM call
+        Questions the local classifier is confident about are not sent, the
+        rest are numbered in a single batched prompt
+        Args:
+            questions: Questions to classify
+        Returns:
+            One classification per question, in input order
+        """
+        results = [self._classify_locally(question) for question in questions]
+        pending = [i for i, result in enumerate(results) if result is None]
+        if not pending:
+            return results
+
+        numbered = "\n".join(f"{n}. {questions[i]}" for n, i in enumerate(pending, 1))
+        response = self.invoke(
+            BATCH_ROUTER_PROMPT.format(questions=numbered),
+            max_tokens=CLASSIFICATION_MAX_TOKENS * len(pending) + 10,
+            system=BATCH_ROUTER_SYSTEM_PROMPT
+        )
+        labels = LABEL.findall(response)
+        if len(labels) != len(pending):
+            # The model did not return one label per question, classify them one by one
+            for i in pending:
+                results[i] = self.classify_question(questions[i])
+            return results
+        for i, label in zip(pending, labels):
+            results[i] = self._llm_classification(questions[i], label)
+        return results
+
+    def _classify_locally(self, question: str) -> Dict | None:
+        """Returns the local classification when the model is confident enough"""
+        if self.classifier is None:
+            return None
+        label, confidence = self.classifier.predict(question)
+        if confidence < self.threshold:
+            return None
+        return {
+            "type": label,
+            "source": "local",
+            "confidence": confidence
+        }
+
+    def _llm_classification(self, question: str, response: str) -> Dict:
+        """Normalizes the model output to a label, anything unrecognised routes as OTHER"""
+        label = LABEL.search(response)
+        qtype = label.group() if label is not None else "OTHER"
+        # LLM labels are the training data for the local classifier, unrecognised output is not
+        if label is not None:
+            log_labelled_question(question, qtype)
 
         return {
-            "type": qtype
+            "type": qtype,
+            "source": "llm"
         }
@@ -0,0 +1,98 @@
+import json
+import os
+from typing import Dict
+from ..llm import truncate_tokens
+from ..routing import QuestionClassifier
+from .router_agent import ROUTER_CATEGORIES, RouterAgent
+
+# Static instructions, identical for every call so the provider can cache the prefix
+TRIAGE_SYSTEM_PROMPT = '''You are an expert AI agent specialized in analysing legal regulations.
+You answer two independent questions about a user question and the regulation retrieved for it.
+
+1. category: ''' + ROUTER_CATEGORIES + '''
+2. has_actor: Whether the regulation names an 'Actor'.
+        Act: Describes what an agent can do, the conditions under which the act is valid, and the results of the act. Only by acting can you change something.
+        Action: Action that causes the transition of an object
+        Actor: Agent role that is allowed to perform the action
+        Note: An 'Act' can never be an 'Actor' and an 'Action' can never be an 'Actor'.
+
+Format: Return only the JSON object'''
+
+TRIAGE_PROMPT = '''Question: {question}
+
+Regulation to analyze:
+{text}'''
+
+TRIAGE_RESPONSE_FORMAT = {
+    "type": "json_schema",
+    "json_schema": {
+        "name": "triage",
+        "strict": True,
+        "schema": {
+            "type": "object",
+            "properties": {
+                "category": {"type": "string", "enum": ["REGULATION_QUESTION", "OTHER"]},
+                "has_actor": {"type": "boolean"},
+            },
+            "required": ["category", "has_actor"],
+            "additionalProperties": False,
+        },
+    },
+}
+
+# {"category": "REGULATION_QUESTION", "has_actor": false} with some slack
+TRIAGE_MAX_TOKENS = 30
+
+
+class TriageAgent(RouterAgent):
+    """
+    Classifies a question and checks its retrieved regulation for an actor in
+    one structured call, replacing a RouterAgent and an ActorIdentificationAgent
+    round trip in the fused pipeline
+    - ACTOR_MAX_INPUT_TOKENS: Regulation text beyond this many tokens is truncated (default: 8000)
+    """
+
+    def __init__(self, classifier: QuestionClassifier | None = None):
+        super().__init__(classifier)
+        self.max_input_tokens = int(os.getenv("ACTOR_MAX_INPUT_TOKENS", 8000))
+
+    def triage(self, question: str, regulation: str) -> Dict:
+        """
+        Returns:
+            The classification like RouterAgent.classify_question, with the
+            actor verdict ("Yes" or "No") under "actor_analysis"
+        """
+        return self._triage(question, self.complete(
+            self._prompt(question, regulation),
+            max_tokens=TRIAGE_MAX_TOKENS,
+            system=TRIAGE_SYSTEM_PROMPT,
+            response_format=TRIAGE_RESPONSE_FORMAT,
+        ).text)
+
+    async def atriage(self, question: str, regulation: str) -> Dict:
+        """Async variant of triage"""
+        return self._triage(question, (await self.acomplete(
+            self._prompt(question, regulation),
+            max_tokens=TRIAGE_MAX_TOKENS,
+            system=TRIAGE_SYSTEM_PROMPT,
+            response_format=TRIAGE_RESPONSE_FORMAT,
+        )).text)
+
+    def classify_locally(self, question: str) -> Dict | None:
+        """Confident local classification of a general question, which needs no regulation"""
+        local = self._classify_locally(question)
+        if local is None or local["type"] == "REGULATION_QUESTION":
+            return None
+        return local
+
+    def _prompt(self, question: str, regulation: str) -> str:
+        return TRIAGE_PROMPT.format(
+            question=question, text=truncate_tokens(regulation, self.max_input_tokens, self.model)
+        )
+
+    def _triage(self, question: str, response: str) -> Dict:
+        answer = json.loads(response)
+        classification = self._llm_classification(question, answer["category"])
+        classification["source"] = "fused"
+        classification["actor_analysis"] = "Yes" if answer["has_actor"] else "No"
+        return classification
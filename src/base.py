@@ -1,41 +1,268 @@
 import os
-from openai import OpenAI
+from typing import AsyncIterator, Iterator, NamedTuple
 from dotenv import load_dotenv
+from .llm import PRIORITY_DEFAULT, get_client_pool, get_hedger, get_response_cache, get_single_flight, ResponseCache, count_tokens, token_usage
+from .telemetry import observe_call, record_cache_hit
+from .telemetry.tracing import CallObservation
 
 # Load environment variables from a .env file
 load_dotenv()
 
 
+class Completion(NamedTuple):
+    """
+    Generated response with its token usage
+    Cached responses, and responses shared from an identical in-flight call,
+    cost nothing and report zero tokens
+    finish_reason is "length" when the response was cut off by max_tokens
+    """
+    text: str
+    prompt_tokens: int = 0
+    completion_tokens: int = 0
+    cached: bool = False
+    finish_reason: str = "stop"
+
+
 class BaseClient:
     """
     Base client for all agents
     Handles OpenAI API initialization and common interaction patterns
     """
+
+    # Agents whose answers are deterministic enough to reuse opt into the response cache
+    cache_responses = True
+    # Cheap, latency critical agents opt into hedged requests
+    hedge_requests = False
+    # Scheduler priority class of the agent's calls when rate limited, lower goes first
+    priority = PRIORITY_DEFAULT
     
-    def __init__(self):
+    def __init__(self, cache_responses: bool | None = None):
         """
         Initialize OpenAI client with configuration from environment variables
         - OPENAI_MODEL: Model to be used (default: gpt-4o-mini)
         - OPENAI_MAX_TOKENS: Maximum tokens for response (default: 1500)
-        - OPENAI_API_KEY: API key for authentication
+        - LLM_CACHE_DISABLED_AGENTS: Comma separated agent class names that bypass the response cache
+        - LLM_SINGLE_FLIGHT: Share one API call between concurrent identical prompts of an agent (default: true)
+        - LLM_HEDGING: Hedge the calls of agents that opt in with hedge_requests (default: true)
+        All agents share the process-wide client pool (see src/llm/pool.py)
+        Args:
+            cache_responses: Overrides the class level cache opt-in for this instance
         """
         self.model = os.getenv("OPENAI_MODEL", "gpt-4o-mini")
         self.max_tokens = int(os.getenv("OPENAI_MAX_TOKENS", 1500))
-        self.client = OpenAI(api_key=os.getenv("OPENAI_API_KEY"))
+        self.pool = get_client_pool()
+
+        disabled = {name.strip() for name in os.getenv("LLM_CACHE_DISABLED_AGENTS", "").split(",")}
+        if cache_responses is None:
+            cache_responses = self.cache_responses and type(self).__name__ not in disabled
+        self.cache = get_response_cache() if cache_responses else None
+        single_flight = os.getenv("LLM_SINGLE_FLIGHT", "true").lower() == "true"
+        self.flight = get_single_flight(type(self).__name__) if single_flight else None
+        hedging = self.hedge_requests and os.getenv("LLM_HEDGING", "true").lower() == "true"
+        self.hedger = get_hedger(type(self).__name__) if hedging else None
 
-    def invoke(self, prompt: str, max_tokens = 0) -> str:
+    def invoke(self, prompt: str, max_tokens = 0, timeout: float | None = None, system: str | None = None) -> str:
         """
         Invokes OpenAI API with the given prompt
         Args:
-            prompt: Input prompt for the model
+            prompt: Input prompt for the model, the variable part of the request
             max_tokens: Maximum tokens for response (0 uses default)
+            timeout: Per-call timeout in seconds (None uses the pool default)
+            system: Static instructions sent first as a system message, so the
+                provider can reuse its cached prefix across calls
         Returns:
             Generated response from the model
         """
+        return self.complete(prompt, max_tokens, timeout, system).text
+
+    async def ainvoke(self, prompt: str, max_tokens = 0, timeout: float | None = None, system: str | None = None) -> str:
+        """Async variant of invoke"""
+        return (await self.acomplete(prompt, max_tokens, timeout, system)).text
+
+    def complete(
+        self,
+        prompt: str,
+        max_tokens = 0,
+        timeout: float | None = None,
+        system: str | None = None,
+        response_format: dict | None = None,
+    ) -> Completion:
+        """
+        Same as invoke but also returns the token usage of the call
+        Args:
+            response_format: Structured output constraint passed to the API,
+                e.g. a JSON schema (None for free text)
+        """
+        request, key = self._prepare(prompt, max_tokens, system, response_format)
+        cached = self._cached(key)
+        if cached is not None:
+            return Completion(cached, cached=True)
+
+        def create() -> Completion:
+            with observe_call(type(self).__name__) as call:
+                send = lambda: self.pool.create(**request, timeout=timeout, on_wait=call.waited, priority=self.priority)
+                response = send() if self.hedger is None else self.hedger.call(send)
+                return self._completion(key, response, call)
+
+        if self.flight is None:
+            return create()
+        completion, shared = self.flight.do(self._flight_key(request), create)
+        return self._shared(completion) if shared else completion
+
+    async def acomplete(
+        self,
+        prompt: str,
+        max_tokens = 0,
+        timeout: float | None = None,
+        system: str | None = None,
+        response_format: dict | None = None,
+    ) -> Completion:
+        """Async variant of complete"""
+        request, key = self._prepare(prompt, max_tokens, system, response_format)
+        cached = self._cached(key)
+        if cached is not None:
+            return Completion(cached, cached=True)
+
+        async def create() -> Completion:
+            with observe_call(type(self).__name__) as call:
+                send = lambda: self.pool.acreate(**request, timeout=timeout, on_wait=call.waited, priority=self.priority)
+                response = await (send() if self.hedger is None else self.hedger.acall(send))
+                return self._completion(key, response, call)
+
+        if self.flight is None:
+            return await create()
+        completion, shared = await self.flight.ado(self._flight_key(request), create)
+        return self._shared(completion) if shared else completion
+
+    def stream(self, prompt: str, max_tokens = 0, timeout: float | None = None, system: str | None = None) -> Iterator[str]:
+        """
+        Invokes OpenAI API with the given prompt and yields the response as it is generated
+        Args:
+            prompt: Input prompt for the model, the variable part of the request
+            max_tokens: Maximum tokens for response (0 uses default)
+            timeout: Per-call timeout in seconds (None uses the pool default)
+            system: Static instructions sent first as a system message
+        Returns:
+            Iterator over response fragments, a cached response comes back as one fragment
+        """
+        request, key = self._prepare(prompt, max_tokens, system)
+        cached = self._cached(key)
+        if cached is not None:
+            yield cached
+            return
+
+        parts, finished = [], []
+        with observe_call(type(self).__name__) as call:
+            for part in self.pool.stream(
+                **request, timeout=timeout, on_wait=call.waited, priority=self.priority, on_finish=finished.append
+            ):
+                parts.append(part)
+                yield part
+            # Only complete streams are cached, an abandoned one never reaches this point
+            self._streamed(key, request, "".join(parts), call, finished[-1] if finished else None)
+
+    async def astream(self, prompt: str, max_tokens = 0, timeout: float | None = None, system: str | None = None) -> AsyncIterator[str]:
+        """Async variant of stream"""
+        request, key = self._prepare(prompt, max_tokens, system)
+        cached = self._cached(key)
+        if cached is not None:
+            yield cached
+            return
+
+        parts, finished = [], []
+        with observe_call(type(self).__name__) as call:
+            async for part in self.pool.astream(
+                **request, timeout=timeout, on_wait=call.waited, priority=self.priority, on_finish=finished.append
+            ):
+                parts.append(part)
+                yield part
+            self._streamed(key, request, "".join(parts), call, finished[-1] if finished else None)
+
+    def count_tokens(self, text: str) -> int:
+        """Counts tokens of a text with this agent's model tokenizer"""
+        return count_tokens(text, self.model)
+
+    def cacheable(self, content: str) -> bool:
+        """Whether a complete response may be cached, agents validating their output override this"""
+        return True
+
+    def _prepare(
+        self,
+        prompt: str,
+        max_tokens: int,
+        system: str | None = None,
+        response_format: dict | None = None,
+    ) -> tuple[dict, str | None]:
+        """Builds the completion arguments and the cache key (None when not caching)"""
         max_tokens = self.max_tokens if max_tokens == 0 else max_tokens
-        response = self.client.chat.completions.create(
-            model=self.model, 
-            messages=[{"role": "user", "content": prompt}], 
-            max_tokens=max_tokens
+        # Static system prefix first, variable content last
+        messages = [{"role": "user", "content": prompt}]
+        if system is not None:
+            messages.insert(0, {"role": "system", "content": system})
+        request = {
+            "model": self.model,
+            "messages": messages,
+            "max_tokens": max_tokens,
+        }
+        if response_format is not None:
+            request["response_format"] = response_format
+        key = None
+        if self.cache is not None:
+            cached_prompt = prompt if system is None else messages
+            if response_format is not None:
+                # The same prompt answered under a schema is a different response
+                cached_prompt = [*messages, response_format]
+            key = ResponseCache.key(self.model, cached_prompt, max_tokens)
+        return request, key
+
+    @staticmethod
+    def _flight_key(request: dict) -> str:
+        """Identity of a request for single-flight coalescing, independent of the response cache"""
+        return ResponseCache.key(
+            request["model"],
+            [request["messages"], request.get("response_format")],
+            request["max_tokens"],
         )
-        return response.choices[0].message.content
+
+    @staticmethod
+    def _shared(completion: Completion) -> Completion:
+        """A completion received from another caller's call, its tokens were counted there"""
+        return completion._replace(prompt_tokens=0, completion_tokens=0, cached=True)
+
+    def _completion(self, key: str | None, response, call: CallObservation) -> Completion:
+        """Caches a chat completion response, records its usage and converts it to a Completion"""
+        content = response.choices[0].message.content
+        finish_reason = response.choices[0].finish_reason or "stop"
+        self._store(key, content, finish_reason)
+        usage = response.usage
+        prompt_tokens = usage.prompt_tokens if usage else 0
+        completion_tokens = usage.completion_tokens if usage else 0
+        details = getattr(usage, "prompt_tokens_details", None)
+        cached_tokens = (details.cached_tokens or 0) if details else 0
+        token_usage.record(type(self).__name__, prompt_tokens, completion_tokens, cached_tokens)
+        call.tokens(prompt_tokens, completion_tokens, cached_tokens)
+        return Completion(content, prompt_tokens, completion_tokens, finish_reason=finish_reason)
+
+    def _streamed(
+        self, key: str | None, request: dict, content: str, call: CallObservation, finish_reason: str | None
+    ) -> None:
+        """Caches a finished stream and records its locally estimated usage"""
+        self._store(key, content, finish_reason or "stop")
+        prompt_tokens = sum(self.count_tokens(message["content"]) for message in request["messages"])
+        completion_tokens = self.count_tokens(content)
+        token_usage.record(type(self).__name__, prompt_tokens, completion_tokens)
+        call.tokens(prompt_tokens, completion_tokens)
+
+    def _cached(self, key: str | None) -> str | None:
+        if key is None:
+            return None
+        cached = self.cache.get(key, agent=type(self).__name__)
+        if cached is not None:
+            token_usage.record(type(self).__name__, cache_hit=True)
+            record_cache_hit(type(self).__name__)
+        return cached
+
+    def _store(self, key: str | None, content: str | None, finish_reason: str) -> None:
+        """Caches a response, unless it was cut off or filtered, or fails the agent's validation"""
+        if key is not None and content is not None and finish_reason == "stop" and self.cacheable(content):
+            self.cache.set(key, content)
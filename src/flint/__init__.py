@@ -0,0 +1,14 @@
+from .frame_store import FrameStore, StoredFrames, content_hash, get_frame_store
+from .frames import ActFrame, DutyFrame, FactFrame, FlintFrames, with_tables
+
+__all__ = [
+    "ActFrame",
+    "DutyFrame",
+    "FactFrame",
+    "FlintFrames",
+    "FrameStore",
+    "StoredFrames",
+    "content_hash",
+    "get_frame_store",
+    "with_tables",
+]
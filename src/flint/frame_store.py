@@ -0,0 +1,178 @@
+"""
+Persistent store of precomputed FLINT frames.
+
+FLINT output only depends on the regulation text (and the model), so frames
+are stored once per (content hash, model) with their source ID. Looking a
+regulation up here replaces the slowest LLM call of the regulation workflow
+with a key lookup.
+
+For incremental regeneration the store also keeps the frames of every
+paragraph block a source was generated from, keyed by the block's content,
+and the block layout of each source's latest version (see incremental).
+"""
+
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+from typing import NamedTuple
+from dotenv import load_dotenv
+
+# Load environment variables from a .env file
+load_dotenv()
+
+
+def content_hash(text: str) -> str:
+    """Hash identifying a regulation text, insensitive to surrounding whitespace"""
+    return hashlib.sha256(text.strip().encode("utf-8")).hexdigest()
+
+
+class StoredFrames(NamedTuple):
+    """FLINT frames generated for one regulation text"""
+    source_id: str
+    content_hash: str
+    model: str
+    frames: str
+    created: float
+
+
+class FrameStore:
+    """
+    SQLite backed FLINT frame store
+    - FLINT_FRAME_STORE_PATH: SQLite file (default: .cache/flint_frames.sqlite)
+    """
+
+    def __init__(self, path: str | None = None):
+        self.path = path or os.getenv("FLINT_FRAME_STORE_PATH", ".cache/flint_frames.sqlite")
+        if self.path != ":memory:":
+            os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(self.path, check_same_thread=False)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute(
+            """CREATE TABLE IF NOT EXISTS frames (
+                content_hash TEXT NOT NULL,
+                model TEXT NOT NULL,
+                source_id TEXT NOT NULL,
+                frames TEXT NOT NULL,
+                created REAL NOT NULL,
+                PRIMARY KEY (content_hash, model)
+            )"""
+        )
+        self._db.execute(
+            """CREATE TABLE IF NOT EXISTS frame_blocks (
+                block_hash TEXT NOT NULL,
+                model TEXT NOT NULL,
+                frames TEXT NOT NULL,
+                created REAL NOT NULL,
+                PRIMARY KEY (block_hash, model)
+            )"""
+        )
+        self._db.execute(
+            """CREATE TABLE IF NOT EXISTS source_blocks (
+                source_id TEXT NOT NULL,
+                model TEXT NOT NULL,
+                content_hash TEXT NOT NULL,
+                blocks TEXT NOT NULL,
+                updated REAL NOT NULL,
+                PRIMARY KEY (source_id, model)
+            )"""
+        )
+        self._db.commit()
+
+    def reopen(self) -> None:
+        """Opens a new connection in a forked worker, SQLite connections must not cross a fork"""
+        if self.path == ":memory:":
+            # Nothing to reopen, the copied database is the worker's own
+            return
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(self.path, check_same_thread=False)
+
+    def get(self, content_hash: str, model: str) -> StoredFrames | None:
+        """Returns the frames generated for a regulation text by a model"""
+        with self._lock:
+            row = self._db.execute(
+                "SELECT source_id, content_hash, model, frames, created FROM frames"
+                " WHERE content_hash = ? AND model = ?",
+                (content_hash, model),
+            ).fetchone()
+        return StoredFrames(*row) if row else None
+
+    def put(self, source_id: str, content_hash: str, model: str, frames: str) -> None:
+        """Stores frames, replacing any earlier frames for the same text and model"""
+        with self._lock:
+            self._db.execute(
+                "INSERT OR REPLACE INTO frames (content_hash, model, source_id, frames, created)"
+                " VALUES (?, ?, ?, ?, ?)",
+                (content_hash, model, source_id, frames, time.time()),
+            )
+            self._db.commit()
+
+    def get_block(self, block_hash: str, model: str) -> str | None:
+        """Returns the frames generated for one paragraph block"""
+        with self._lock:
+            row = self._db.execute(
+                "SELECT frames FROM frame_blocks WHERE block_hash = ? AND model = ?", (block_hash, model)
+            ).fetchone()
+        return row[0] if row else None
+
+    def put_block(self, block_hash: str, model: str, frames: str) -> None:
+        with self._lock:
+            self._db.execute(
+                "INSERT OR REPLACE INTO frame_blocks (block_hash, model, frames, created) VALUES (?, ?, ?, ?)",
+                (block_hash, model, frames, time.time()),
+            )
+            self._db.commit()
+
+    def get_layout(self, source_id: str, model: str) -> list[dict] | None:
+        """
+        Returns:
+            The blocks of the source's latest version, each {"hash": block hash,
+            "paragraphs": paragraph hashes}, None when it was never generated by block
+        """
+        with self._lock:
+            row = self._db.execute(
+                "SELECT blocks FROM source_blocks WHERE source_id = ? AND model = ?", (source_id, model)
+            ).fetchone()
+        return json.loads(row[0]) if row else None
+
+    def put_layout(self, source_id: str, content_hash: str, model: str, frames: str, blocks: list[dict]) -> None:
+        """Stores the frames of a source version together with the blocks they were generated from"""
+        now = time.time()
+        with self._lock:
+            self._db.execute(
+                "INSERT OR REPLACE INTO frames (content_hash, model, source_id, frames, created)"
+                " VALUES (?, ?, ?, ?, ?)",
+                (content_hash, model, source_id, frames, now),
+            )
+            self._db.execute(
+                "INSERT OR REPLACE INTO source_blocks (source_id, model, content_hash, blocks, updated)"
+                " VALUES (?, ?, ?, ?, ?)",
+                (source_id, model, content_hash, json.dumps(blocks), now),
+            )
+            self._db.commit()
+
+    def __len__(self) -> int:
+        with self._lock:
+            return self._db.execute("SELECT COUNT(*) FROM frames").fetchone()[0]
+
+
+_store: FrameStore | None = None
+_store_lock = threading.Lock()
+
+
+def get_frame_store() -> FrameStore | None:
+    """
+    Returns the process-wide frame store, or None when disabled with
+    FLINT_FRAME_STORE_ENABLED=false
+    """
+    global _store
+    if os.getenv("FLINT_FRAME_STORE_ENABLED", "true").lower() != "true":
+        return None
+    if _store is None:
+        with _store_lock:
+            if _store is None:
+                _store = FrameStore()
+    return _store
@@ -0,0 +1,169 @@
+"""
+Typed FLINT frames for the structured (JSON-only) output mode.
+
+The model returns schema-conformant JSON with ACT, FACT and DUTY frames,
+which is parsed into compact slots-based objects. Tables are rendered from
+these objects on demand instead of being generated by the model.
+"""
+
+import json
+import re
+from dataclasses import asdict, dataclass, field, fields
+
+# Some models wrap JSON in a markdown code fence even in JSON mode
+CODE_FENCE = re.compile(r"^```(?:json)?\s*|\s*```$")
+
+
+@dataclass(slots=True)
+class ActFrame:
+    act: str
+    action: str
+    actor: str
+    object: str
+    recipient: str
+    precondition: str
+    creating_postcondition: str
+    terminating_postcondition: str
+    sources: str
+
+
+@dataclass(slots=True)
+class FactFrame:
+    function: str
+    sources: str
+
+
+@dataclass(slots=True)
+class DutyFrame:
+    duty: str
+    duty_holder: str
+    claimant: str
+    creating_act: str
+    enforcing_act: str
+    terminating_act: str
+    sources: str
+
+
+@dataclass(slots=True)
+class FlintFrames:
+    """ACT, FACT and DUTY frames generated for a regulation"""
+    acts: list[ActFrame] = field(default_factory=list)
+    facts: list[FactFrame] = field(default_factory=list)
+    duties: list[DutyFrame] = field(default_factory=list)
+
+    @classmethod
+    def from_dict(cls, data: dict) -> "FlintFrames":
+        """Builds frames from parsed JSON, missing fields become empty strings"""
+        return cls(
+            acts=[_frame(ActFrame, item) for item in data.get("acts", [])],
+            facts=[_frame(FactFrame, item) for item in data.get("facts", [])],
+            duties=[_frame(DutyFrame, item) for item in data.get("duties", [])],
+        )
+
+    @classmethod
+    def parse(cls, text: str) -> "FlintFrames":
+        """
+        Parses model output
+        Raises:
+            ValueError: Output is not valid JSON, e.g. cut off by max_tokens, or not an object of frame lists
+        """
+        try:
+            data = json.loads(CODE_FENCE.sub("", text.strip()))
+        except json.JSONDecodeError as e:
+            raise ValueError(f"Invalid FLINT JSON: {e}") from e
+        if not isinstance(data, dict):
+            raise ValueError(f"Invalid FLINT JSON: expected an object, got {type(data).__name__}")
+        try:
+            return cls.from_dict(data)
+        except (AttributeError, TypeError) as e:
+            raise ValueError(f"Invalid FLINT JSON: frames must be lists of objects ({e})") from e
+
+    def to_dict(self) -> dict:
+        return asdict(self)
+
+    def to_json(self) -> str:
+        """Compact JSON, the form stored and returned to clients"""
+        return json.dumps(self.to_dict(), ensure_ascii=False, separators=(",", ":"))
+
+    def extend(self, other: "FlintFrames") -> None:
+        """Appends the frames of another regulation part"""
+        self.acts.extend(other.acts)
+        self.facts.extend(other.facts)
+        self.duties.extend(other.duties)
+
+    def dedupe_facts(self) -> None:
+        """
+        Merges FACT frames with the same function, which sections of one
+        regulation often share, keeping the first and combining their sources
+        """
+        merged: dict[str, FactFrame] = {}
+        for fact in self.facts:
+            key = " ".join(fact.function.casefold().split())
+            first = merged.get(key)
+            if first is None:
+                merged[key] = fact
+            elif fact.sources and fact.sources not in first.sources:
+                first.sources = f"{first.sources}; {fact.sources}" if first.sources else fact.sources
+        self.facts = list(merged.values())
+
+    def render_tables(self) -> str:
+        """Renders the frames as the Property/Value tables of the text mode"""
+        sections = []
+        for title, frames in (("Act Frame", self.acts), ("Fact Frame", self.facts), ("Duty Frame", self.duties)):
+            for n, frame in enumerate(frames, 1):
+                rows = [f"| {_label(f.name)} | {getattr(frame, f.name)} |" for f in fields(frame)]
+                sections.append("\n".join([f"### {title} {n}", "| Property | Value |", "| --- | --- |", *rows]))
+        return "\n\n".join(sections)
+
+
+def _frame(frame_type, item: dict):
+    return frame_type(**{f.name: str(item.get(f.name, "")) for f in fields(frame_type)})
+
+
+def _label(name: str) -> str:
+    return name.replace("_", " ").capitalize()
+
+
+def _object_schema(frame_type) -> dict:
+    names = [f.name for f in fields(frame_type)]
+    return {
+        "type": "object",
+        "properties": {name: {"type": "string"} for name in names},
+        "required": names,
+        "additionalProperties": False,
+    }
+
+
+# Strict JSON schema passed as response_format, mirrors the dataclasses above
+FLINT_RESPONSE_FORMAT = {
+    "type": "json_schema",
+    "json_schema": {
+        "name": "flint_frames",
+        "strict": True,
+        "schema": {
+            "type": "object",
+            "properties": {
+                "acts": {"type": "array", "items": _object_schema(ActFrame)},
+                "facts": {"type": "array", "items": _object_schema(FactFrame)},
+                "duties": {"type": "array", "items": _object_schema(DutyFrame)},
+            },
+            "required": ["acts", "facts", "duties"],
+            "additionalProperties": False,
+        },
+    },
+}
+
+
+def with_tables(response: dict) -> dict:
+    """
+    Replaces JSON frames in an answer with rendered tables, for clients that
+    ask for format "table"
+    Args:
+        response: Answer as returned by the workflows
+    Returns:
+        The answer, with "response" rendered when it holds frames
+    """
+    frames = response.get("response")
+    if not isinstance(frames, dict):
+        return response
+    return {**response, "response": FlintFrames.from_dict(frames).render_tables()}
@@ -0,0 +1,275 @@
+"""
+Incremental FLINT regeneration for amended regulations.
+
+A source's text is split into paragraphs, and the paragraphs into blocks of a
+few consecutive paragraphs. Frames are generated per block, so every frame is
+linked to the paragraphs it came from, and stored under the block's content.
+Block boundaries are content defined (a paragraph ends a block when its hash
+says so, or when the block reaches the input budget), so an amended paragraph
+only changes the block it sits in and at most its neighbour, while every
+other block, and its frames, is identical to the previous version.
+
+On every run the current text of each source is compared with the paragraphs
+of its previous version. Blocks whose paragraphs are unchanged carry their
+frames over, the others are regenerated, and the merged frames are stored for
+the whole source as the regulation workflow expects. Sources never generated
+by block are generated in full on their first run, which is also how to
+precompute them from scratch.
+
+Frames describing obligations that span two blocks are generated from each
+block on its own, the same trade-off as the map-reduce FLINT mode.
+
+Usage:
+    python -m src.flint.incremental [--workers 4] [--rpm 60] [--source ORC_4709.09 ...] [--report report.json]
+"""
+
+import argparse
+import json
+import os
+import re
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from difflib import SequenceMatcher
+from typing import NamedTuple
+from ..agents import FlintFormatterAgent, RegulationAgent
+from ..agents.flint_formatter_agent import merge_completions
+from ..base import Completion
+from ..llm import count_tokens
+from .frame_store import FrameStore, content_hash, get_frame_store
+from .frames import FlintFrames
+from .precompute import RateLimiter
+
+PARAGRAPH_BREAK = re.compile(r"\n\s*\n")
+# Frame headings of the text output mode, e.g. "### Act Frame 2" or "Duty Frame"
+TEXT_FRAME = re.compile(r"^\W*(?:act|fact|duty)\s+frame\b", re.I | re.M)
+
+
+class Block(NamedTuple):
+    """Consecutive paragraphs of a source, generated in one call"""
+    hash: str
+    paragraphs: list[str]
+    text: str
+
+
+class UpdateReport(NamedTuple):
+    """Outcome of updating one source"""
+    source_id: str
+    status: str
+    paragraphs_unchanged: int = 0
+    paragraphs_added: int = 0
+    paragraphs_removed: int = 0
+    blocks_reused: int = 0
+    blocks_regenerated: int = 0
+    frames_reused: int = 0
+    frames_regenerated: int = 0
+    prompt_tokens: int = 0
+    completion_tokens: int = 0
+
+    def to_dict(self) -> dict:
+        return self._asdict()
+
+
+def split_paragraphs(source_id: str, text: str) -> list[str]:
+    """Paragraphs of a source text without the source ID prefixes of its chunks"""
+    prefix = f"{source_id}: "
+    paragraphs = []
+    for paragraph in PARAGRAPH_BREAK.split(text):
+        paragraph = paragraph.strip()
+        if paragraph.startswith(prefix):
+            paragraph = paragraph[len(prefix):].strip()
+        if paragraph:
+            paragraphs.append(paragraph)
+    return paragraphs
+
+
+def split_blocks(
+    source_id: str, paragraphs: list[str], average: int, max_tokens: int, model: str = "gpt-4o-mini"
+) -> list[Block]:
+    """
+    Groups paragraphs into content-defined blocks
+    Args:
+        average: Paragraphs per block on average, a paragraph ends a block with probability 1/average
+        max_tokens: A block ends before it would exceed this many tokens
+    """
+    blocks, current, tokens = [], [], 0
+
+    def close():
+        hashes = [content_hash(paragraph) for paragraph in current]
+        text = f"{source_id}: " + "\n\n".join(current)
+        blocks.append(Block(content_hash(text), hashes, text))
+
+    for paragraph in paragraphs:
+        size = count_tokens(paragraph, model)
+        if current and tokens + size > max_tokens:
+            close()
+            current, tokens = [], 0
+        current.append(paragraph)
+        tokens += size
+        if int(content_hash(paragraph)[:8], 16) % average == 0:
+            close()
+            current, tokens = [], 0
+    if current:
+        close()
+    return blocks
+
+
+def count_frames(frames: str, structured: bool) -> int:
+    """Frames in generated output, counted by frame heading in the text mode"""
+    if structured:
+        parsed = FlintFrames.parse(frames)
+        return len(parsed.acts) + len(parsed.facts) + len(parsed.duties)
+    return len(TEXT_FRAME.findall(frames))
+
+
+def diff_paragraphs(previous: list[str], current: list[str]) -> tuple[int, int, int]:
+    """
+    Returns:
+        Paragraphs unchanged, added and removed between two versions (paragraph hashes)
+    """
+    unchanged = added = removed = 0
+    for tag, i1, i2, j1, j2 in SequenceMatcher(None, previous, current, autojunk=False).get_opcodes():
+        if tag == "equal":
+            unchanged += i2 - i1
+        else:
+            removed += i2 - i1
+            added += j2 - j1
+    return unchanged, added, removed
+
+
+def update_source(
+    source_id: str,
+    text: str,
+    store: FrameStore,
+    flint_agent: FlintFormatterAgent,
+    limiter: RateLimiter | None = None,
+    average: int | None = None,
+) -> UpdateReport:
+    """
+    Brings the stored frames of a source up to date with its current text
+    Args:
+        average: Paragraphs per block on average (default: FLINT_BLOCK_PARAGRAPHS env, 4)
+    Returns:
+        What was reused and regenerated, status "current" when the text already had frames
+    """
+    variant = flint_agent.variant
+    text_hash = content_hash(text)
+    layout = store.get_layout(source_id, variant)
+    if store.get(text_hash, variant) is not None:
+        return UpdateReport(source_id, "current")
+
+    average = average or int(os.getenv("FLINT_BLOCK_PARAGRAPHS", 4))
+    blocks = split_blocks(
+        source_id, split_paragraphs(source_id, text), average, flint_agent.max_input_tokens, flint_agent.model
+    )
+    previous = [paragraph for block in layout or [] for paragraph in block["paragraphs"]]
+    unchanged, added, removed = diff_paragraphs(previous, [p for block in blocks for p in block.paragraphs])
+
+    completions = []
+    counts = {"blocks_reused": 0, "blocks_regenerated": 0, "frames_reused": 0, "frames_regenerated": 0}
+    for block in blocks:
+        frames = store.get_block(block.hash, variant)
+        if frames is not None:
+            completion = Completion(frames, cached=True)
+            kind = "reused"
+        else:
+            if limiter is not None:
+                limiter.acquire()
+            completion = flint_agent.format_completion(block.text)
+            store.put_block(block.hash, variant, completion.text)
+            kind = "regenerated"
+        completions.append(completion)
+        counts[f"blocks_{kind}"] += 1
+        counts[f"frames_{kind}"] += count_frames(completion.text, flint_agent.structured)
+
+    merged = merge_completions(completions, flint_agent.structured)
+    store.put_layout(
+        source_id, text_hash, variant, merged.text,
+        [{"hash": block.hash, "paragraphs": block.paragraphs} for block in blocks],
+    )
+    return UpdateReport(
+        source_id,
+        "updated" if layout is not None else "generated",
+        unchanged, added, removed,
+        prompt_tokens=merged.prompt_tokens,
+        completion_tokens=merged.completion_tokens,
+        **counts,
+    )
+
+
+def update(
+    sources: list[str],
+    store: FrameStore,
+    regulation_agent: RegulationAgent,
+    flint_agent: FlintFormatterAgent,
+    workers: int = 4,
+    rpm: float = 60,
+) -> list[UpdateReport]:
+    """Updates the frames of many sources concurrently, returns one report per source"""
+    limiter = RateLimiter(rpm)
+    reports = []
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        futures = {}
+        for source in sources:
+            text = regulation_agent.source_text(source)
+            if text is not None:
+                futures[executor.submit(update_source, source, text, store, flint_agent, limiter)] = source
+        for future in as_completed(futures):
+            source = futures[future]
+            try:
+                report = future.result()
+            except Exception as e:
+                print(f"Failed {source}: {e}")
+                report = UpdateReport(source, "failed")
+            if report.status != "current":
+                print(
+                    f"{source} {report.status}: {report.frames_reused} frames reused, "
+                    f"{report.frames_regenerated} regenerated ({report.blocks_reused} blocks reused, "
+                    f"{report.blocks_regenerated} regenerated; paragraphs +{report.paragraphs_added} "
+                    f"-{report.paragraphs_removed})"
+                )
+            reports.append(report)
+    return reports
+
+
+def totals(reports: list[UpdateReport]) -> dict:
+    """Sums the reports of a run, with the number of sources per status"""
+    summary = {status: 0 for status in ("current", "generated", "updated", "failed")}
+    for report in reports:
+        summary[report.status] += 1
+    for name in UpdateReport._fields[2:]:
+        summary[name] = sum(getattr(report, name) for report in reports)
+    return summary
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Regenerate FLINT frames of amended regulations")
+    parser.add_argument("--workers", type=int, default=4)
+    parser.add_argument("--rpm", type=float, default=60, help="Maximum FLINT generations per minute")
+    parser.add_argument("--source", action="append", help="Only process these source IDs, repeatable")
+    parser.add_argument("--report", help="Write the run's report to this JSON file")
+    args = parser.parse_args()
+
+    store = get_frame_store() or FrameStore()
+    regulation_agent = RegulationAgent()
+    if regulation_agent.index is None:
+        raise SystemExit("No regulation index found, build one with python -m src.retrieval.build")
+    # Generated frames are stored here, the response cache would only duplicate them
+    flint_agent = FlintFormatterAgent(cache_responses=False)
+
+    started = time.time()
+    sources = args.source or list(regulation_agent.index.sources)
+    reports = update(sources, store, regulation_agent, flint_agent, args.workers, args.rpm)
+    summary = totals(reports)
+    print(", ".join(f"{name}: {count}" for name, count in summary.items()))
+    if args.report:
+        with open(args.report, "w", encoding="utf-8") as f:
+            json.dump({
+                "started": started,
+                "finished": time.time(),
+                "totals": summary,
+                "sources": [report.to_dict() for report in reports if report.status != "current"],
+            }, f, ensure_ascii=False, indent=2)
+
+
+if __name__ == "__main__":
+    main()
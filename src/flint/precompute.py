@@ -0,0 +1,106 @@
+"""
+Offline job precomputing FLINT frames for every source in the regulation index.
+
+Frames are committed to the frame store one source at a time, and sources
+whose current text already has frames are skipped, so rerunning after a crash
+resumes where the previous run stopped.
+
+Usage:
+    python -m src.flint.precompute [--workers 4] [--rpm 60] [--source ORC_4709.09 ...]
+"""
+
+import argparse
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from ..agents import FlintFormatterAgent, RegulationAgent
+from .frame_store import FrameStore, content_hash, get_frame_store
+
+
+class RateLimiter:
+    """Spaces calls evenly so no more than rpm start per minute across all workers"""
+
+    def __init__(self, rpm: float):
+        self.interval = 60.0 / rpm if rpm > 0 else 0.0
+        self._lock = threading.Lock()
+        self._next = time.monotonic()
+
+    def acquire(self) -> None:
+        with self._lock:
+            now = time.monotonic()
+            start = max(now, self._next)
+            self._next = start + self.interval
+        time.sleep(start - now)
+
+
+def precompute(
+    sources: list[str],
+    store: FrameStore,
+    regulation_agent: RegulationAgent,
+    flint_agent: FlintFormatterAgent,
+    workers: int = 4,
+    rpm: float = 60,
+) -> dict:
+    """
+    Generates and stores frames for sources that do not have them yet
+    Args:
+        sources: Source IDs to process
+        store: Frame store receiving the frames
+        regulation_agent: Provides the indexed text of each source
+        flint_agent: Generates the frames
+        workers: Concurrent FLINT generations
+        rpm: Maximum generations started per minute
+    Returns:
+        Counts of generated, skipped and failed sources
+    """
+    limiter = RateLimiter(rpm)
+    counts = {"generated": 0, "skipped": 0, "failed": 0}
+
+    pending = []
+    for source in sources:
+        text = regulation_agent.source_text(source)
+        if text is None or store.get(content_hash(text), flint_agent.variant) is not None:
+            counts["skipped"] += 1
+        else:
+            pending.append((source, text))
+
+    def generate(source: str, text: str) -> None:
+        limiter.acquire()
+        frames = flint_agent.format(text)
+        store.put(source, content_hash(text), flint_agent.variant, frames)
+
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        futures = {executor.submit(generate, source, text): source for source, text in pending}
+        for done, future in enumerate(as_completed(futures), 1):
+            source = futures[future]
+            try:
+                future.result()
+                counts["generated"] += 1
+            except Exception as e:
+                counts["failed"] += 1
+                print(f"Failed {source}: {e}")
+            print(f"[{done}/{len(pending)}] {source}")
+    return counts
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Precompute FLINT frames for the regulation corpus")
+    parser.add_argument("--workers", type=int, default=4)
+    parser.add_argument("--rpm", type=float, default=60, help="Maximum FLINT generations per minute")
+    parser.add_argument("--source", action="append", help="Only process these source IDs, repeatable")
+    args = parser.parse_args()
+
+    store = get_frame_store() or FrameStore()
+    regulation_agent = RegulationAgent()
+    if regulation_agent.index is None:
+        raise SystemExit("No regulation index found, build one with python -m src.retrieval.build")
+    # Generated frames are stored here, the response cache would only duplicate them
+    flint_agent = FlintFormatterAgent(cache_responses=False)
+
+    sources = args.source or list(regulation_agent.index.sources)
+    counts = precompute(sources, store, regulation_agent, flint_agent, args.workers, args.rpm)
+    print(", ".join(f"{name}: {count}" for name, count in counts.items()))
+
+
+if __name__ == "__main__":
+    main()
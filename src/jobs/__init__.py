@@ -0,0 +1,11 @@
+from .store import DONE, FAILED, QUEUED, RUNNING, Job, JobStore, get_job_store
+
+__all__ = [
+    "DONE",
+    "FAILED",
+    "QUEUED",
+    "RUNNING",
+    "Job",
+    "JobStore",
+    "get_job_store",
+]
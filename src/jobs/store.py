@@ -0,0 +1,250 @@
+"""
+Durable job queue for questions answered in the background.
+
+Jobs live in a SQLite file, so queued and finished jobs survive restarts and
+any number of worker processes can share the queue with the web servers. A
+worker claims a job with a lease; when a worker dies mid-job the lease runs
+out and the job is queued again, until it has used up its attempts.
+"""
+
+import asyncio
+import json
+import math
+import os
+import sqlite3
+import threading
+import time
+import uuid
+from typing import NamedTuple
+from dotenv import load_dotenv
+
+# Load environment variables from a .env file
+load_dotenv()
+
+QUEUED = "queued"
+RUNNING = "running"
+DONE = "done"
+FAILED = "failed"
+
+
+class Job(NamedTuple):
+    """A question answered in the background and its outcome"""
+    id: str
+    question: str
+    status: str
+    result: dict | None
+    error: str | None
+    attempts: int
+    created: float
+    started: float | None
+    finished: float | None
+
+    def to_dict(self) -> dict:
+        return self._asdict()
+
+
+class JobStore:
+    """
+    SQLite backed job queue
+    - JOB_STORE_PATH: SQLite file (default: .cache/jobs.sqlite)
+    - JOB_LEASE: Seconds a worker may hold a job before it is handed out again (default: 600)
+    - JOB_MAX_ATTEMPTS: Runs of a job before it is marked failed (default: 3)
+    - JOB_MAX_WAIT: Longest long poll in seconds, longer waits are cut to it (default: 60)
+    """
+
+    COLUMNS = "id, question, status, result, error, attempts, created, started, finished"
+
+    def __init__(self, path: str | None = None):
+        self.path = path or os.getenv("JOB_STORE_PATH", ".cache/jobs.sqlite")
+        self.lease = float(os.getenv("JOB_LEASE", 600))
+        self.max_attempts = int(os.getenv("JOB_MAX_ATTEMPTS", 3))
+        self.max_wait = float(os.getenv("JOB_MAX_WAIT", 60))
+        if self.path != ":memory:":
+            os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+        self._lock = threading.Lock()
+        # Jobs finished in this process wake up its long-polling readers at once
+        self._finished = threading.Condition(self._lock)
+        # Autocommit, claims open their own IMMEDIATE transaction to lock out other processes
+        self._db = sqlite3.connect(self.path, check_same_thread=False, isolation_level=None, timeout=30)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute(
+            """CREATE TABLE IF NOT EXISTS jobs (
+                id TEXT PRIMARY KEY,
+                question TEXT NOT NULL,
+                status TEXT NOT NULL,
+                result TEXT,
+                error TEXT,
+                attempts INTEGER NOT NULL DEFAULT 0,
+                created REAL NOT NULL,
+                started REAL,
+                finished REAL,
+                lease_until REAL,
+                lease_owner TEXT
+            )"""
+        )
+        columns = {row[1] for row in self._db.execute("PRAGMA table_info(jobs)")}
+        if "lease_owner" not in columns:
+            # Stores created before leases had owners
+            self._db.execute("ALTER TABLE jobs ADD COLUMN lease_owner TEXT")
+        self._db.execute("CREATE INDEX IF NOT EXISTS jobs_status ON jobs (status, created)")
+
+    def reopen(self) -> None:
+        """Opens a new connection in a forked worker, SQLite connections must not cross a fork"""
+        if self.path == ":memory:":
+            # Nothing to reopen, the copied database is the worker's own
+            return
+        self._lock = threading.Lock()
+        self._finished = threading.Condition(self._lock)
+        self._db = sqlite3.connect(self.path, check_same_thread=False, isolation_level=None, timeout=30)
+
+    def submit(self, question: str) -> Job:
+        """Queues a question and returns its job"""
+        job = Job(uuid.uuid4().hex, question, QUEUED, None, None, 0, time.time(), None, None)
+        with self._lock:
+            self._db.execute(
+                "INSERT INTO jobs (id, question, status, attempts, created) VALUES (?, ?, ?, 0, ?)",
+                (job.id, job.question, job.status, job.created),
+            )
+        return job
+
+    def get(self, job_id: str) -> Job | None:
+        with self._lock:
+            row = self._db.execute(f"SELECT {self.COLUMNS} FROM jobs WHERE id = ?", (job_id,)).fetchone()
+        return self._job(row) if row else None
+
+    def claim(self, owner: str) -> Job | None:
+        """
+        Takes the oldest queued job, or a running job whose lease ran out
+        Args:
+            owner: Worker taking the lease, only it can finish the job until the lease runs out
+        Returns:
+            The job, now running under a fresh lease, or None when the queue is empty
+        """
+        now = time.time()
+        with self._lock:
+            self._db.execute("BEGIN IMMEDIATE")
+            try:
+                self._expire(now)
+                row = self._db.execute(
+                    f"SELECT {self.COLUMNS} FROM jobs WHERE status = ? ORDER BY created LIMIT 1", (QUEUED,)
+                ).fetchone()
+                if row is not None:
+                    self._db.execute(
+                        "UPDATE jobs SET status = ?, attempts = attempts + 1, started = ?, lease_until = ?, lease_owner = ?"
+                        " WHERE id = ?",
+                        (RUNNING, now, now + self.lease, owner, row[0]),
+                    )
+                self._db.execute("COMMIT")
+            except BaseException:
+                self._db.execute("ROLLBACK")
+                raise
+        if row is None:
+            return None
+        return self._job(row)._replace(status=RUNNING, attempts=row[5] + 1, started=now)
+
+    def _expire(self, now: float) -> None:
+        """Requeues jobs whose worker went away, or fails them once out of attempts"""
+        self._db.execute(
+            "UPDATE jobs SET status = ?, error = ?, finished = ? WHERE status = ? AND lease_until < ? AND attempts >= ?",
+            (FAILED, "Job lease expired too often", now, RUNNING, now, self.max_attempts),
+        )
+        self._db.execute(
+            "UPDATE jobs SET status = ? WHERE status = ? AND lease_until < ?",
+            (QUEUED, RUNNING, now),
+        )
+
+    def complete(self, job_id: str, result: dict, owner: str) -> bool:
+        return self._finish(job_id, owner, DONE, json.dumps(result), None)
+
+    def fail(self, job_id: str, error: str, owner: str) -> bool:
+        return self._finish(job_id, owner, FAILED, None, error)
+
+    def _finish(self, job_id: str, owner: str, status: str, result: str | None, error: str | None) -> bool:
+        """
+        Stores the outcome of a job while owner still holds its lease
+        Returns:
+            False when another worker claimed the job since, its outcome is kept instead
+        """
+        with self._finished:
+            cursor = self._db.execute(
+                "UPDATE jobs SET status = ?, result = ?, error = ?, finished = ?, lease_until = NULL"
+                " WHERE id = ? AND lease_owner = ?",
+                (status, result, error, time.time(), job_id, owner),
+            )
+            self._finished.notify_all()
+        return cursor.rowcount > 0
+
+    def parse_wait(self, value: str | None) -> float:
+        """
+        Seconds to long-poll from a ?wait= query parameter, capped to JOB_MAX_WAIT
+        Raises:
+            ValueError: When the value is not a finite number of seconds >= 0
+        """
+        if value is None:
+            return 0.0
+        try:
+            wait = float(value)
+        except ValueError:
+            wait = math.nan
+        if not math.isfinite(wait) or wait < 0:
+            raise ValueError(f"wait must be a number of seconds >= 0, got {value!r}")
+        return min(wait, self.max_wait)
+
+    def wait(self, job_id: str, timeout: float) -> Job | None:
+        """
+        Long-polls a job until it is finished or the timeout passes
+        Jobs finished by another process are noticed by polling the database
+        Returns:
+            The job in its latest state, None when it does not exist
+        """
+        deadline = time.monotonic() + timeout
+        while True:
+            job = self.get(job_id)
+            left = deadline - time.monotonic()
+            if job is None or job.status in (DONE, FAILED) or left <= 0:
+                return job
+            with self._finished:
+                self._finished.wait(min(left, 0.5))
+
+    async def await_job(self, job_id: str, timeout: float) -> Job | None:
+        """Async variant of wait, polls without blocking the event loop"""
+        deadline = time.monotonic() + timeout
+        while True:
+            job = self.get(job_id)
+            left = deadline - time.monotonic()
+            if job is None or job.status in (DONE, FAILED) or left <= 0:
+                return job
+            await asyncio.sleep(min(left, 0.2))
+
+    def purge(self, older_than: float) -> int:
+        """Deletes jobs finished more than older_than seconds ago, returns how many"""
+        with self._lock:
+            cursor = self._db.execute(
+                "DELETE FROM jobs WHERE status IN (?, ?) AND finished < ?", (DONE, FAILED, time.time() - older_than)
+            )
+        return cursor.rowcount
+
+    def stats(self) -> dict:
+        """Number of jobs per status"""
+        with self._lock:
+            rows = self._db.execute("SELECT status, COUNT(*) FROM jobs GROUP BY status").fetchall()
+        return {QUEUED: 0, RUNNING: 0, DONE: 0, FAILED: 0, **dict(rows)}
+
+    @staticmethod
+    def _job(row: tuple) -> Job:
+        job = Job(*row)
+        return job._replace(result=json.loads(job.result)) if job.result is not None else job
+
+
+_store: JobStore | None = None
+_store_lock = threading.Lock()
+
+
+def get_job_store() -> JobStore:
+    """Returns the process-wide job store"""
+    global _store
+    if _store is None:
+        with _store_lock:
+            if _store is None:
+                _store = JobStore()
+    return _store
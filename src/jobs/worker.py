@@ -0,0 +1,128 @@
+"""
+Worker pool answering queued jobs through the shared router workflow.
+
+Workers run inside the web server (JOB_WORKERS) or as separate processes
+sharing the same job store, so job throughput scales independently of the
+web threads:
+
+    python -m src.jobs.worker --workers 8
+"""
+
+import argparse
+import os
+import threading
+import time
+import uuid
+from dotenv import load_dotenv
+from .store import JobStore, get_job_store
+
+# Load environment variables from a .env file
+load_dotenv()
+
+
+class JobWorkers:
+    """
+    Threads claiming jobs from the store and running them
+    - JOB_WORKERS: Worker threads started by the servers, 0 leaves jobs to separate worker processes (default: 2)
+    - JOB_POLL_INTERVAL: Seconds an idle worker waits before looking for jobs again (default: 0.5)
+    - JOB_RETENTION: Seconds finished jobs are kept before being purged (default: 86400)
+    """
+
+    def __init__(self, store: JobStore | None = None, workers: int | None = None):
+        self.store = store or get_job_store()
+        self.workers = workers if workers is not None else int(os.getenv("JOB_WORKERS", 2))
+        self.poll_interval = float(os.getenv("JOB_POLL_INTERVAL", 0.5))
+        self.retention = float(os.getenv("JOB_RETENTION", 86400))
+        self._stop = threading.Event()
+        self._threads: list[threading.Thread] = []
+        self._lock = threading.Lock()
+        self.completed = 0
+        self.failed = 0
+
+    def start(self) -> "JobWorkers":
+        """Starts the worker threads, a second call does nothing"""
+        with self._lock:
+            if not self._threads:
+                self._threads = [
+                    threading.Thread(target=self._run, name=f"job-worker-{n}", daemon=True)
+                    for n in range(self.workers)
+                ]
+                for thread in self._threads:
+                    thread.start()
+        return self
+
+    def stop(self, timeout: float | None = None) -> None:
+        """Stops claiming jobs and waits for running ones, unfinished jobs are retried after their lease"""
+        self._stop.set()
+        for thread in self._threads:
+            thread.join(timeout)
+
+    def _run(self) -> None:
+        # Identifies this thread's leases, a job it took too long on may have been claimed by another worker
+        owner = uuid.uuid4().hex
+        last_purge = 0.0
+        while not self._stop.is_set():
+            if time.monotonic() - last_purge > 3600:
+                self.store.purge(self.retention)
+                last_purge = time.monotonic()
+            job = self.store.claim(owner)
+            if job is None:
+                self._stop.wait(self.poll_interval)
+                continue
+            self.run_job(job.id, job.question, owner)
+
+    def run_job(self, job_id: str, question: str, owner: str) -> None:
+        """Answers a job claimed by owner and stores the outcome unless the lease was lost"""
+        # Imported here so the store can be used without compiling the workflows
+        from ..workflows.answer import answer
+
+        try:
+            result = answer(question)
+        except Exception as e:
+            result = {"error": f"Request processing failed: {str(e)}"}
+        if result.get("error"):
+            if self.store.fail(job_id, result["error"], owner):
+                with self._lock:
+                    self.failed += 1
+        elif self.store.complete(job_id, result["response"], owner):
+            with self._lock:
+                self.completed += 1
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {"workers": self.workers, "completed": self.completed, "failed": self.failed}
+
+
+_workers: JobWorkers | None = None
+_workers_lock = threading.Lock()
+
+
+def get_job_workers() -> JobWorkers:
+    """Returns the process-wide worker pool, not started"""
+    global _workers
+    if _workers is None:
+        with _workers_lock:
+            if _workers is None:
+                _workers = JobWorkers()
+    return _workers
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Answer queued jobs from the job store")
+    parser.add_argument("--workers", type=int, default=int(os.getenv("JOB_WORKERS", 2)) or 1)
+    args = parser.parse_args()
+
+    from ..workflows.registry import registry
+
+    registry.warm()
+    workers = JobWorkers(workers=args.workers).start()
+    print(f"{args.workers} job workers on {workers.store.path}")
+    try:
+        while True:
+            time.sleep(3600)
+    except KeyboardInterrupt:
+        workers.stop()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,45 @@
+from .pool import LLMClientPool, get_client_pool
+from .cache import ResponseCache, get_response_cache
+from .resilience import (
+    CircuitBreaker,
+    CircuitOpenError,
+    DeadlineExceeded,
+    Hedger,
+    deadline_scope,
+    get_hedger,
+    hedging_stats,
+    request_deadline,
+    with_deadline,
+)
+from .scheduler import PRIORITY_BULK, PRIORITY_DEFAULT, PRIORITY_ROUTING, RequestScheduler, caller_scope
+from .singleflight import SingleFlight, get_single_flight, single_flight_stats
+from .tokens import TokenUsage, count_tokens, split_to_budget, truncate_tokens, token_usage
+
+__all__ = [
+    "LLMClientPool",
+    "get_client_pool",
+    "ResponseCache",
+    "get_response_cache",
+    "CircuitBreaker",
+    "CircuitOpenError",
+    "DeadlineExceeded",
+    "Hedger",
+    "deadline_scope",
+    "get_hedger",
+    "hedging_stats",
+    "request_deadline",
+    "with_deadline",
+    "PRIORITY_BULK",
+    "PRIORITY_DEFAULT",
+    "PRIORITY_ROUTING",
+    "RequestScheduler",
+    "caller_scope",
+    "SingleFlight",
+    "get_single_flight",
+    "single_flight_stats",
+    "TokenUsage",
+    "count_tokens",
+    "split_to_budget",
+    "truncate_tokens",
+    "token_usage",
+]
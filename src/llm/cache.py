@@ -0,0 +1,211 @@
+"""
+Two-tier, content-addressed cache for LLM responses.
+
+Responses are keyed on a hash of (model, prompt, max_tokens). Lookups go to a
+bounded in-memory LRU first and then to a persistent SQLite store that
+survives restarts. Entries expire after a TTL and the SQLite store is trimmed
+to a maximum size by evicting the least recently used rows.
+"""
+
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict, defaultdict
+from dotenv import load_dotenv
+
+# Load environment variables from a .env file
+load_dotenv()
+
+
+class ResponseCache:
+    """
+    In-memory LRU backed by a SQLite store
+    Configuration from environment variables:
+    - LLM_CACHE_PATH: SQLite file for the persistent tier (default: .cache/llm_responses.sqlite)
+    - LLM_CACHE_MEMORY_ENTRIES: Entries kept in memory (default: 1024)
+    - LLM_CACHE_TTL: Seconds an entry stays valid (default: 604800, one week)
+    - LLM_CACHE_MAX_BYTES: Maximum size of cached values on disk (default: 268435456)
+    """
+
+    def __init__(
+        self,
+        path: str | None = None,
+        memory_entries: int | None = None,
+        ttl: float | None = None,
+        max_bytes: int | None = None,
+    ):
+        self.path = path or os.getenv("LLM_CACHE_PATH", ".cache/llm_responses.sqlite")
+        self.memory_entries = memory_entries or int(os.getenv("LLM_CACHE_MEMORY_ENTRIES", 1024))
+        self.ttl = ttl or float(os.getenv("LLM_CACHE_TTL", 7 * 24 * 3600))
+        self.max_bytes = max_bytes or int(os.getenv("LLM_CACHE_MAX_BYTES", 256 * 1024 * 1024))
+
+        self._lock = threading.Lock()
+        self._memory: OrderedDict[str, tuple[str, float]] = OrderedDict()
+        self._counters = defaultdict(int)
+        self._agent_counters = defaultdict(lambda: defaultdict(int))
+
+        if self.path != ":memory:":
+            os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+        self._db = sqlite3.connect(self.path, check_same_thread=False)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute(
+            """CREATE TABLE IF NOT EXISTS responses (
+                key TEXT PRIMARY KEY,
+                value TEXT NOT NULL,
+                size INTEGER NOT NULL,
+                created REAL NOT NULL,
+                accessed REAL NOT NULL
+            )"""
+        )
+        self._db.execute("CREATE INDEX IF NOT EXISTS responses_accessed ON responses (accessed)")
+        self._db.commit()
+        self._disk_bytes = self._db.execute("SELECT COALESCE(SUM(size), 0) FROM responses").fetchone()[0]
+
+    def reopen(self) -> None:
+        """Opens a new connection in a forked worker, SQLite connections must not cross a fork"""
+        if self.path == ":memory:":
+            # Nothing to reopen, the copied database is the worker's own
+            return
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(self.path, check_same_thread=False)
+
+    @staticmethod
+    def key(model: str, prompt, max_tokens: int) -> str:
+        """
+        Builds the content address of a request
+        Args:
+            model: Model name
+            prompt: Prompt text or list of chat messages
+            max_tokens: Maximum tokens for response
+        Returns:
+            Hex digest identifying the request
+        """
+        payload = json.dumps([model, prompt, max_tokens], sort_keys=True, ensure_ascii=False)
+        return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+    def get(self, key: str, agent: str = "") -> str | None:
+        """
+        Looks up a cached response, memory first then disk
+        Args:
+            key: Content address from ResponseCache.key
+            agent: Name of the calling agent, used for per-agent counters
+        Returns:
+            Cached response or None on a miss
+        """
+        now = time.time()
+        with self._lock:
+            entry = self._memory.get(key)
+            if entry is not None and now - entry[1] < self.ttl:
+                self._memory.move_to_end(key)
+                self._count("memory_hits", agent)
+                return entry[0]
+            if entry is not None:
+                del self._memory[key]
+
+            row = self._db.execute("SELECT value, created FROM responses WHERE key = ?", (key,)).fetchone()
+            if row is None:
+                self._count("misses", agent)
+                return None
+            value, created = row
+            if now - created >= self.ttl:
+                self._delete(key)
+                self._db.commit()
+                self._count("misses", agent)
+                return None
+
+            self._db.execute("UPDATE responses SET accessed = ? WHERE key = ?", (now, key))
+            self._db.commit()
+            self._remember(key, value, created)
+            self._count("disk_hits", agent)
+            return value
+
+    def set(self, key: str, value: str) -> None:
+        """Stores a response in both tiers"""
+        now = time.time()
+        size = len(value.encode("utf-8"))
+        with self._lock:
+            self._remember(key, value, now)
+            self._delete(key)
+            self._db.execute(
+                "INSERT INTO responses (key, value, size, created, accessed) VALUES (?, ?, ?, ?, ?)",
+                (key, value, size, now, now),
+            )
+            self._disk_bytes += size
+            self._counters["writes"] += 1
+            if self._disk_bytes > self.max_bytes:
+                self._evict(now)
+            self._db.commit()
+
+    def clear(self) -> None:
+        """Removes every entry from both tiers"""
+        with self._lock:
+            self._memory.clear()
+            self._db.execute("DELETE FROM responses")
+            self._db.commit()
+            self._disk_bytes = 0
+
+    def stats(self) -> dict:
+        """Returns hit/miss counters overall and per agent"""
+        with self._lock:
+            hits = self._counters["memory_hits"] + self._counters["disk_hits"]
+            lookups = hits + self._counters["misses"]
+            return {
+                **self._counters,
+                "hit_rate": hits / lookups if lookups else 0.0,
+                "memory_entries": len(self._memory),
+                "disk_bytes": self._disk_bytes,
+                "agents": {name: dict(counters) for name, counters in self._agent_counters.items()},
+            }
+
+    def _count(self, counter: str, agent: str) -> None:
+        self._counters[counter] += 1
+        if agent:
+            self._agent_counters[agent][counter] += 1
+
+    def _remember(self, key: str, value: str, created: float) -> None:
+        """Adds an entry to the memory tier, evicting the least recently used one"""
+        self._memory[key] = (value, created)
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.memory_entries:
+            self._memory.popitem(last=False)
+
+    def _delete(self, key: str) -> None:
+        row = self._db.execute("SELECT size FROM responses WHERE key = ?", (key,)).fetchone()
+        if row is not None:
+            self._db.execute("DELETE FROM responses WHERE key = ?", (key,))
+            self._disk_bytes -= row[0]
+
+    def _evict(self, now: float) -> None:
+        """Drops expired rows, then least recently used rows until under 90% of max_bytes"""
+        self._db.execute("DELETE FROM responses WHERE created <= ?", (now - self.ttl,))
+        target = int(self.max_bytes * 0.9)
+        self._disk_bytes = self._db.execute("SELECT COALESCE(SUM(size), 0) FROM responses").fetchone()[0]
+        for key, size in self._db.execute("SELECT key, size FROM responses ORDER BY accessed").fetchall():
+            if self._disk_bytes <= target:
+                break
+            self._db.execute("DELETE FROM responses WHERE key = ?", (key,))
+            self._memory.pop(key, None)
+            self._disk_bytes -= size
+            self._counters["evictions"] += 1
+
+
+_cache: ResponseCache | None = None
+_cache_lock = threading.Lock()
+
+
+def get_response_cache() -> ResponseCache | None:
+    """
+    Returns the process-wide response cache, or None when caching is turned
+    off with LLM_CACHE_ENABLED=false
+    """
+    global _cache
+    if os.getenv("LLM_CACHE_ENABLED", "true").lower() != "true":
+        return None
+    if _cache is None:
+        with _cache_lock:
+            if _cache is None:
+                _cache = ResponseCache()
+    return _cache
@@ -0,0 +1,519 @@
+"""
+Process-wide pooled OpenAI client shared by every agent.
+
+A single OpenAI client (and therefore a single HTTP connection pool) is reused
+by all agents so connections stay alive between calls instead of paying a new
+TLS handshake per agent instance. The pool bounds concurrent calls, applies
+per-call timeouts and retries transient failures with jittered backoff.
+
+The async API (acreate/astream) uses an AsyncOpenAI client with the same
+limits. Async clients and their slots are bound to an event loop, so one is
+kept per running loop; counters are shared with the sync client.
+
+Every attempt passes the circuit breaker and is capped to the request deadline
+of the calling context (see resilience.py). Connection slots are handed out by
+the rate-limit aware priority scheduler (see scheduler.py), which follows the
+rate-limit headers of every response.
+"""
+
+import asyncio
+import os
+import random
+import threading
+import time
+import weakref
+from contextlib import asynccontextmanager, contextmanager
+from typing import AsyncIterator, Awaitable, Callable, Iterator
+import httpx
+import openai
+from openai import AsyncOpenAI, OpenAI
+from dotenv import load_dotenv
+from .resilience import CircuitBreaker, DeadlineExceeded, call_timeout, remaining
+from .scheduler import PRIORITY_DEFAULT, RequestScheduler
+from .tokens import count_tokens
+
+# Load environment variables from a .env file
+load_dotenv()
+
+# Errors worth retrying: network problems, timeouts, rate limits and 5xx responses
+RETRYABLE_ERRORS = (
+    openai.APIConnectionError,
+    openai.APITimeoutError,
+    openai.RateLimitError,
+    openai.InternalServerError,
+)
+
+
+class LLMClientPool:
+    """
+    Shared OpenAI client with a bounded connection pool
+    Configuration from environment variables:
+    - OPENAI_API_KEY: API key for authentication
+    - OPENAI_MAX_CONNECTIONS: Maximum concurrent connections (default: 20)
+    - OPENAI_MAX_KEEPALIVE: Idle connections kept alive (default: 10)
+    - OPENAI_KEEPALIVE_EXPIRY: Seconds an idle connection is kept (default: 30)
+    - OPENAI_TIMEOUT: Default per-call timeout in seconds (default: 60)
+    - OPENAI_MAX_RETRIES: Retries for transient failures (default: 3)
+    - OPENAI_BACKOFF_BASE: Base backoff delay in seconds (default: 0.5)
+    - OPENAI_BACKOFF_MAX: Maximum backoff delay in seconds (default: 8)
+    - LLM_SCHEDULER_ENABLED: Grant slots by priority under the API rate limits (default: true)
+    """
+
+    def __init__(
+        self,
+        api_key: str | None = None,
+        max_connections: int | None = None,
+        max_keepalive: int | None = None,
+        keepalive_expiry: float | None = None,
+        timeout: float | None = None,
+        max_retries: int | None = None,
+        backoff_base: float | None = None,
+        backoff_max: float | None = None,
+    ):
+        self.max_connections = max_connections or int(os.getenv("OPENAI_MAX_CONNECTIONS", 20))
+        self.max_keepalive = max_keepalive or int(os.getenv("OPENAI_MAX_KEEPALIVE", 10))
+        self.keepalive_expiry = keepalive_expiry or float(os.getenv("OPENAI_KEEPALIVE_EXPIRY", 30))
+        self.timeout = timeout or float(os.getenv("OPENAI_TIMEOUT", 60))
+        self.max_retries = max_retries if max_retries is not None else int(os.getenv("OPENAI_MAX_RETRIES", 3))
+        self.backoff_base = backoff_base or float(os.getenv("OPENAI_BACKOFF_BASE", 0.5))
+        self.backoff_max = backoff_max or float(os.getenv("OPENAI_BACKOFF_MAX", 8))
+
+        self.api_key = api_key or os.getenv("OPENAI_API_KEY")
+        self.breaker = CircuitBreaker()
+        self._connect()
+        self._in_flight = 0
+        self._peak_in_flight = 0
+        self._waiting = 0
+        self._requests = 0
+        self._retries = 0
+        self._failures = 0
+        self._wait_seconds = 0.0
+
+    def _connect(self) -> None:
+        """Creates the HTTP clients, connection slots and scheduler"""
+        self._http_client = httpx.Client(
+            limits=httpx.Limits(
+                max_connections=self.max_connections,
+                max_keepalive_connections=self.max_keepalive,
+                keepalive_expiry=self.keepalive_expiry,
+            ),
+            timeout=self.timeout,
+        )
+        # Retries are handled here so they share the backoff policy and stats
+        self.client = OpenAI(
+            api_key=self.api_key,
+            http_client=self._http_client,
+            timeout=self.timeout,
+            max_retries=0,
+        )
+        self._async_clients = weakref.WeakKeyDictionary()
+
+        self._slots = threading.BoundedSemaphore(self.max_connections)
+        scheduled = os.getenv("LLM_SCHEDULER_ENABLED", "true").lower() == "true"
+        self.scheduler = RequestScheduler(self.max_connections) if scheduled else None
+        self._lock = threading.Lock()
+
+    def reset(self) -> None:
+        """
+        Replaces the clients, slots and scheduler with fresh ones in a forked
+        worker, connections and locks of the parent must not be shared
+        """
+        self.breaker = CircuitBreaker()
+        self._connect()
+        with self._lock:
+            self._in_flight = self._peak_in_flight = self._waiting = 0
+
+    def create(
+        self,
+        timeout: float | None = None,
+        on_wait: Callable[[float], None] | None = None,
+        priority: int = PRIORITY_DEFAULT,
+        **kwargs,
+    ):
+        """
+        Creates a chat completion through the shared client
+        Args:
+            timeout: Per-call timeout in seconds (None uses the pool default)
+            on_wait: Called with the seconds each attempt waited for a connection slot
+            priority: Scheduler priority class, lower is served first
+            kwargs: Arguments for chat.completions.create
+        Returns:
+            Chat completion response
+        """
+        return self._with_retries(
+            lambda attempt_timeout: self._call(attempt_timeout, kwargs, on_wait, priority), timeout
+        )
+
+    def stream(
+        self,
+        timeout: float | None = None,
+        on_wait: Callable[[float], None] | None = None,
+        priority: int = PRIORITY_DEFAULT,
+        on_finish: Callable[[str], None] | None = None,
+        **kwargs,
+    ) -> Iterator[str]:
+        """
+        Streams a chat completion through the shared client
+        The connection slot is held until the stream is consumed or closed,
+        retries only cover opening the stream
+        Args:
+            timeout: Per-call timeout in seconds (None uses the pool default)
+            on_wait: Called with the seconds waited for a connection slot
+            priority: Scheduler priority class, lower is served first
+            on_finish: Called with the finish reason once the stream reports it
+            kwargs: Arguments for chat.completions.create
+        Returns:
+            Iterator over the generated content deltas
+        """
+        with self._slot(on_wait, priority, self._estimate(kwargs)):
+            response = self._with_retries(
+                lambda attempt_timeout: self._observed(
+                    self.client.chat.completions.with_raw_response.create(stream=True, timeout=attempt_timeout, **kwargs)
+                ),
+                timeout,
+            )
+            try:
+                for chunk in response:
+                    if chunk.choices and chunk.choices[0].delta.content:
+                        yield chunk.choices[0].delta.content
+                    if on_finish is not None and chunk.choices and chunk.choices[0].finish_reason:
+                        on_finish(chunk.choices[0].finish_reason)
+            finally:
+                response.close()
+
+    def _with_retries(self, call: Callable[[float], object], timeout: float | None):
+        """
+        Runs call with the attempt timeout, retrying transient failures with backoff
+        Raises:
+            DeadlineExceeded: The request deadline passed, or would pass during the backoff
+            CircuitOpenError: The upstream is failing, no attempt was made
+        """
+        attempt = 0
+        while True:
+            try:
+                attempt_timeout = call_timeout(timeout or self.timeout)
+                self.breaker.before_call()
+            except Exception:
+                with self._lock:
+                    self._failures += 1
+                raise
+            try:
+                result = call(attempt_timeout)
+                self.breaker.record_success()
+                return result
+            except RETRYABLE_ERRORS as e:
+                self._record_failure(e, attempt_timeout < (timeout or self.timeout))
+                delay = self._retry_delay(attempt, e)
+                time.sleep(delay)
+                attempt += 1
+            except Exception:
+                # Anything else (e.g. a rejected request) means the upstream answered
+                self.breaker.record_success()
+                with self._lock:
+                    self._failures += 1
+                raise
+
+    def _record_failure(self, error: Exception, deadline_capped: bool) -> None:
+        """
+        Reports a failed attempt to the circuit breaker
+        A rate limit means the upstream answered and is left to the backoff, and
+        a timeout cut short by the request's own deadline says nothing about it
+        """
+        response = getattr(error, "response", None)
+        if self.scheduler is not None and response is not None:
+            self.scheduler.observe(response.headers)
+        if isinstance(error, openai.RateLimitError):
+            self.breaker.record_success()
+        elif deadline_capped and isinstance(error, openai.APITimeoutError):
+            self.breaker.release()
+        else:
+            self.breaker.record_failure()
+
+    def _retry_delay(self, attempt: int, error: Exception) -> float:
+        """
+        Backoff before retrying a failed attempt
+        Raises:
+            The error itself when retries are exhausted, DeadlineExceeded when
+            the deadline would pass before the retry
+        """
+        if attempt >= self.max_retries:
+            with self._lock:
+                self._failures += 1
+            raise error
+        delay = self._backoff(attempt, error)
+        left = remaining()
+        if left is not None and left <= delay:
+            with self._lock:
+                self._failures += 1
+            raise DeadlineExceeded("Request deadline exceeded while retrying") from error
+        with self._lock:
+            self._retries += 1
+        return delay
+
+    def _call(
+        self,
+        timeout: float,
+        kwargs: dict,
+        on_wait: Callable[[float], None] | None = None,
+        priority: int = PRIORITY_DEFAULT,
+    ):
+        """Runs a single attempt while holding one of the connection slots"""
+        with self._slot(on_wait, priority, self._estimate(kwargs)):
+            return self._observed(self.client.chat.completions.with_raw_response.create(timeout=timeout, **kwargs))
+
+    def _observed(self, raw):
+        """Feeds the rate-limit headers of a raw response to the scheduler and parses it"""
+        if self.scheduler is not None:
+            self.scheduler.observe(raw.headers)
+        return raw.parse()
+
+    def _estimate(self, kwargs: dict) -> int:
+        """
+        Tokens a request counts against the tokens-per-minute limit: its prompt
+        plus max_tokens, only computed once the limit is known
+        """
+        if self.scheduler is None or not self.scheduler.tokens.limit:
+            return 0
+        prompt = sum(count_tokens(message["content"], kwargs["model"]) for message in kwargs["messages"])
+        return prompt + kwargs.get("max_tokens", 0)
+
+    @contextmanager
+    def _slot(
+        self,
+        on_wait: Callable[[float], None] | None = None,
+        priority: int = PRIORITY_DEFAULT,
+        tokens: int = 0,
+    ):
+        """Holds one of the connection slots, waiting for one to free up or to be scheduled if needed"""
+        queued_at = time.perf_counter()
+        self._slot_queued()
+        try:
+            if self.scheduler is None:
+                self._slots.acquire()
+                release = self._slots.release
+            else:
+                self.scheduler.acquire(priority, tokens)
+                release = self.scheduler.release
+        except BaseException:
+            self._slot_abandoned()
+            raise
+        self._slot_acquired(queued_at, on_wait)
+        try:
+            yield
+        finally:
+            self._slot_released()
+            release()
+
+    def _slot_queued(self) -> None:
+        with self._lock:
+            self._waiting += 1
+
+    def _slot_abandoned(self) -> None:
+        with self._lock:
+            self._waiting -= 1
+
+    def _slot_acquired(self, queued_at: float, on_wait: Callable[[float], None] | None = None) -> None:
+        waited = time.perf_counter() - queued_at
+        with self._lock:
+            self._waiting -= 1
+            self._wait_seconds += waited
+            self._requests += 1
+            self._in_flight += 1
+            self._peak_in_flight = max(self._peak_in_flight, self._in_flight)
+        if on_wait is not None:
+            on_wait(waited)
+
+    def _slot_released(self) -> None:
+        with self._lock:
+            self._in_flight -= 1
+
+    async def acreate(
+        self,
+        timeout: float | None = None,
+        on_wait: Callable[[float], None] | None = None,
+        priority: int = PRIORITY_DEFAULT,
+        **kwargs,
+    ):
+        """Async variant of create"""
+        return await self._awith_retries(
+            lambda attempt_timeout: self._acall(attempt_timeout, kwargs, on_wait, priority), timeout
+        )
+
+    async def astream(
+        self,
+        timeout: float | None = None,
+        on_wait: Callable[[float], None] | None = None,
+        priority: int = PRIORITY_DEFAULT,
+        on_finish: Callable[[str], None] | None = None,
+        **kwargs,
+    ) -> AsyncIterator[str]:
+        """Async variant of stream"""
+        client, slots = self._async_client()
+        async with self._aslot(slots, on_wait, priority, self._estimate(kwargs)):
+            response = await self._awith_retries(
+                lambda attempt_timeout: self._aobserved(
+                    client.chat.completions.with_raw_response.create(stream=True, timeout=attempt_timeout, **kwargs)
+                ),
+                timeout,
+            )
+            try:
+                async for chunk in response:
+                    if chunk.choices and chunk.choices[0].delta.content:
+                        yield chunk.choices[0].delta.content
+                    if on_finish is not None and chunk.choices and chunk.choices[0].finish_reason:
+                        on_finish(chunk.choices[0].finish_reason)
+            finally:
+                await response.close()
+
+    async def _awith_retries(self, call: Callable[[float], Awaitable], timeout: float | None):
+        """Async variant of _with_retries"""
+        attempt = 0
+        while True:
+            try:
+                attempt_timeout = call_timeout(timeout or self.timeout)
+                self.breaker.before_call()
+            except Exception:
+                with self._lock:
+                    self._failures += 1
+                raise
+            try:
+                result = await call(attempt_timeout)
+                self.breaker.record_success()
+                return result
+            except RETRYABLE_ERRORS as e:
+                self._record_failure(e, attempt_timeout < (timeout or self.timeout))
+                delay = self._retry_delay(attempt, e)
+                await asyncio.sleep(delay)
+                attempt += 1
+            except Exception:
+                self.breaker.record_success()
+                with self._lock:
+                    self._failures += 1
+                raise
+
+    async def _acall(
+        self,
+        timeout: float,
+        kwargs: dict,
+        on_wait: Callable[[float], None] | None = None,
+        priority: int = PRIORITY_DEFAULT,
+    ):
+        """Runs a single async attempt while holding one of the loop's connection slots"""
+        client, slots = self._async_client()
+        async with self._aslot(slots, on_wait, priority, self._estimate(kwargs)):
+            return await self._aobserved(client.chat.completions.with_raw_response.create(timeout=timeout, **kwargs))
+
+    async def _aobserved(self, raw: Awaitable):
+        """Async variant of _observed"""
+        return self._observed(await raw)
+
+    def _async_client(self) -> tuple[AsyncOpenAI, asyncio.Semaphore]:
+        """Returns the async client and slots of the running event loop"""
+        loop = asyncio.get_running_loop()
+        entry = self._async_clients.get(loop)
+        if entry is None:
+            http_client = httpx.AsyncClient(
+                limits=httpx.Limits(
+                    max_connections=self.max_connections,
+                    max_keepalive_connections=self.max_keepalive,
+                    keepalive_expiry=self.keepalive_expiry,
+                ),
+                timeout=self.timeout,
+            )
+            client = AsyncOpenAI(
+                api_key=self.api_key,
+                http_client=http_client,
+                timeout=self.timeout,
+                max_retries=0,
+            )
+            entry = (client, asyncio.Semaphore(self.max_connections))
+            self._async_clients[loop] = entry
+        return entry
+
+    @asynccontextmanager
+    async def _aslot(
+        self,
+        slots: asyncio.Semaphore,
+        on_wait: Callable[[float], None] | None = None,
+        priority: int = PRIORITY_DEFAULT,
+        tokens: int = 0,
+    ):
+        """Async variant of _slot, without the scheduler the slots are the loop's own"""
+        queued_at = time.perf_counter()
+        self._slot_queued()
+        try:
+            if self.scheduler is None:
+                await slots.acquire()
+                release = slots.release
+            else:
+                await self.scheduler.aacquire(priority, tokens)
+                release = self.scheduler.release
+        except BaseException:
+            self._slot_abandoned()
+            raise
+        self._slot_acquired(queued_at, on_wait)
+        try:
+            yield
+        finally:
+            self._slot_released()
+            release()
+
+    def _backoff(self, attempt: int, error: Exception) -> float:
+        """
+        Delay before the next attempt: the server's Retry-After when given,
+        otherwise exponential backoff with full jitter
+        """
+        response = getattr(error, "response", None)
+        retry_after = response.headers.get("retry-after") if response is not None else None
+        if retry_after:
+            try:
+                return min(float(retry_after), self.backoff_max)
+            except ValueError:
+                pass
+        return random.uniform(0, min(self.backoff_max, self.backoff_base * 2 ** attempt))
+
+    def stats(self) -> dict:
+        """Returns pool utilization counters"""
+        open_connections, idle_connections = self._connection_counts()
+        with self._lock:
+            return {
+                "max_connections": self.max_connections,
+                "in_flight": self._in_flight,
+                "peak_in_flight": self._peak_in_flight,
+                "waiting": self._waiting,
+                "utilization": self._in_flight / self.max_connections,
+                "open_connections": open_connections,
+                "idle_connections": idle_connections,
+                "requests": self._requests,
+                "retries": self._retries,
+                "failures": self._failures,
+                "avg_wait_ms": self._wait_seconds * 1000 / self._requests if self._requests else 0.0,
+                "circuit": self.breaker.stats(),
+                "scheduler": self.scheduler.stats() if self.scheduler is not None else None,
+            }
+
+    def _connection_counts(self) -> tuple[int | None, int | None]:
+        """Reads open and idle connection counts from the underlying transport"""
+        try:
+            connections = list(self._http_client._transport._pool.connections)
+        except AttributeError:
+            return None, None
+        return len(connections), sum(1 for c in connections if c.is_idle())
+
+    def close(self) -> None:
+        """Closes all pooled connections"""
+        self._http_client.close()
+
+
+_pool: LLMClientPool | None = None
+_pool_lock = threading.Lock()
+
+
+def get_client_pool() -> LLMClientPool:
+    """Returns the process-wide client pool, creating it on first use"""
+    global _pool
+    if _pool is None:
+        with _pool_lock:
+            if _pool is None:
+                _pool = LLMClientPool()
+    return _pool
@@ -0,0 +1,339 @@
+"""
+Deadlines, hedged requests and circuit breaking for LLM calls.
+
+Deadlines: a request gets an absolute deadline that travels in the workflow
+state. Nodes enter it with deadline_scope, and every LLM call made inside caps
+its timeout to the time left and stops retrying once it has passed.
+
+Hedging: cheap, latency critical calls start a duplicate request when the
+first one is slower than the agent's recent p95, and take whichever answers
+first. Hedges are capped to a fraction of calls so spend stays flat.
+
+Circuit breaking: after repeated upstream failures calls fail fast for a
+cool-down period instead of queueing behind a degraded API, then a single
+probe decides whether to close the circuit again.
+"""
+
+import asyncio
+import contextvars
+import functools
+import inspect
+import os
+import threading
+import time
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, Future, ThreadPoolExecutor, wait
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Awaitable, Callable, Iterator, TypeVar
+from dotenv import load_dotenv
+
+# Load environment variables from a .env file
+load_dotenv()
+
+T = TypeVar("T")
+
+
+class DeadlineExceeded(Exception):
+    """The request deadline passed before the call could complete"""
+
+
+class CircuitOpenError(Exception):
+    """The upstream is considered degraded, calls fail fast until the cool-down ends"""
+
+
+_deadline: ContextVar[float | None] = ContextVar("deadline", default=None)
+
+
+def request_deadline(seconds: float | None = None) -> float:
+    """
+    Absolute deadline (epoch seconds) for a request starting now
+    - REQUEST_DEADLINE: Seconds a request may take (default: 120)
+    """
+    if seconds is None:
+        seconds = float(os.getenv("REQUEST_DEADLINE", 120))
+    return time.time() + seconds
+
+
+@contextmanager
+def deadline_scope(deadline: float | None) -> Iterator[None]:
+    """Applies a deadline to the LLM calls made inside the block, an earlier enclosing one wins"""
+    current = _deadline.get()
+    if deadline is None or (current is not None and current <= deadline):
+        yield
+        return
+    token = _deadline.set(deadline)
+    try:
+        yield
+    finally:
+        _deadline.reset(token)
+
+
+def remaining() -> float | None:
+    """Seconds left until the current deadline, None when there is none"""
+    deadline = _deadline.get()
+    return None if deadline is None else deadline - time.time()
+
+
+def call_timeout(timeout: float) -> float:
+    """
+    Caps a call timeout to the time left
+    Raises:
+        DeadlineExceeded: No time is left
+    """
+    left = remaining()
+    if left is None:
+        return timeout
+    if left <= 0:
+        raise DeadlineExceeded("Request deadline exceeded")
+    return min(timeout, left)
+
+
+def with_deadline(func: Callable) -> Callable:
+    """Wraps a workflow node (sync or async) so its LLM calls honour the deadline in its state"""
+    if inspect.iscoroutinefunction(func):
+        @functools.wraps(func)
+        async def anode(state, *args, **kwargs):
+            with deadline_scope(state.get("deadline")):
+                return await func(state, *args, **kwargs)
+        return anode
+
+    @functools.wraps(func)
+    def node(state, *args, **kwargs):
+        with deadline_scope(state.get("deadline")):
+            return func(state, *args, **kwargs)
+    return node
+
+
+class CircuitBreaker:
+    """
+    Consecutive-failure circuit breaker
+    - LLM_BREAKER_FAILURES: Consecutive failed calls that open the circuit (default: 5)
+    - LLM_BREAKER_COOLDOWN: Seconds the circuit stays open before a probe (default: 30)
+    """
+
+    def __init__(self, failures: int | None = None, cooldown: float | None = None):
+        self.failure_threshold = failures or int(os.getenv("LLM_BREAKER_FAILURES", 5))
+        self.cooldown = cooldown or float(os.getenv("LLM_BREAKER_COOLDOWN", 30))
+        self._lock = threading.Lock()
+        self._failures = 0
+        self._opened_at: float | None = None
+        self._probing = False
+        self.opened = 0
+        self.rejected = 0
+
+    @property
+    def state(self) -> str:
+        with self._lock:
+            return self._state()
+
+    def _state(self) -> str:
+        if self._opened_at is None:
+            return "closed"
+        if time.monotonic() - self._opened_at >= self.cooldown:
+            return "half_open"
+        return "open"
+
+    def before_call(self) -> None:
+        """
+        Admits a call
+        Raises:
+            CircuitOpenError: The circuit is open, or half open with a probe already running
+        """
+        with self._lock:
+            state = self._state()
+            if state == "closed":
+                return
+            if state == "half_open" and not self._probing:
+                self._probing = True
+                return
+            self.rejected += 1
+        raise CircuitOpenError("LLM upstream circuit is open")
+
+    def record_success(self) -> None:
+        with self._lock:
+            self._failures = 0
+            self._opened_at = None
+            self._probing = False
+
+    def release(self) -> None:
+        """Ends a call without an outcome, e.g. one cut short by its own deadline"""
+        with self._lock:
+            self._probing = False
+
+    def record_failure(self) -> None:
+        with self._lock:
+            self._failures += 1
+            # A failed probe reopens the circuit, calls admitted before it opened do not extend it
+            if self._probing or (self._opened_at is None and self._failures >= self.failure_threshold):
+                self.opened += 1
+                self._opened_at = time.monotonic()
+            self._probing = False
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "state": self._state(),
+                "consecutive_failures": self._failures,
+                "opened": self.opened,
+                "rejected": self.rejected,
+            }
+
+
+class Hedger:
+    """
+    Issues a duplicate of a slow call and uses whichever finishes first
+    The delay is the p95 of the agent's recent latencies
+    - LLM_HEDGE_DELAY: Delay before a hedge until enough latencies are known (default: 2)
+    - LLM_HEDGE_MIN_DELAY: Lower bound of the hedge delay in seconds (default: 0.2)
+    - LLM_HEDGE_MAX_RATIO: Maximum fraction of calls that may be hedged (default: 0.1)
+    """
+
+    # Latencies remembered per agent and needed before the p95 is trusted
+    WINDOW = 200
+    MIN_SAMPLES = 20
+
+    def __init__(self, name: str):
+        self.name = name
+        self.default_delay = float(os.getenv("LLM_HEDGE_DELAY", 2))
+        self.min_delay = float(os.getenv("LLM_HEDGE_MIN_DELAY", 0.2))
+        self.max_ratio = float(os.getenv("LLM_HEDGE_MAX_RATIO", 0.1))
+        self._lock = threading.Lock()
+        self._latencies = deque(maxlen=self.WINDOW)
+        self.calls = 0
+        self.hedged = 0
+        self.hedge_wins = 0
+
+    def delay(self) -> float:
+        """Seconds to wait for the first attempt before hedging"""
+        with self._lock:
+            if len(self._latencies) < self.MIN_SAMPLES:
+                return self.default_delay
+            latencies = sorted(self._latencies)
+        return max(self.min_delay, latencies[int(0.95 * (len(latencies) - 1))])
+
+    def _admit_hedge(self) -> bool:
+        with self._lock:
+            if self.hedged + 1 > self.max_ratio * self.calls:
+                return False
+            self.hedged += 1
+            return True
+
+    def _record(self, seconds: float, hedge_won: bool = False) -> None:
+        with self._lock:
+            self._latencies.append(seconds)
+            if hedge_won:
+                self.hedge_wins += 1
+
+    def call(self, fn: Callable[[], T]) -> T:
+        """Runs fn, starting a second fn when the first is slower than the hedge delay"""
+        with self._lock:
+            self.calls += 1
+            # Without hedge budget left the call runs on the caller's thread
+            exhausted = self.hedged + 1 > self.max_ratio * self.calls
+        start = time.perf_counter()
+        if exhausted:
+            result = fn()
+            self._record(time.perf_counter() - start)
+            return result
+
+        first = _submit(fn)
+        done, _ = wait([first], timeout=self.delay())
+        if done or not self._admit_hedge():
+            result = first.result()
+            self._record(time.perf_counter() - start)
+            return result
+
+        attempts = [first, _submit(fn)]
+        pending = set(attempts)
+        while pending:
+            done, pending = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                if future.exception() is None or not pending:
+                    # A loser still queued for a thread never starts, a running
+                    # blocking HTTP call cannot be interrupted and finishes in the background
+                    for loser in pending:
+                        loser.cancel()
+                    self._record(time.perf_counter() - start, hedge_won=future is attempts[1])
+                    return future.result()
+
+    async def acall(self, fn: Callable[[], Awaitable[T]]) -> T:
+        """Async variant of call, the slower attempt is cancelled"""
+        with self._lock:
+            self.calls += 1
+        start = time.perf_counter()
+        first = asyncio.ensure_future(fn())
+        done, _ = await asyncio.wait([first], timeout=self.delay())
+        if done or not self._admit_hedge():
+            result = await first
+            self._record(time.perf_counter() - start)
+            return result
+
+        second = asyncio.ensure_future(fn())
+        pending = {first, second}
+        try:
+            while pending:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    if task.exception() is None or not pending:
+                        self._record(time.perf_counter() - start, hedge_won=task is second)
+                        return task.result()
+        finally:
+            for task in pending:
+                task.cancel()
+
+    def stats(self) -> dict:
+        with self._lock:
+            latencies = sorted(self._latencies)
+            return {
+                "calls": self.calls,
+                "hedged": self.hedged,
+                "hedge_wins": self.hedge_wins,
+                "p95_ms": latencies[int(0.95 * (len(latencies) - 1))] * 1000 if latencies else None,
+            }
+
+
+# Hedged calls run here so the caller can wait on the first attempt with a timeout
+_executor: ThreadPoolExecutor | None = None
+_executor_lock = threading.Lock()
+
+
+def _hedge_executor() -> ThreadPoolExecutor:
+    """
+    Returns the hedge executor, created on first use
+    - LLM_HEDGE_WORKERS: Threads running hedged calls (default: twice the client pool's connections)
+    Every attempt holds a connection slot, so with a first attempt and a hedge
+    per slot the executor never limits calls more than the connection pool does
+    """
+    global _executor
+    if _executor is None:
+        with _executor_lock:
+            if _executor is None:
+                from .pool import get_client_pool
+                workers = int(os.getenv("LLM_HEDGE_WORKERS", 0)) or 2 * get_client_pool().max_connections
+                _executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="llm-hedge")
+    return _executor
+
+
+def _submit(fn: Callable[[], T]) -> Future:
+    """Runs fn on the hedge executor in a copy of the caller's context (deadline, trace)"""
+    return _hedge_executor().submit(contextvars.copy_context().run, fn)
+
+
+_hedgers: dict[str, Hedger] = {}
+_hedgers_lock = threading.Lock()
+
+
+def get_hedger(name: str) -> Hedger:
+    """Returns the process-wide hedger of an agent, creating it on first use"""
+    hedger = _hedgers.get(name)
+    if hedger is None:
+        with _hedgers_lock:
+            hedger = _hedgers.setdefault(name, Hedger(name))
+    return hedger
+
+
+def hedging_stats() -> dict:
+    with _hedgers_lock:
+        hedgers = list(_hedgers.values())
+    return {hedger.name: hedger.stats() for hedger in hedgers}
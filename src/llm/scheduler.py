@@ -0,0 +1,322 @@
+"""
+Rate-limit aware priority scheduler for outbound LLM calls.
+
+Every attempt the client pool makes first takes a grant from the scheduler.
+A grant needs a free connection, one request from the requests-per-minute
+bucket and the call's estimated tokens from the tokens-per-minute bucket.
+Waiting calls are granted by priority class (router before actor
+identification before FLINT), and within a class round-robin across callers,
+so one request fanning out into many FLINT map calls cannot starve another
+request's single call.
+
+The buckets start from LLM_RPM_LIMIT/LLM_TPM_LIMIT, or unlimited, and follow
+the x-ratelimit-* headers of every response: the advertised limit becomes the
+refill rate and the remaining budget caps what is left in the bucket.
+"""
+
+import asyncio
+import os
+import re
+import threading
+import time
+import uuid
+from collections import OrderedDict, deque
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Iterator, Mapping
+from dotenv import load_dotenv
+from .resilience import DeadlineExceeded, remaining
+
+# Load environment variables from a .env file
+load_dotenv()
+
+# Priority classes, lower values are granted first
+PRIORITY_ROUTING = 0
+PRIORITY_DEFAULT = 1
+PRIORITY_BULK = 2
+
+_caller: ContextVar[str] = ContextVar("llm_caller", default="")
+
+
+@contextmanager
+def caller_scope(caller: str | None = None) -> Iterator[None]:
+    """
+    Attributes the LLM calls made inside the block to one caller for fair queuing
+    Args:
+        caller: Caller identity, a new one when None (one per request)
+    """
+    token = _caller.set(caller or uuid.uuid4().hex)
+    try:
+        yield
+    finally:
+        _caller.reset(token)
+
+
+class TokenBucket:
+    """Budget refilled continuously at limit per minute, unlimited while the limit is unknown (0)"""
+
+    def __init__(self, limit: float = 0):
+        self.limit = limit
+        self.level = limit
+        self._updated = time.monotonic()
+
+    def refill(self, now: float) -> None:
+        if self.limit:
+            self.level = min(self.limit, self.level + (now - self._updated) * self.limit / 60)
+        self._updated = now
+
+    def available(self, amount: float) -> bool:
+        # A call larger than the whole bucket only waits for a full one
+        return not self.limit or self.level >= min(amount, self.limit)
+
+    def take(self, amount: float) -> None:
+        if self.limit:
+            self.level -= amount
+
+    def wait_time(self, amount: float) -> float:
+        """Seconds until amount is available"""
+        if not self.limit:
+            return 0.0
+        return max(0.0, (min(amount, self.limit) - self.level) * 60 / self.limit)
+
+    def update(self, limit: float | None, remaining: float | None) -> None:
+        """Adopts the limit and remaining budget reported by the API"""
+        if limit:
+            if not self.limit:
+                self.level = limit
+            self.limit = limit
+        if remaining is not None and self.limit:
+            self.level = min(self.level, remaining)
+
+
+class _Waiter:
+    """A call waiting for a grant, woken from any thread"""
+
+    def __init__(self, priority: int, caller: str, tokens: int, loop: asyncio.AbstractEventLoop | None = None):
+        self.priority = priority
+        self.caller = caller
+        self.tokens = tokens
+        self.granted = False
+        self.queued_at = time.perf_counter()
+        self.loop = loop
+        self.event = threading.Event() if loop is None else asyncio.Event()
+
+    def wake(self) -> None:
+        if self.loop is None:
+            self.event.set()
+        else:
+            self.loop.call_soon_threadsafe(self.event.set)
+
+
+class RequestScheduler:
+    """
+    Grants LLM calls by priority under concurrency and rate limits
+    - LLM_RPM_LIMIT: Requests per minute until the API reports its limit (default: 0, unlimited)
+    - LLM_TPM_LIMIT: Tokens per minute until the API reports its limit (default: 0, unlimited)
+    """
+
+    def __init__(self, max_concurrency: int, rpm: float | None = None, tpm: float | None = None):
+        self.max_concurrency = max_concurrency
+        self.requests = TokenBucket(rpm if rpm is not None else float(os.getenv("LLM_RPM_LIMIT", 0)))
+        self.tokens = TokenBucket(tpm if tpm is not None else float(os.getenv("LLM_TPM_LIMIT", 0)))
+        self._lock = threading.Lock()
+        # priority -> caller -> waiters, callers are served in rotation
+        self._queues: dict[int, OrderedDict[str, deque[_Waiter]]] = {}
+        self._active = 0
+        self._granted: dict[int, int] = {}
+        self._wait_seconds: dict[int, float] = {}
+        self._max_wait: dict[int, float] = {}
+
+    def acquire(self, priority: int, tokens: int = 0) -> float:
+        """
+        Waits for a grant for one call, to be given back with release
+        Args:
+            priority: Priority class, lower is granted first
+            tokens: Estimated tokens of the call (prompt plus max_tokens)
+        Returns:
+            Seconds waited for the grant
+        """
+        waiter = self._enqueue(priority, tokens, None)
+        try:
+            while True:
+                timeout = self._sleep(self._dispatch(waiter), waiter)
+                if waiter.granted:
+                    break
+                waiter.event.wait(timeout)
+                waiter.event.clear()
+        except BaseException:
+            self._abandon(waiter)
+            raise
+        return time.perf_counter() - waiter.queued_at
+
+    async def aacquire(self, priority: int, tokens: int = 0) -> float:
+        """Async variant of acquire"""
+        waiter = self._enqueue(priority, tokens, asyncio.get_running_loop())
+        try:
+            while True:
+                timeout = self._sleep(self._dispatch(waiter), waiter)
+                if waiter.granted:
+                    break
+                try:
+                    await asyncio.wait_for(waiter.event.wait(), timeout)
+                except asyncio.TimeoutError:
+                    pass
+                waiter.event.clear()
+        except BaseException:
+            self._abandon(waiter)
+            raise
+        return time.perf_counter() - waiter.queued_at
+
+    def _enqueue(self, priority: int, tokens: int, loop) -> _Waiter:
+        waiter = _Waiter(priority, _caller.get(), tokens, loop)
+        with self._lock:
+            callers = self._queues.setdefault(priority, OrderedDict())
+            callers.setdefault(waiter.caller, deque()).append(waiter)
+        return waiter
+
+    def _dispatch(self, waiter: _Waiter) -> float | None:
+        """
+        Grants waiting calls in order while resources allow
+        Returns:
+            Seconds the given waiter should sleep before dispatching again,
+            None to sleep until woken
+        """
+        woken = []
+        with self._lock:
+            delay = None
+            while self._active < self.max_concurrency:
+                head = self._head()
+                if head is None:
+                    break
+                now = time.monotonic()
+                self.requests.refill(now)
+                self.tokens.refill(now)
+                if not (self.requests.available(1) and self.tokens.available(head.tokens)):
+                    # The head waits for the buckets to refill, everyone else for the head
+                    if head is waiter:
+                        delay = max(self.requests.wait_time(1), self.tokens.wait_time(head.tokens), 0.001)
+                    else:
+                        woken.append(head)
+                    break
+                self._grant(head)
+                woken.append(head)
+        for other in woken:
+            if other is not waiter:
+                other.wake()
+        return delay
+
+    @staticmethod
+    def _sleep(delay: float | None, waiter: _Waiter) -> float | None:
+        """
+        Caps a waiter's sleep to the request deadline
+        Raises:
+            DeadlineExceeded: The deadline passed while the call was queued
+        """
+        left = remaining()
+        if left is None or waiter.granted:
+            return delay
+        if left <= 0:
+            raise DeadlineExceeded("Request deadline exceeded while queued for the LLM")
+        return left if delay is None else min(delay, left)
+
+    def _head(self) -> _Waiter | None:
+        for priority in sorted(self._queues):
+            callers = self._queues[priority]
+            if callers:
+                return next(iter(callers.values()))[0]
+        return None
+
+    def _grant(self, waiter: _Waiter) -> None:
+        callers = self._queues[waiter.priority]
+        queue = callers.pop(waiter.caller)
+        queue.popleft()
+        if queue:
+            # The caller goes to the back of the rotation with its remaining calls
+            callers[waiter.caller] = queue
+        self.requests.take(1)
+        self.tokens.take(waiter.tokens)
+        self._active += 1
+        waited = time.perf_counter() - waiter.queued_at
+        self._granted[waiter.priority] = self._granted.get(waiter.priority, 0) + 1
+        self._wait_seconds[waiter.priority] = self._wait_seconds.get(waiter.priority, 0.0) + waited
+        self._max_wait[waiter.priority] = max(self._max_wait.get(waiter.priority, 0.0), waited)
+        waiter.granted = True
+
+    def _abandon(self, waiter: _Waiter) -> None:
+        """Removes a waiter that gave up, or returns its grant if it arrived meanwhile"""
+        with self._lock:
+            if not waiter.granted:
+                queue = self._queues[waiter.priority].get(waiter.caller)
+                queue.remove(waiter)
+                if not queue:
+                    del self._queues[waiter.priority][waiter.caller]
+                granted = False
+            else:
+                granted = True
+        if granted:
+            self.release()
+        else:
+            self._wake_head()
+
+    def release(self) -> None:
+        """Returns a grant and lets the next waiting call in"""
+        with self._lock:
+            self._active -= 1
+        self._wake_head()
+
+    def _wake_head(self) -> None:
+        with self._lock:
+            head = self._head()
+        if head is not None:
+            head.wake()
+
+    def observe(self, headers: Mapping[str, str] | None) -> None:
+        """Adapts the buckets to the x-ratelimit-* headers of an API response"""
+        if not headers:
+            return
+        with self._lock:
+            now = time.monotonic()
+            self.requests.refill(now)
+            self.tokens.refill(now)
+            self.requests.update(
+                _number(headers.get("x-ratelimit-limit-requests")),
+                _number(headers.get("x-ratelimit-remaining-requests")),
+            )
+            self.tokens.update(
+                _number(headers.get("x-ratelimit-limit-tokens")),
+                _number(headers.get("x-ratelimit-remaining-tokens")),
+            )
+
+    def stats(self) -> dict:
+        """Queue depth, grants and wait times per priority class, and the rate budgets"""
+        with self._lock:
+            priorities = sorted(set(self._queues) | set(self._granted))
+            return {
+                "active": self._active,
+                "queued": sum(len(q) for callers in self._queues.values() for q in callers.values()),
+                "priorities": {
+                    priority: {
+                        "queued": sum(len(q) for q in self._queues.get(priority, {}).values()),
+                        "callers": len(self._queues.get(priority, {})),
+                        "granted": self._granted.get(priority, 0),
+                        "avg_wait_ms": self._wait_seconds.get(priority, 0.0) * 1000 / self._granted[priority]
+                        if self._granted.get(priority) else 0.0,
+                        "max_wait_ms": self._max_wait.get(priority, 0.0) * 1000,
+                    }
+                    for priority in priorities
+                },
+                "rpm_limit": self.requests.limit or None,
+                "rpm_available": self.requests.level if self.requests.limit else None,
+                "tpm_limit": self.tokens.limit or None,
+                "tpm_available": self.tokens.level if self.tokens.limit else None,
+            }
+
+
+def _number(value: str | None) -> float | None:
+    """Parses a rate-limit header value, tolerating suffixes such as 150k"""
+    if value is None:
+        return None
+    match = re.match(r"\s*([\d.]+)\s*([kKmM]?)", value)
+    if not match:
+        return None
+    return float(match.group(1)) * {"": 1, "k": 1e3, "m": 1e6}[match.group(2).lower()]
@@ -0,0 +1,202 @@
+"""
+Single-flight coalescing of identical in-flight work.
+
+While a call for a key is running, further callers with the same key do not
+start their own; they wait for the running call and share its result or
+exception. Nothing is kept once the call finishes, which makes this different
+from the response cache: it only merges requests that overlap in time, such as
+a burst of users asking about a regulation that just went live.
+
+Async callers share a task per event loop. A caller that is cancelled stops
+waiting without cancelling the shared task, unless it was the last one waiting.
+
+Waiters keep their own request deadline: they stop waiting once it passes, and
+when the call fails because the deadline of the caller running it passed, they
+run it again themselves instead of sharing that failure.
+"""
+
+import asyncio
+import threading
+import weakref
+from typing import Awaitable, Callable, Hashable, TypeVar
+from .resilience import DeadlineExceeded, remaining
+
+T = TypeVar("T")
+
+
+class _Call:
+    """A running sync call and its outcome"""
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error: BaseException | None = None
+
+
+class _Flight:
+    """A running async call shared by its waiters"""
+
+    def __init__(self, task: asyncio.Task):
+        self.task = task
+        self.waiters = 0
+
+
+class SingleFlight:
+    """
+    Coalesces concurrent calls with the same key into one execution
+    - executions: Calls actually run
+    - coalesced: Calls that waited on a running execution instead
+    - errors: Executions that raised, their waiters got the same exception
+    - cancelled: Async executions cancelled because every waiter was cancelled
+    - expired: Waits given up because the waiter's own deadline passed
+    - rejoined: Waiters that ran again after the execution hit its caller's deadline
+    """
+
+    def __init__(self, name: str = ""):
+        self.name = name
+        self._lock = threading.Lock()
+        self._calls: dict[Hashable, _Call] = {}
+        self._flights = weakref.WeakKeyDictionary()
+        self.executions = 0
+        self.coalesced = 0
+        self.errors = 0
+        self.cancelled = 0
+        self.expired = 0
+        self.rejoined = 0
+
+    def do(self, key: Hashable, fn: Callable[[], T]) -> tuple[T, bool]:
+        """
+        Runs fn unless a call with the same key is in flight, in which case its outcome is shared
+        Args:
+            key: Identity of the work, e.g. a normalized question or a prompt hash
+            fn: The work
+        Returns:
+            The result and whether it was shared from another caller's execution
+        Raises:
+            DeadlineExceeded: The caller's deadline passed while waiting for another caller's execution
+        """
+        while True:
+            with self._lock:
+                call = self._calls.get(key)
+                leader = call is None
+                if leader:
+                    call = self._calls[key] = _Call()
+                    self.executions += 1
+                else:
+                    self.coalesced += 1
+            if leader:
+                break
+
+            left = remaining()
+            if not call.done.wait(None if left is None else max(0.0, left)):
+                with self._lock:
+                    self.expired += 1
+                raise DeadlineExceeded("Request deadline passed while waiting for a shared call")
+            if isinstance(call.error, DeadlineExceeded):
+                # Only the running caller's deadline passed, this caller may still have time
+                with self._lock:
+                    self.rejoined += 1
+                continue
+            if call.error is not None:
+                raise call.error
+            return call.result, True
+
+        try:
+            call.result = fn()
+            return call.result, False
+        except BaseException as e:
+            call.error = e
+            with self._lock:
+                self.errors += 1
+            raise
+        finally:
+            with self._lock:
+                del self._calls[key]
+            call.done.set()
+
+    async def ado(self, key: Hashable, fn: Callable[[], Awaitable[T]]) -> tuple[T, bool]:
+        """Async variant of do, calls are only shared within one event loop"""
+        loop = asyncio.get_running_loop()
+        while True:
+            flight, leader = self._join(loop, key, fn)
+            left = remaining()
+            try:
+                # Shielded so one waiter being cancelled or giving up does not cancel the others' result
+                return await asyncio.wait_for(asyncio.shield(flight.task), left), not leader
+            except asyncio.TimeoutError:
+                self._leave(flight)
+                with self._lock:
+                    self.expired += 1
+                raise DeadlineExceeded("Request deadline passed while waiting for a shared call") from None
+            except asyncio.CancelledError:
+                self._leave(flight)
+                raise
+            except DeadlineExceeded:
+                # The task runs under its starting caller's deadline, the others may still have time
+                if leader:
+                    raise
+                with self._lock:
+                    self.rejoined += 1
+
+    def _join(self, loop: asyncio.AbstractEventLoop, key: Hashable, fn: Callable[[], Awaitable]) -> tuple[_Flight, bool]:
+        """Waits on the flight running for key, starting it when there is none"""
+        with self._lock:
+            flights = self._flights.setdefault(loop, {})
+            flight = flights.get(key)
+            leader = flight is None
+            if leader:
+                flight = flights[key] = _Flight(loop.create_task(fn()))
+                flight.task.add_done_callback(lambda task: self._finished(flights, key, flight))
+                self.executions += 1
+            else:
+                self.coalesced += 1
+            flight.waiters += 1
+        return flight, leader
+
+    def _leave(self, flight: _Flight) -> None:
+        """Stops waiting on a flight, cancelling it when nobody else waits"""
+        with self._lock:
+            flight.waiters -= 1
+            if flight.waiters == 0 and not flight.task.done():
+                flight.task.cancel()
+
+    def _finished(self, flights: dict, key: Hashable, flight: _Flight) -> None:
+        with self._lock:
+            if flights.get(key) is flight:
+                del flights[key]
+            if flight.task.cancelled():
+                self.cancelled += 1
+            elif flight.task.exception() is not None:
+                self.errors += 1
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "executions": self.executions,
+                "coalesced": self.coalesced,
+                "errors": self.errors,
+                "cancelled": self.cancelled,
+                "expired": self.expired,
+                "rejoined": self.rejoined,
+                "in_flight": len(self._calls) + sum(len(flights) for flights in self._flights.values()),
+            }
+
+
+_flights: dict[str, SingleFlight] = {}
+_flights_lock = threading.Lock()
+
+
+def get_single_flight(name: str) -> SingleFlight:
+    """Returns the process-wide single-flight group with this name, creating it on first use"""
+    flight = _flights.get(name)
+    if flight is None:
+        with _flights_lock:
+            flight = _flights.setdefault(name, SingleFlight(name))
+    return flight
+
+
+def single_flight_stats() -> dict:
+    """Coalescing counters of every single-flight group"""
+    with _flights_lock:
+        flights = list(_flights.values())
+    return {flight.name: flight.stats() for flight in flights}
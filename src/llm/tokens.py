@@ -0,0 +1,127 @@
+"""
+Local token counting, prompt budgeting and per-agent token accounting.
+
+Token counts use tiktoken when it is installed and its encoding can be
+loaded, otherwise a regex estimate that splits words into pieces of at most
+four characters, which tracks BPE tokenizers closely enough for budgeting.
+"""
+
+import re
+import threading
+from collections import defaultdict
+from functools import lru_cache
+
+# Words are split into pieces of up to four characters, punctuation counts as one token each
+TOKEN_ESTIMATE = re.compile(r"\w{1,4}|[^\w\s]")
+PARAGRAPH_BREAK = re.compile(r"\n\s*\n")
+
+
+@lru_cache(maxsize=8)
+def _encoding(model: str):
+    """Returns the tiktoken encoding for a model, or None when unavailable"""
+    try:
+        import tiktoken
+        try:
+            return tiktoken.encoding_for_model(model)
+        except KeyError:
+            return tiktoken.get_encoding("o200k_base")
+    except Exception:
+        # Not installed, or the encoding file cannot be downloaded
+        return None
+
+
+def count_tokens(text: str, model: str = "gpt-4o-mini") -> int:
+    """
+    Counts the tokens of a text for a model
+    Args:
+        text: Text to count
+        model: Model whose tokenizer to use when tiktoken is available
+    Returns:
+        Exact count with tiktoken, estimate otherwise
+    """
+    encoding = _encoding(model)
+    if encoding is not None:
+        return len(encoding.encode(text, disallowed_special=()))
+    return len(TOKEN_ESTIMATE.findall(text))
+
+
+def truncate_tokens(text: str, budget: int, model: str = "gpt-4o-mini") -> str:
+    """Cuts a text down to at most budget tokens"""
+    encoding = _encoding(model)
+    if encoding is not None:
+        tokens = encoding.encode(text, disallowed_special=())
+        return text if len(tokens) <= budget else encoding.decode(tokens[:budget])
+    pieces = list(TOKEN_ESTIMATE.finditer(text))
+    if len(pieces) <= budget:
+        return text
+    return text[:pieces[budget - 1].end()] if budget > 0 else ""
+
+
+def split_to_budget(text: str, budget: int, model: str = "gpt-4o-mini") -> list[str]:
+    """
+    Splits a text into parts of at most budget tokens
+    Parts are built from whole paragraphs, a single paragraph over budget is truncated
+    Args:
+        text: Text to split
+        budget: Maximum tokens per part
+        model: Model whose tokenizer to use
+    Returns:
+        Parts in order, a text within budget comes back as a single part
+    """
+    if count_tokens(text, model) <= budget:
+        return [text]
+
+    parts, current, used = [], [], 0
+    for paragraph in PARAGRAPH_BREAK.split(text):
+        if not paragraph.strip():
+            continue
+        tokens = count_tokens(paragraph, model)
+        if tokens > budget:
+            paragraph, tokens = truncate_tokens(paragraph, budget, model), budget
+        if current and used + tokens > budget:
+            parts.append("\n\n".join(current))
+            current, used = [], 0
+        current.append(paragraph)
+        used += tokens
+    if current:
+        parts.append("\n\n".join(current))
+    return parts
+
+
+class TokenUsage:
+    """
+    Per-agent token counters
+    - calls: LLM calls made (cache hits excluded)
+    - cache_hits: Calls answered from the response cache
+    - prompt_tokens / completion_tokens: Tokens reported by the API (estimated for streams)
+    - cached_prompt_tokens: Prompt tokens served from the provider's prefix cache
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._agents = defaultdict(lambda: defaultdict(int))
+
+    def record(
+        self,
+        agent: str,
+        prompt_tokens: int = 0,
+        completion_tokens: int = 0,
+        cached_prompt_tokens: int = 0,
+        cache_hit: bool = False,
+    ) -> None:
+        with self._lock:
+            counters = self._agents[agent]
+            if cache_hit:
+                counters["cache_hits"] += 1
+                return
+            counters["calls"] += 1
+            counters["prompt_tokens"] += prompt_tokens
+            counters["completion_tokens"] += completion_tokens
+            counters["cached_prompt_tokens"] += cached_prompt_tokens
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {agent: dict(counters) for agent, counters in self._agents.items()}
+
+
+token_usage = TokenUsage()
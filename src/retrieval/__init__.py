@@ -0,0 +1,14 @@
+from .chunk_store import ChunkStore
+from .corpus import Chunk, corpus_files, iter_corpus, split_chunks
+from .index import BM25Index, SearchHit, get_regulation_index
+
+__all__ = [
+    "Chunk",
+    "ChunkStore",
+    "corpus_files",
+    "iter_corpus",
+    "split_chunks",
+    "BM25Index",
+    "SearchHit",
+    "get_regulation_index",
+]
@@ -0,0 +1,29 @@
+"""
+Builds the regulation index from a local corpus.
+
+Usage:
+    python -m src.retrieval.build --corpus data/regulations [--index .cache/regulation_index]
+"""
+
+import argparse
+import os
+import time
+from .corpus import iter_corpus
+from .index import BM25Index
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Build the regulation BM25 index")
+    parser.add_argument("--corpus", required=True, help="Corpus directory or file (.jsonl / .txt)")
+    parser.add_argument("--index", default=os.getenv("REGULATION_INDEX_PATH", ".cache/regulation_index"))
+    parser.add_argument("--max-words", type=int, default=200, help="Soft limit on words per chunk")
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    BM25Index.build(iter_corpus(args.corpus, args.max_words), args.index)
+    index = BM25Index.load(args.index)
+    print(f"Indexed {len(index)} chunks into {args.index} in {time.perf_counter() - start:.1f}s")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,176 @@
+"""
+Append-only on-disk store of regulation chunks.
+
+Chunks are written back to back into one data file, and an offset index
+locates each record, so any chunk is read with one slice of a memory map.
+A manifest records which range of records belongs to which corpus file and
+that file's size, modification time and content hash. Re-ingesting a changed
+file appends its new chunks and points the manifest at them; the old records
+stay behind as garbage until the store is compacted.
+
+    chunks.bin     records: <chunk ID length, source length, text length> header, then the UTF-8 fields
+    chunks.idx     int64 start offset of every record
+    manifest.json  committed record count and the record range of every file
+
+Only what the manifest counts is committed. Records appended by a run that
+crashed before committing are cut off the next time the store is opened.
+"""
+
+import json
+import os
+import shutil
+import struct
+from typing import Iterable, Iterator
+import numpy as np
+from dotenv import load_dotenv
+from .corpus import Chunk
+
+# Load environment variables from a .env file
+load_dotenv()
+
+HEADER = struct.Struct("<HHI")
+
+
+def encode_chunk(chunk: Chunk) -> bytes:
+    fields = [chunk.chunk_id.encode("utf-8"), chunk.source.encode("utf-8"), chunk.text.encode("utf-8")]
+    return HEADER.pack(*(len(field) for field in fields)) + b"".join(fields)
+
+
+def write_segment(path: str, chunks: Iterable[Chunk]) -> int:
+    """
+    Writes chunks to a segment, a data file plus its .idx offsets, to be
+    appended to a store with ChunkStore.append_segment
+    Returns:
+        Number of chunks written
+    """
+    offsets = []
+    position = 0
+    with open(path, "wb") as data:
+        for chunk in chunks:
+            record = encode_chunk(chunk)
+            offsets.append(position)
+            data.write(record)
+            position += len(record)
+    np.asarray(offsets, dtype=np.int64).tofile(path + ".idx")
+    return len(offsets)
+
+
+class ChunkStore:
+    """
+    Append-only chunk store with an offset index
+    - CHUNK_STORE_PATH: Store directory (default: .cache/chunk_store)
+    """
+
+    def __init__(self, path: str | None = None):
+        self.path = path or os.getenv("CHUNK_STORE_PATH", ".cache/chunk_store")
+        os.makedirs(self.path, exist_ok=True)
+        self.data_path = os.path.join(self.path, "chunks.bin")
+        self.index_path = os.path.join(self.path, "chunks.idx")
+        self.manifest_path = os.path.join(self.path, "manifest.json")
+        manifest = {"records": 0, "size": 0, "files": {}}
+        if os.path.exists(self.manifest_path):
+            with open(self.manifest_path, encoding="utf-8") as f:
+                manifest = json.load(f)
+        self.records: int = manifest["records"]
+        self.size: int = manifest["size"]
+        self.files: dict[str, dict] = manifest["files"]
+        # Cut off anything appended after the last commit
+        for path, length in ((self.data_path, self.size), (self.index_path, self.records * 8)):
+            with open(path, "ab") as f:
+                f.truncate(length)
+        self._data = None
+        self._offsets = None
+
+    def __len__(self) -> int:
+        return self.records
+
+    def append_segment(self, segment: str) -> tuple[int, int]:
+        """
+        Appends a segment written by write_segment, uncommitted until commit
+        Returns:
+            Range [start, end) of the records it now occupies
+        """
+        offsets = np.fromfile(segment + ".idx", dtype=np.int64)
+        start = self.records
+        with open(segment, "rb") as src, open(self.data_path, "ab") as dst:
+            shutil.copyfileobj(src, dst, 1 << 20)
+            size = dst.tell()
+        with open(self.index_path, "ab") as f:
+            (offsets + self.size).tofile(f)
+        self.records += len(offsets)
+        self.size = size
+        self._data = self._offsets = None
+        return start, self.records
+
+    def commit(self) -> None:
+        """Atomically records the appended chunks and the file table"""
+        for path in (self.data_path, self.index_path):
+            with open(path, "ab") as f:
+                os.fsync(f.fileno())
+        temp = self.manifest_path + ".tmp"
+        with open(temp, "w", encoding="utf-8") as f:
+            json.dump({"records": self.records, "size": self.size, "files": self.files}, f, ensure_ascii=False)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(temp, self.manifest_path)
+
+    def chunk(self, record: int) -> Chunk:
+        """Reads one record"""
+        if self._data is None:
+            self._data = np.memmap(self.data_path, dtype=np.uint8, mode="r") if self.size else np.zeros(0, np.uint8)
+            self._offsets = np.fromfile(self.index_path, dtype=np.int64, count=self.records)
+        start = int(self._offsets[record])
+        lengths = HEADER.unpack(self._data[start:start + HEADER.size].tobytes())
+        position = start + HEADER.size
+        fields = []
+        for length in lengths:
+            fields.append(self._data[position:position + length].tobytes().decode("utf-8"))
+            position += length
+        return Chunk(*fields)
+
+    def iter_chunks(self) -> Iterator[Chunk]:
+        """Yields the live chunks, file by file in path order"""
+        for name in sorted(self.files):
+            entry = self.files[name]
+            for record in range(entry["start"], entry["end"]):
+                yield self.chunk(record)
+
+    def live(self) -> int:
+        return sum(entry["end"] - entry["start"] for entry in self.files.values())
+
+    def compact(self) -> int:
+        """
+        Rewrites the store with only its live chunks
+        Returns:
+            Number of garbage records dropped
+        """
+        dropped = self.records - self.live()
+        if not dropped:
+            return 0
+        # A leftover from an interrupted compaction is started over
+        shutil.rmtree(self.path + ".compact", ignore_errors=True)
+        compacted = ChunkStore(self.path + ".compact")
+        for name in sorted(self.files):
+            segment = os.path.join(compacted.path, "segment")
+            entry = self.files[name]
+            write_segment(segment, (self.chunk(record) for record in range(entry["start"], entry["end"])))
+            start, end = compacted.append_segment(segment)
+            compacted.files[name] = {**entry, "start": start, "end": end}
+            os.remove(segment)
+            os.remove(segment + ".idx")
+        compacted.commit()
+        self._data = self._offsets = None
+        backup = self.path + ".old"
+        os.replace(self.path, backup)
+        os.replace(compacted.path, self.path)
+        shutil.rmtree(backup)
+        self.records, self.size, self.files = compacted.records, compacted.size, compacted.files
+        return dropped
+
+    def stats(self) -> dict:
+        return {
+            "files": len(self.files),
+            "records": self.records,
+            "live": self.live(),
+            "bytes": self.size,
+        }
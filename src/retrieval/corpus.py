@@ -0,0 +1,101 @@
+"""
+Regulation corpus loading and chunking.
+
+A corpus is a directory (or single file) of:
+- .jsonl files with one {"source": "ORC_4709.09", "text": "..."} object per line
+- .txt files whose file name is the source ID (e.g. "§ 721.80.txt")
+- .xml and .html/.htm dumps split into their sections (see markup), read as a stream
+Each regulation is split into paragraph-aligned chunks that keep their source ID.
+"""
+
+import json
+import os
+import re
+from typing import Iterator, NamedTuple
+from .markup import iter_html_sections, iter_xml_sections
+
+# Paragraphs are separated by blank lines
+PARAGRAPH_BREAK = re.compile(r"\n\s*\n")
+# File types a corpus may contain
+CORPUS_SUFFIXES = (".jsonl", ".txt", ".xml", ".html", ".htm")
+
+
+class Chunk(NamedTuple):
+    """
+    A retrievable piece of regulation text
+    - chunk_id: Unique ID, "<source>#<n>"
+    - source: Source ID of the regulation (e.g. "OCR_4709.09", "§ 721.80")
+    - text: Chunk content
+    """
+    chunk_id: str
+    source: str
+    text: str
+
+
+def split_chunks(source: str, text: str, max_words: int = 200) -> list[Chunk]:
+    """
+    Splits one regulation into chunks of whole paragraphs
+    Args:
+        source: Source ID of the regulation
+        text: Full regulation text
+        max_words: Soft limit on words per chunk, a longer paragraph becomes its own chunk
+    Returns:
+        Chunks in document order
+    """
+    chunks, current, words = [], [], 0
+    for paragraph in PARAGRAPH_BREAK.split(text):
+        paragraph = paragraph.strip()
+        if not paragraph:
+            continue
+        length = len(paragraph.split())
+        if current and words + length > max_words:
+            chunks.append("\n\n".join(current))
+            current, words = [], 0
+        current.append(paragraph)
+        words += length
+    if current:
+        chunks.append("\n\n".join(current))
+    return [Chunk(f"{source}#{n}", source, chunk) for n, chunk in enumerate(chunks)]
+
+
+def corpus_files(path: str) -> list[str]:
+    """Corpus files under a directory (or the file itself), sorted"""
+    if not os.path.isdir(path):
+        return [path]
+    return sorted(
+        os.path.join(root, name)
+        for root, _, files in os.walk(path)
+        for name in files
+        if name.endswith(CORPUS_SUFFIXES)
+    )
+
+
+def iter_corpus(path: str, max_words: int = 200) -> Iterator[Chunk]:
+    """
+    Yields chunks for every regulation found under path
+    Args:
+        path: Corpus directory or file
+        max_words: Soft limit on words per chunk
+    """
+    if os.path.isdir(path):
+        for root, _, files in os.walk(path):
+            for name in sorted(files):
+                yield from iter_corpus(os.path.join(root, name), max_words)
+        return
+
+    if path.endswith(".jsonl"):
+        with open(path, encoding="utf-8") as f:
+            for line in f:
+                if line.strip():
+                    record = json.loads(line)
+                    yield from split_chunks(record["source"], record["text"], max_words)
+    elif path.endswith(".txt"):
+        with open(path, encoding="utf-8") as f:
+            source = os.path.splitext(os.path.basename(path))[0]
+            yield from split_chunks(source, f.read(), max_words)
+    elif path.endswith(".xml"):
+        for source, text in iter_xml_sections(path):
+            yield from split_chunks(source, text, max_words)
+    elif path.endswith((".html", ".htm")):
+        for source, text in iter_html_sections(path):
+            yield from split_chunks(source, text, max_words)
@@ -0,0 +1,329 @@
+"""
+BM25 sparse index over regulation chunks.
+
+Terms are hashed with scikit-learn's HashingVectorizer, so no vocabulary has to
+be stored or loaded. The index is kept term-major (CSC): for every hashed term
+the IDs of the chunks containing it and the precomputed BM25 weight of the term
+in that chunk. A query only touches the postings of its own terms, which keeps
+top-k lookups in the low milliseconds even for hundreds of thousands of chunks.
+
+On disk an index is a directory of .npy arrays plus a small JSON file. Arrays
+are opened memory-mapped, so loading is instant and forked workers share pages.
+
+    postings_indptr.npy     term -> [start, end) in the postings arrays
+    postings_docs.npy       chunk numbers (int32) per posting
+    postings_weights.npy    BM25 weights (float32) per posting
+    text_offsets.npy        chunk -> [start, end) in text.bin
+    text.bin                UTF-8 chunk texts, back to back
+    chunk_id_offsets.npy    chunk -> [start, end) in chunk_id.bin
+    chunk_id.bin            UTF-8 chunk IDs, back to back
+    source_offsets.npy      source -> [start, end) in source.bin
+    source.bin              UTF-8 source IDs in order of first appearance
+    source_order.npy        source numbers (int32) sorted by source ID, for lookups
+    chunk_sources.npy       source number (int32) of every chunk
+    source_docs_indptr.npy  source -> [start, end) in source_docs.npy
+    source_docs.npy         chunk numbers (int32) of every source, in document order
+    meta.json               parameters
+"""
+
+import json
+import os
+import threading
+import numpy as np
+from typing import Iterable, NamedTuple
+from dotenv import load_dotenv
+from .corpus import Chunk
+
+# Load environment variables from a .env file
+load_dotenv()
+
+# Keeps dotted and hyphenated identifiers such as 4709.09, 721.80 or P-12-539 as single
+# terms and splits on underscores so "ORC_4709.09" also matches a bare "4709.09"
+TOKEN_PATTERN = r"(?u)[^\W_]+(?:[.\-][^\W_]+)*"
+BATCH_SIZE = 10_000
+# Queries whose postings number less than 1/DENSE_SCORING_RATIO of the chunks are
+# scored over their candidates only, larger ones in an array sized to the corpus
+DENSE_SCORING_RATIO = 4
+# Version of the directory layout, older indexes have to be rebuilt
+INDEX_FORMAT = 2
+
+
+class SearchHit(NamedTuple):
+    """A retrieved chunk and its BM25 score"""
+    score: float
+    chunk: Chunk
+
+
+def make_vectorizer(n_features: int):
+    """Tokenizer shared by indexing and querying, scikit-learn is only imported once an index is used"""
+    from sklearn.feature_extraction.text import HashingVectorizer
+    return HashingVectorizer(
+        n_features=n_features,
+        token_pattern=TOKEN_PATTERN,
+        stop_words="english",
+        alternate_sign=False,
+        norm=None,
+        dtype=np.float32,
+    )
+
+
+class Strings:
+    """Read-only sequence of strings stored back to back in a UTF-8 blob"""
+
+    def __init__(self, offsets: np.ndarray, blob: np.ndarray):
+        self.offsets = offsets
+        self.blob = blob
+
+    @classmethod
+    def load(cls, path: str, name: str, mode: str | None) -> "Strings":
+        """Opens the <name>_offsets.npy and <name>.bin pair written by _write_strings"""
+        offsets = np.load(os.path.join(path, f"{name}_offsets.npy"), mmap_mode=mode)
+        blob = np.memmap(os.path.join(path, f"{name}.bin"), dtype=np.uint8, mode="r") \
+            if offsets[-1] > 0 else np.zeros(0, dtype=np.uint8)
+        return cls(offsets, blob)
+
+    def __len__(self) -> int:
+        return len(self.offsets) - 1
+
+    def __getitem__(self, i: int) -> str:
+        if not -len(self) <= i < len(self):
+            raise IndexError(i)
+        i %= len(self)
+        return self.blob[self.offsets[i]:self.offsets[i + 1]].tobytes().decode("utf-8")
+
+    def __iter__(self):
+        return (self[i] for i in range(len(self)))
+
+
+def _write_strings(path: str, name: str, strings: Iterable[str]) -> None:
+    """Writes strings as <name>.bin and their offsets as <name>_offsets.npy"""
+    offsets = [0]
+    with open(os.path.join(path, f"{name}.bin"), "wb") as f:
+        for string in strings:
+            data = string.encode("utf-8")
+            f.write(data)
+            offsets.append(offsets[-1] + len(data))
+    np.save(os.path.join(path, f"{name}_offsets.npy"), np.asarray(offsets, dtype=np.int64))
+
+
+class BM25Index:
+    """
+    Read-only BM25 index over regulation chunks
+    Use BM25Index.build to create an index directory and BM25Index.load to open it
+    """
+
+    def __init__(self, path: str, mmap: bool = True):
+        """
+        Opens an index directory
+        Args:
+            path: Directory written by BM25Index.build
+            mmap: Memory-map the arrays instead of reading them into memory
+        """
+        mode = "r" if mmap else None
+        with open(os.path.join(path, "meta.json"), encoding="utf-8") as f:
+            meta = json.load(f)
+        if meta.get("format") != INDEX_FORMAT:
+            raise ValueError(f"Index at {path} has an old layout, rebuild it with python -m src.retrieval.build")
+        self.path = path
+        self.k1 = meta["k1"]
+        self.b = meta["b"]
+        self.vectorizer = make_vectorizer(meta["n_features"])
+        self.indptr = np.load(os.path.join(path, "postings_indptr.npy"), mmap_mode=mode)
+        self.docs = np.load(os.path.join(path, "postings_docs.npy"), mmap_mode=mode)
+        self.weights = np.load(os.path.join(path, "postings_weights.npy"), mmap_mode=mode)
+        self.texts = Strings.load(path, "text", mode)
+        self.chunk_ids = Strings.load(path, "chunk_id", mode)
+        # Distinct source IDs in order of first appearance
+        self.sources = Strings.load(path, "source", mode)
+        self.source_order = np.load(os.path.join(path, "source_order.npy"), mmap_mode=mode)
+        self.chunk_sources = np.load(os.path.join(path, "chunk_sources.npy"), mmap_mode=mode)
+        self.source_indptr = np.load(os.path.join(path, "source_docs_indptr.npy"), mmap_mode=mode)
+        self.source_docs = np.load(os.path.join(path, "source_docs.npy"), mmap_mode=mode)
+
+    @classmethod
+    def load(cls, path: str, mmap: bool = True) -> "BM25Index":
+        """Opens an index directory, memory-mapped by default"""
+        return cls(path, mmap)
+
+    @staticmethod
+    def is_current(path: str) -> bool:
+        """Whether path holds an index in the current layout"""
+        try:
+            with open(os.path.join(path, "meta.json"), encoding="utf-8") as f:
+                return json.load(f).get("format") == INDEX_FORMAT
+        except (OSError, ValueError):
+            return False
+
+    def __len__(self) -> int:
+        return len(self.chunk_ids)
+
+    def chunk(self, doc: int) -> Chunk:
+        """Returns the chunk stored at the given position"""
+        return Chunk(self.chunk_ids[doc], self.sources[int(self.chunk_sources[doc])], self.texts[doc])
+
+    def source_number(self, source: str) -> int | None:
+        """Position of a source ID in sources, found by binary search over source_order"""
+        key = source.encode("utf-8")
+        low, high = 0, len(self.source_order)
+        while low < high:
+            mid = (low + high) // 2
+            number = int(self.source_order[mid])
+            name = self.sources.blob[self.sources.offsets[number]:self.sources.offsets[number + 1]].tobytes()
+            if name == key:
+                return number
+            if name < key:
+                low = mid + 1
+            else:
+                high = mid
+        return None
+
+    def source_chunks(self, source: str) -> list[Chunk]:
+        """Returns every chunk of a source, in document order"""
+        number = self.source_number(source)
+        if number is None:
+            return []
+        docs = self.source_docs[self.source_indptr[number]:self.source_indptr[number + 1]]
+        return [self.chunk(int(doc)) for doc in docs]
+
+    def search(self, query: str, k: int = 5) -> list[SearchHit]:
+        """
+        Finds the best matching chunks for a query
+        Args:
+            query: Free text question or source ID
+            k: Number of chunks to return
+        Returns:
+            Hits ordered by descending score, only chunks sharing a term with the query
+        """
+        terms = np.unique(self.vectorizer.transform([query]).indices)
+        spans = [(self.indptr[term], self.indptr[term + 1]) for term in terms]
+        spans = [(start, end) for start, end in spans if start < end]
+        if not spans:
+            return []
+        postings = sum(int(end - start) for start, end in spans)
+        if postings * DENSE_SCORING_RATIO < len(self):
+            # Scores are only accumulated for the chunks in the query terms' postings
+            docs = np.concatenate([self.docs[start:end] for start, end in spans])
+            weights = np.concatenate([self.weights[start:end] for start, end in spans])
+            candidates, positions = np.unique(docs, return_inverse=True)
+            scores = np.bincount(positions, weights=weights).astype(np.float32)
+        else:
+            # Postings covering much of the corpus are cheaper to add up in place than to sort
+            scores = np.zeros(len(self), dtype=np.float32)
+            for start, end in spans:
+                # Each chunk appears once per term, so plain fancy indexing accumulates correctly
+                scores[self.docs[start:end]] += self.weights[start:end]
+            candidates = np.arange(len(self))
+
+        ranked = np.flatnonzero(scores)
+        if len(ranked) > k:
+            ranked = ranked[np.argpartition(scores[ranked], -k)[-k:]]
+        ranked = ranked[np.argsort(-scores[ranked], kind="stable")]
+        return [SearchHit(float(scores[i]), self.chunk(int(candidates[i]))) for i in ranked]
+
+    @staticmethod
+    def build(
+        chunks: Iterable[Chunk],
+        path: str,
+        n_features: int = 2 ** 20,
+        k1: float = 1.5,
+        b: float = 0.75,
+    ) -> None:
+        """
+        Indexes chunks and writes the index directory
+        Args:
+            chunks: Chunks to index, e.g. from corpus.iter_corpus
+            path: Output directory, created if missing
+            n_features: Hash space for terms
+            k1: BM25 term frequency saturation
+            b: BM25 length normalization
+        """
+        import scipy.sparse as sp
+        os.makedirs(path, exist_ok=True)
+        vectorizer = make_vectorizer(n_features)
+        matrices = []
+        # Source number per chunk, and the number of every distinct source
+        chunk_sources, source_numbers = [], {}
+        offsets, id_offsets = [0], [0]
+
+        # Chunk texts and IDs are streamed to disk, only the sparse counts stay in memory
+        with open(os.path.join(path, "text.bin"), "wb") as texts, \
+                open(os.path.join(path, "chunk_id.bin"), "wb") as chunk_ids:
+            writers = (texts, offsets, chunk_ids, id_offsets, chunk_sources, source_numbers)
+            batch = []
+            for chunk in chunks:
+                batch.append(chunk)
+                if len(batch) == BATCH_SIZE:
+                    matrices.append(_index_batch(batch, vectorizer, *writers))
+                    batch = []
+            if batch:
+                matrices.append(_index_batch(batch, vectorizer, *writers))
+
+        counts = sp.vstack(matrices).tocsr() if matrices else sp.csr_matrix((0, n_features), dtype=np.float32)
+        n_docs = counts.shape[0]
+        doc_len = np.asarray(counts.sum(axis=1)).ravel()
+        avg_len = doc_len.mean() if n_docs else 0.0
+        df = np.bincount(counts.indices, minlength=n_features)
+        idf = np.log1p((n_docs - df + 0.5) / (df + 0.5)).astype(np.float32)
+
+        # BM25 weight of every (chunk, term) pair, computed once at build time
+        tf = counts.data
+        rows = np.repeat(np.arange(n_docs), np.diff(counts.indptr))
+        norm = k1 * (1 - b + b * doc_len[rows] / avg_len) if n_docs else tf
+        counts.data = (idf[counts.indices] * tf * (k1 + 1) / (tf + norm)).astype(np.float32)
+
+        postings = counts.tocsc()
+        postings.sort_indices()
+        np.save(os.path.join(path, "postings_indptr.npy"), postings.indptr.astype(np.int64))
+        np.save(os.path.join(path, "postings_docs.npy"), postings.indices.astype(np.int32))
+        np.save(os.path.join(path, "postings_weights.npy"), postings.data.astype(np.float32))
+        np.save(os.path.join(path, "text_offsets.npy"), np.asarray(offsets, dtype=np.int64))
+        np.save(os.path.join(path, "chunk_id_offsets.npy"), np.asarray(id_offsets, dtype=np.int64))
+
+        sources = list(source_numbers)
+        _write_strings(path, "source", sources)
+        by_name = sorted(range(len(sources)), key=lambda number: sources[number].encode("utf-8"))
+        np.save(os.path.join(path, "source_order.npy"), np.asarray(by_name, dtype=np.int32))
+        chunk_sources = np.asarray(chunk_sources, dtype=np.int32)
+        np.save(os.path.join(path, "chunk_sources.npy"), chunk_sources)
+        # A stable sort keeps the chunks of every source in document order
+        np.save(os.path.join(path, "source_docs.npy"), np.argsort(chunk_sources, kind="stable").astype(np.int32))
+        source_indptr = np.concatenate(([0], np.cumsum(np.bincount(chunk_sources, minlength=len(sources)))))
+        np.save(os.path.join(path, "source_docs_indptr.npy"), source_indptr.astype(np.int64))
+
+        with open(os.path.join(path, "meta.json"), "w", encoding="utf-8") as f:
+            json.dump({"format": INDEX_FORMAT, "n_features": n_features, "k1": k1, "b": b}, f)
+
+
+def _index_batch(batch, vectorizer, texts, offsets, chunk_ids, id_offsets, chunk_sources, source_numbers):
+    """Writes a batch of chunk texts and IDs and returns their term counts"""
+    for chunk in batch:
+        data = chunk.text.encode("utf-8")
+        texts.write(data)
+        offsets.append(offsets[-1] + len(data))
+        data = chunk.chunk_id.encode("utf-8")
+        chunk_ids.write(data)
+        id_offsets.append(id_offsets[-1] + len(data))
+        chunk_sources.append(source_numbers.setdefault(chunk.source, len(source_numbers)))
+    # The source ID is indexed with the text so questions naming a section find it
+    return vectorizer.transform(f"{chunk.source} {chunk.text}" for chunk in batch)
+
+
+_index: BM25Index | None = None
+_index_lock = threading.Lock()
+
+
+def get_regulation_index() -> BM25Index | None:
+    """
+    Returns the process-wide regulation index, opened on first use from
+    REGULATION_INDEX_PATH (default: .cache/regulation_index), or None when no
+    index has been built there
+    """
+    global _index
+    if _index is None:
+        path = os.getenv("REGULATION_INDEX_PATH", ".cache/regulation_index")
+        if not os.path.exists(os.path.join(path, "meta.json")):
+            return None
+        with _index_lock:
+            if _index is None:
+                _index = BM25Index.load(path)
+    return _index
@@ -0,0 +1,137 @@
+"""
+Incremental ingestion of regulation dumps into the chunk store and index.
+
+Corpus files (including multi-GB eCFR XML and ORC HTML dumps) are parsed as
+streams in a process pool, one file per task. Each worker writes the chunks
+of its file to a segment on disk, which the parent appends to the chunk store
+and commits, so neither side holds a whole file in memory and an interrupted
+run keeps every file committed so far.
+
+Files whose size and modification time match the manifest are skipped
+without being opened, files that were only touched are recognized by their
+content hash, and chunks of deleted files are dropped. The BM25 index is
+rebuilt from the store only when something changed.
+
+Usage:
+    python -m src.retrieval.ingest --corpus data/ecfr [--store .cache/chunk_store] [--index .cache/regulation_index] [--workers 8]
+"""
+
+import argparse
+import hashlib
+import os
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from .chunk_store import ChunkStore, write_segment
+from .corpus import corpus_files, iter_corpus
+from .index import BM25Index
+
+
+def file_hash(path: str) -> str:
+    """SHA-256 of a file, read in blocks"""
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        while block := f.read(1 << 20):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def ingest_file(path: str, previous_hash: str | None, segment: str, max_words: int) -> dict:
+    """
+    Worker task: chunks one corpus file into a segment unless its content is unchanged
+    Returns:
+        The file's hash, and the segment and its chunk count when it changed
+    """
+    digest = file_hash(path)
+    if digest == previous_hash:
+        return {"sha256": digest}
+    return {"sha256": digest, "segment": segment, "chunks": write_segment(segment, iter_corpus(path, max_words))}
+
+
+def ingest(corpus: str, store: ChunkStore, workers: int | None = None, max_words: int = 200) -> dict:
+    """
+    Brings the chunk store up to date with a corpus directory
+    Args:
+        corpus: Corpus directory or file
+        store: Chunk store to update
+        workers: Parsing processes (default: INGEST_WORKERS env, or the CPU count)
+        max_words: Soft limit on words per chunk
+    Returns:
+        Counts of unchanged, ingested and removed files and appended chunks
+    """
+    workers = workers or int(os.getenv("INGEST_WORKERS", 0)) or os.cpu_count() or 1
+    files = {os.path.abspath(path): path for path in corpus_files(corpus)}
+    counts = {"files": len(files), "unchanged": 0, "ingested": 0, "removed": 0, "chunks": 0}
+
+    removed = [name for name in store.files if name not in files]
+    for name in removed:
+        del store.files[name]
+    counts["removed"] = len(removed)
+
+    pending = []
+    for name, path in files.items():
+        stat = os.stat(path)
+        entry = store.files.get(name)
+        if entry is not None and entry["size"] == stat.st_size and entry["mtime_ns"] == stat.st_mtime_ns:
+            counts["unchanged"] += 1
+        else:
+            pending.append((name, path, stat))
+
+    with tempfile.TemporaryDirectory(dir=store.path) as segments, \
+            ProcessPoolExecutor(max_workers=min(workers, max(len(pending), 1))) as executor:
+        futures = {
+            executor.submit(
+                ingest_file, path, (store.files.get(name) or {}).get("sha256"),
+                os.path.join(segments, f"{n}.seg"), max_words,
+            ): (name, stat)
+            for n, (name, path, stat) in enumerate(pending)
+        }
+        for future in as_completed(futures):
+            name, stat = futures[future]
+            result = future.result()
+            entry = {"size": stat.st_size, "mtime_ns": stat.st_mtime_ns, "sha256": result["sha256"]}
+            if "segment" in result:
+                start, end = store.append_segment(result["segment"])
+                os.remove(result["segment"])
+                os.remove(result["segment"] + ".idx")
+                store.files[name] = {**entry, "start": start, "end": end}
+                counts["ingested"] += 1
+                counts["chunks"] += result["chunks"]
+            else:
+                store.files[name] = {**store.files[name], **entry}
+                counts["unchanged"] += 1
+            # Every finished file is committed, a rerun after a crash resumes from here
+            store.commit()
+    if removed:
+        store.commit()
+    return counts
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Ingest regulation dumps into the chunk store and index")
+    parser.add_argument("--corpus", required=True, help="Corpus directory or file (.jsonl / .txt / .xml / .html)")
+    parser.add_argument("--store", default=os.getenv("CHUNK_STORE_PATH", ".cache/chunk_store"))
+    parser.add_argument("--index", default=os.getenv("REGULATION_INDEX_PATH", ".cache/regulation_index"))
+    parser.add_argument("--workers", type=int, default=None, help="Parsing processes")
+    parser.add_argument("--max-words", type=int, default=200, help="Soft limit on words per chunk")
+    parser.add_argument("--compact", action="store_true", help="Drop chunks of replaced and deleted files")
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    store = ChunkStore(args.store)
+    counts = ingest(args.corpus, store, args.workers, args.max_words)
+    print(
+        f"{counts['files']} files: {counts['ingested']} ingested ({counts['chunks']} chunks), "
+        f"{counts['unchanged']} unchanged, {counts['removed']} removed in {time.perf_counter() - start:.1f}s"
+    )
+    if args.compact:
+        print(f"Compaction dropped {store.compact()} stale chunks")
+
+    if counts["ingested"] or counts["removed"] or not BM25Index.is_current(args.index):
+        start = time.perf_counter()
+        BM25Index.build(store.iter_chunks(), args.index)
+        print(f"Indexed {store.live()} chunks into {args.index} in {time.perf_counter() - start:.1f}s")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,166 @@
+"""
+Streaming section parsers for XML and HTML regulation dumps.
+
+Both parsers read their file incrementally and yield one (source, text) pair
+per regulation section as soon as the section is complete, so memory stays
+bounded by the largest section rather than the file size.
+
+- XML (eCFR and GPO CFR): sections are DIV8 TYPE="SECTION" or SECTION
+  elements, identified by their HEAD/SECTNO text such as "§ 721.80"
+- HTML (e.g. Ohio Revised Code pages): a heading naming a section ("§ 721.80"
+  or "Section 4709.09") starts a new section
+
+Section text is returned as paragraphs separated by blank lines, the format
+split_chunks expects.
+"""
+
+import re
+import xml.etree.ElementTree as ET
+from collections import deque
+from html.parser import HTMLParser
+from typing import Iterator
+
+# "§ 721.80", "§§ 721.80" or "Section 4709.09" at the start of a heading
+SECTION_SIGN = re.compile(r"^\s*§+\s*(\d+[A-Za-z]?(?:[.\-]\d+[A-Za-z]?)*)")
+SECTION_WORD = re.compile(r"^\s*Section\s+(\d+(?:\.\d+)+[A-Za-z]?)")
+# Sections numbered "Section 4709.09" are Ohio Revised Code sections
+SECTION_WORD_PREFIX = "ORC_"
+
+# XML elements holding one section, and the children naming it
+XML_SECTIONS = {"DIV8", "SECTION"}
+XML_SECTION_IDS = ("SECTNO", "HEAD")
+# HTML elements whose text forms a paragraph of its own
+HTML_BLOCKS = {"p", "li", "dd", "dt", "td", "th", "pre", "blockquote", "h1", "h2", "h3", "h4", "h5", "h6"}
+HTML_HEADINGS = {"h1", "h2", "h3", "h4", "h5", "h6"}
+HTML_SKIPPED = {"script", "style", "head", "nav", "footer"}
+
+READ_SIZE = 1 << 20
+
+
+def section_id(heading: str) -> str | None:
+    """Source ID named by a section heading, e.g. "§ 721.80" or "ORC_4709.09" """
+    match = SECTION_SIGN.match(heading)
+    if match:
+        return f"§ {match.group(1)}"
+    match = SECTION_WORD.match(heading)
+    if match:
+        return f"{SECTION_WORD_PREFIX}{match.group(1)}"
+    return None
+
+
+def iter_xml_sections(path: str) -> Iterator[tuple[str, str]]:
+    """
+    Yields (source, text) for every section of an XML dump
+    Finished elements are cleared and detached as the parser goes
+    """
+    stack: list[ET.Element] = []
+    sections = 0
+    for event, elem in ET.iterparse(path, events=("start", "end")):
+        if event == "start":
+            stack.append(elem)
+            if _is_xml_section(elem):
+                sections += 1
+            continue
+        stack.pop()
+        if _is_xml_section(elem):
+            sections -= 1
+            section = _xml_section(elem)
+            if section is not None:
+                yield section
+            elem.clear()
+            if stack:
+                stack[-1].remove(elem)
+        elif not sections:
+            # Outside any section nothing is needed later, sections in here were detached already
+            elem.clear()
+
+
+def _is_xml_section(elem: ET.Element) -> bool:
+    return elem.tag in XML_SECTIONS and elem.get("TYPE", "SECTION") == "SECTION"
+
+
+def _xml_section(elem: ET.Element) -> tuple[str, str] | None:
+    source = None
+    for tag in XML_SECTION_IDS:
+        heading = elem.find(tag)
+        if heading is not None:
+            source = section_id(_text(heading))
+            if source is not None:
+                break
+    if source is None and elem.get("N"):
+        source = section_id(f"§ {elem.get('N')}")
+    if source is None:
+        return None
+    paragraphs = [_text(child) for child in elem if child.tag not in XML_SECTION_IDS]
+    text = "\n\n".join(paragraph for paragraph in paragraphs if paragraph)
+    return (source, text) if text else None
+
+
+def _text(elem: ET.Element) -> str:
+    return " ".join("".join(elem.itertext()).split())
+
+
+class _SectionParser(HTMLParser):
+    """Collects paragraphs and starts a new section at every section heading"""
+
+    def __init__(self):
+        super().__init__(convert_charrefs=True)
+        self.sections: deque[tuple[str, str]] = deque()
+        self._source: str | None = None
+        self._paragraphs: list[str] = []
+        self._buffer: list[str] = []
+        self._skipping = 0
+
+    def handle_starttag(self, tag, attrs):
+        if tag in HTML_SKIPPED:
+            self._skipping += 1
+        elif tag in HTML_BLOCKS or tag == "br":
+            self._flush()
+
+    def handle_endtag(self, tag):
+        if tag in HTML_SKIPPED:
+            self._skipping = max(0, self._skipping - 1)
+        elif tag in HTML_HEADINGS:
+            heading = " ".join("".join(self._buffer).split())
+            source = section_id(heading)
+            if source is not None:
+                self._buffer = []
+                self.finish()
+                self._source = source
+            else:
+                self._flush()
+        elif tag in HTML_BLOCKS:
+            self._flush()
+
+    def handle_data(self, data):
+        if not self._skipping:
+            self._buffer.append(data)
+
+    def _flush(self) -> None:
+        paragraph = " ".join("".join(self._buffer).split())
+        self._buffer = []
+        if paragraph and self._source is not None:
+            self._paragraphs.append(paragraph)
+
+    def finish(self) -> None:
+        """Completes the current section"""
+        self._flush()
+        if self._source is not None and self._paragraphs:
+            self.sections.append((self._source, "\n\n".join(self._paragraphs)))
+        self._paragraphs = []
+
+
+def iter_html_sections(path: str) -> Iterator[tuple[str, str]]:
+    """
+    Yields (source, text) for every section of an HTML page or dump
+    Text before the first section heading is ignored
+    """
+    parser = _SectionParser()
+    with open(path, encoding="utf-8", errors="replace") as f:
+        while data := f.read(READ_SIZE):
+            parser.feed(data)
+            while parser.sections:
+                yield parser.sections.popleft()
+    parser.close()
+    parser.finish()
+    yield from parser.sections
@@ -0,0 +1,17 @@
+from .classifier import (
+    QuestionClassifier,
+    get_question_classifier,
+    log_labelled_question,
+    normalize_label,
+)
+from .semantic_cache import SemanticCache, SemanticHit, get_semantic_cache
+
+__all__ = [
+    "QuestionClassifier",
+    "SemanticCache",
+    "SemanticHit",
+    "get_question_classifier",
+    "get_semantic_cache",
+    "log_labelled_question",
+    "normalize_label",
+]
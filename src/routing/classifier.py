@@ -0,0 +1,166 @@
+"""
+Local fast-path question classifier.
+
+A hashed bag-of-words/bigrams logistic regression trained on logged
+(question, label) pairs from the LLM router. It answers in microseconds and is
+only trusted when its probability clears the confidence threshold, otherwise
+RouterAgent falls back to the LLM.
+
+scikit-learn and joblib are only imported when a classifier is trained,
+loaded or used, so servers without a trained model never pay for them.
+"""
+
+import json
+import os
+import re
+import threading
+import numpy as np
+from typing import Iterable
+from dotenv import load_dotenv
+
+# Load environment variables from a .env file
+load_dotenv()
+
+REGULATION_LABEL = "REGULATION_QUESTION"
+OTHER_LABEL = "OTHER"
+# HashingVectorizer's default word tokenizer
+TOKEN = re.compile(r"(?u)\b\w\w+\b")
+
+
+def normalize_label(label: str) -> str:
+    """Maps raw router output onto the two known categories"""
+    return REGULATION_LABEL if REGULATION_LABEL in label.upper() else OTHER_LABEL
+
+
+class QuestionClassifier:
+    """
+    Binary REGULATION_QUESTION / OTHER classifier
+    Use QuestionClassifier.train to fit one and save/load to persist it
+    """
+
+    def __init__(self, n_features: int = 2 ** 18):
+        from sklearn.feature_extraction.text import HashingVectorizer
+        self.vectorizer = HashingVectorizer(
+            n_features=n_features,
+            ngram_range=(1, 2),
+            alternate_sign=False,
+            norm="l2",
+        )
+        self.coef: np.ndarray | None = None
+        self.intercept = 0.0
+
+    @classmethod
+    def train(cls, questions: list[str], labels: list[str], n_features: int = 2 ** 18) -> "QuestionClassifier":
+        """
+        Fits the classifier
+        Args:
+            questions: Question texts
+            labels: Router labels, normalized with normalize_label
+        Returns:
+            Trained classifier
+        """
+        from sklearn.linear_model import LogisticRegression
+        classifier = cls(n_features)
+        y = np.array([normalize_label(label) == REGULATION_LABEL for label in labels], dtype=int)
+        model = LogisticRegression(C=10.0, max_iter=1000, class_weight="balanced")
+        model.fit(classifier.vectorizer.transform(questions), y)
+        # Keeping only the weights makes prediction a sparse dot product
+        classifier.coef = model.coef_.ravel().astype(np.float64)
+        classifier.intercept = float(model.intercept_[0])
+        return classifier
+
+    def predict(self, question: str) -> tuple[str, float]:
+        """
+        Classifies one question
+        Returns:
+            (label, confidence) where confidence is the probability of the label
+        """
+        indices, values = self._features(question)
+        score = float(values @ self.coef[indices]) + self.intercept
+        p_regulation = 1.0 / (1.0 + np.exp(-score))
+        if p_regulation >= 0.5:
+            return REGULATION_LABEL, p_regulation
+        return OTHER_LABEL, 1.0 - p_regulation
+
+    def _features(self, question: str) -> tuple[np.ndarray, np.ndarray]:
+        """
+        Same features as self.vectorizer.transform, computed directly to avoid
+        scikit-learn's per-call validation overhead on single questions
+        """
+        from sklearn.utils import murmurhash3_32
+        tokens = TOKEN.findall(question.lower())
+        terms = tokens + [f"{a} {b}" for a, b in zip(tokens, tokens[1:])]
+        counts: dict[int, int] = {}
+        n_features = self.vectorizer.n_features
+        for term in terms:
+            index = abs(murmurhash3_32(term, seed=0)) % n_features
+            counts[index] = counts.get(index, 0) + 1
+        indices = np.fromiter(counts.keys(), dtype=np.int64, count=len(counts))
+        values = np.fromiter(counts.values(), dtype=np.float64, count=len(counts))
+        norm = np.sqrt(values @ values)
+        return indices, values / norm if norm else values
+
+    def save(self, path: str) -> None:
+        import joblib
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        joblib.dump({
+            "n_features": self.vectorizer.n_features,
+            "coef": self.coef,
+            "intercept": self.intercept,
+        }, path)
+
+    @classmethod
+    def load(cls, path: str) -> "QuestionClassifier":
+        import joblib
+        data = joblib.load(path)
+        classifier = cls(data["n_features"])
+        classifier.coef = data["coef"]
+        classifier.intercept = data["intercept"]
+        return classifier
+
+
+_classifier: QuestionClassifier | None = None
+_classifier_lock = threading.Lock()
+
+
+def get_question_classifier() -> QuestionClassifier | None:
+    """
+    Returns the process-wide classifier loaded from ROUTER_MODEL_PATH
+    (default: .cache/router_classifier.joblib), or None when none was trained
+    """
+    global _classifier
+    if _classifier is None:
+        path = os.getenv("ROUTER_MODEL_PATH", ".cache/router_classifier.joblib")
+        if not os.path.exists(path):
+            return None
+        with _classifier_lock:
+            if _classifier is None:
+                _classifier = QuestionClassifier.load(path)
+    return _classifier
+
+
+_log_lock = threading.Lock()
+
+
+def log_labelled_question(question: str, label: str) -> None:
+    """
+    Appends an LLM labelled question to ROUTER_LABEL_LOG
+    (default: .cache/router_labels.jsonl) as training data, empty disables logging
+    """
+    path = os.getenv("ROUTER_LABEL_LOG", ".cache/router_labels.jsonl")
+    if not path:
+        return
+    line = json.dumps({"question": question, "label": label}, ensure_ascii=False)
+    with _log_lock:
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        with open(path, "a", encoding="utf-8") as f:
+            f.write(line + "\n")
+
+
+def read_labelled_questions(path: str) -> Iterable[tuple[str, str]]:
+    """Reads (question, label) pairs written by log_labelled_question"""
+    with open(path, encoding="utf-8") as f:
+        for line in f:
+            if line.strip():
+                record = json.loads(line)
+                yield record["question"], record["label"]
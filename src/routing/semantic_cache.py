@@ -0,0 +1,327 @@
+"""
+Near-duplicate answer cache in front of the router workflow.
+
+Users ask the same compliance question in many phrasings, which an exact
+prompt cache cannot match. Questions are embedded locally as hashed TF-IDF
+vectors of their words and word pairs, and a new question is compared against
+every cached one with a single matrix product. Above the similarity threshold
+the cached response is returned without running the workflow.
+
+Two questions only match when they mention the same numbers (section IDs such
+as 4709.09 or 721.80), since near-identical questions about different
+sections need different answers. A sample of hits is audited by running the
+workflow anyway and comparing the outcome, which measures the false-hit rate
+of the threshold in production.
+
+Cached answers are kept in a SQLite file shared by every server process. Each
+process holds the vectors in memory and picks up answers stored by the others
+before every lookup, so pre-forked workers share one cache.
+"""
+
+import json
+import math
+import os
+import re
+import sqlite3
+import threading
+import time
+from collections import deque
+from typing import NamedTuple
+import numpy as np
+from dotenv import load_dotenv
+
+# Load environment variables from a .env file
+load_dotenv()
+
+TOKEN = re.compile(r"(?u)\b\w\w+\b")
+# Words that carry no meaning for matching, negations are deliberately kept
+STOP_WORDS = frozenset(
+    "a an and are as at be by can do does for from has have how i in is it its me my of on or our "
+    "should that the their there this to under us was we what when where which who whom why will "
+    "with would you your".split()
+)
+
+
+class SemanticHit(NamedTuple):
+    """A cached answer for a near-duplicate question"""
+    question: str
+    similarity: float
+    question_type: dict
+    response: dict
+
+
+class _Entry(NamedTuple):
+    question: str
+    terms: dict[int, float]
+    guard: frozenset
+    question_type: dict
+    response: dict
+    created: float
+
+
+class SemanticCache:
+    """
+    Bounded near-duplicate cache of router responses
+    - SEMANTIC_CACHE_PATH: SQLite file shared between processes, ":memory:" keeps answers in this process (default: .cache/semantic_cache.sqlite)
+    - SEMANTIC_CACHE_THRESHOLD: Minimum cosine similarity for a hit (default: 0.9)
+    - SEMANTIC_CACHE_CAPACITY: Questions kept, least recently used are evicted (default: 4096)
+    - SEMANTIC_CACHE_TTL: Seconds an answer stays valid (default: 86400)
+    - SEMANTIC_CACHE_DIMENSIONS: Hashed feature dimensions (default: 1024)
+    - SEMANTIC_CACHE_AUDIT_RATE: Fraction of hits re-run to detect false hits (default: 0.05)
+    - SEMANTIC_CACHE_AUDIT_LOG: JSONL file receiving false hits, empty disables it (default: .cache/semantic_false_hits.jsonl)
+    """
+
+    # Recent false hits shown in stats
+    RECENT_FALSE_HITS = 20
+
+    def __init__(
+        self,
+        path: str | None = None,
+        threshold: float | None = None,
+        capacity: int | None = None,
+        ttl: float | None = None,
+        dimensions: int | None = None,
+    ):
+        self.threshold = threshold or float(os.getenv("SEMANTIC_CACHE_THRESHOLD", 0.9))
+        self.capacity = capacity or int(os.getenv("SEMANTIC_CACHE_CAPACITY", 4096))
+        self.ttl = ttl or float(os.getenv("SEMANTIC_CACHE_TTL", 86400))
+        self.dimensions = dimensions or int(os.getenv("SEMANTIC_CACHE_DIMENSIONS", 1024))
+        self.audit_rate = float(os.getenv("SEMANTIC_CACHE_AUDIT_RATE", 0.05))
+        self.audit_log = os.getenv("SEMANTIC_CACHE_AUDIT_LOG", ".cache/semantic_false_hits.jsonl")
+        self.path = path or os.getenv("SEMANTIC_CACHE_PATH", ".cache/semantic_cache.sqlite")
+        if self.path != ":memory:":
+            os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+        self._db = sqlite3.connect(self.path, check_same_thread=False, timeout=30)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute(
+            """CREATE TABLE IF NOT EXISTS answers (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                question TEXT NOT NULL,
+                question_type TEXT NOT NULL,
+                response TEXT NOT NULL,
+                created REAL NOT NULL
+            )"""
+        )
+        self._db.commit()
+        # Last answer ID loaded into this process
+        self._synced = 0
+
+        self._lock = threading.Lock()
+        # Row i holds the normalized TF-IDF vector of slot i, empty slots are zero rows
+        self._vectors = np.zeros((self.capacity, self.dimensions), dtype=np.float32)
+        self._entries: list[_Entry | None] = [None] * self.capacity
+        self._used = np.full(self.capacity, -np.inf)
+        self._slots: dict[str, int] = {}
+        # Document frequencies of the hashed terms over the cached questions
+        self._df = np.zeros(self.dimensions, dtype=np.float64)
+        self._size = 0
+        # Rows weighted with outdated document frequencies since the last reweighting
+        self._stale = 0
+
+        self.lookups = 0
+        self.hits = 0
+        self.stored = 0
+        self.evicted = 0
+        self.audited = 0
+        self.false_hits = 0
+        self._recent_false_hits = deque(maxlen=self.RECENT_FALSE_HITS)
+
+    def reopen(self) -> None:
+        """Opens a new connection in a forked worker, SQLite connections must not cross a fork"""
+        if self.path == ":memory:":
+            # Nothing to reopen, the copied database is the worker's own
+            return
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(self.path, check_same_thread=False, timeout=30)
+
+    def lookup(self, question: str) -> SemanticHit | None:
+        """Returns the cached answer of the most similar question above the threshold"""
+        terms, guard = self._terms(question)
+        with self._lock:
+            self.lookups += 1
+            self._sync()
+            if not terms or self._size == 0:
+                return None
+            if self._stale > max(16, self._size // 10):
+                self._reweight()
+            similarities = self._vectors @ self._vector(terms)
+            now = time.time()
+            # The best few candidates are enough, the guard rarely rejects more than one
+            for slot in np.argsort(similarities)[::-1][:8]:
+                similarity = float(similarities[slot])
+                if similarity < self.threshold:
+                    break
+                entry = self._entries[slot]
+                if entry is None or entry.guard != guard or now - entry.created > self.ttl:
+                    continue
+                self._used[slot] = now
+                self.hits += 1
+                return SemanticHit(entry.question, similarity, entry.question_type, entry.response)
+        return None
+
+    def store(self, question: str, question_type: dict, response: dict) -> None:
+        """Caches the answer to a question, replacing an earlier answer to the same question"""
+        if not self._terms(question)[0]:
+            return
+        now = time.time()
+        with self._lock:
+            cursor = self._db.execute(
+                "INSERT INTO answers (question, question_type, response, created) VALUES (?, ?, ?, ?)",
+                (question, json.dumps(question_type), json.dumps(response, ensure_ascii=False), now),
+            )
+            # Every process keeps at most capacity answers, older and expired rows are of no use to any
+            self._db.execute(
+                "DELETE FROM answers WHERE id <= ? OR created < ?", (cursor.lastrowid - self.capacity, now - self.ttl)
+            )
+            self._db.commit()
+            self.stored += 1
+            self._sync()
+
+    def _sync(self) -> None:
+        """Loads the answers stored since the last sync, by any process"""
+        rows = self._db.execute(
+            "SELECT id, question, question_type, response, created FROM answers WHERE id > ? AND created >= ? ORDER BY id",
+            (self._synced, time.time() - self.ttl),
+        ).fetchall()
+        for answer_id, question, question_type, response, created in rows:
+            self._insert(question, json.loads(question_type), json.loads(response), created)
+            self._synced = answer_id
+
+    def _insert(self, question: str, question_type: dict, response: dict, created: float) -> None:
+        terms, guard = self._terms(question)
+        if not terms:
+            return
+        key = _normalize(question)
+        slot = self._slots.get(key)
+        if slot is None:
+            slot = self._free_slot()
+        else:
+            self._remove(slot)
+        self._entries[slot] = _Entry(question, terms, guard, question_type, response, created)
+        self._slots[key] = slot
+        self._used[slot] = time.time()
+        for index in terms:
+            self._df[index] += 1
+        self._size += 1
+        self._stale += 1
+        self._vectors[slot] = self._vector(terms)
+
+    def audit(self, hit: SemanticHit, question: str, question_type: dict, response: dict) -> bool:
+        """
+        Compares a hit with the answer the workflow gave when run anyway
+        A hit is false when the question was classified differently or, for
+        regulation questions, a different regulation was retrieved
+        Returns:
+            Whether the hit was correct
+        """
+        correct = hit.question_type.get("type") == question_type.get("type") and (
+            hit.response.get("regulation") == response.get("regulation")
+        )
+        record = None
+        with self._lock:
+            self.audited += 1
+            if not correct:
+                self.false_hits += 1
+                record = {
+                    "question": question,
+                    "matched": hit.question,
+                    "similarity": round(hit.similarity, 4),
+                    "cached_type": hit.question_type.get("type"),
+                    "fresh_type": question_type.get("type"),
+                    "time": time.time(),
+                }
+                self._recent_false_hits.append(record)
+        if record is not None and self.audit_log:
+            os.makedirs(os.path.dirname(os.path.abspath(self.audit_log)), exist_ok=True)
+            with open(self.audit_log, "a", encoding="utf-8") as f:
+                f.write(json.dumps(record, ensure_ascii=False) + "\n")
+        return correct
+
+    def _terms(self, question: str) -> tuple[dict[int, float], frozenset]:
+        """Sublinear term frequencies of the hashed words and word pairs, and the numbers mentioned"""
+        # Imported on use, the cache is off by default and scikit-learn is slow to import
+        from sklearn.utils import murmurhash3_32
+        tokens = TOKEN.findall(question.lower())
+        guard = frozenset(token for token in tokens if any(c.isdigit() for c in token))
+        words = [token for token in tokens if token not in STOP_WORDS]
+        counts: dict[int, int] = {}
+        for term in words + [f"{a} {b}" for a, b in zip(words, words[1:])]:
+            index = abs(murmurhash3_32(term, seed=0)) % self.dimensions
+            counts[index] = counts.get(index, 0) + 1
+        return {index: 1.0 + math.log(count) for index, count in counts.items()}, guard
+
+    def _vector(self, terms: dict[int, float]) -> np.ndarray:
+        """Normalized TF-IDF vector under the current document frequencies"""
+        indices = np.fromiter(terms.keys(), dtype=np.int64, count=len(terms))
+        vector = np.zeros(self.dimensions, dtype=np.float32)
+        vector[indices] = np.fromiter(terms.values(), dtype=np.float64, count=len(terms)) * (
+            np.log((1 + self._size) / (1 + self._df[indices])) + 1
+        )
+        norm = np.linalg.norm(vector)
+        return vector / norm if norm else vector
+
+    def _reweight(self) -> None:
+        """Recomputes every row with the current document frequencies"""
+        for slot, entry in enumerate(self._entries):
+            if entry is not None:
+                self._vectors[slot] = self._vector(entry.terms)
+        self._stale = 0
+
+    def _free_slot(self) -> int:
+        """An empty slot, or the slot of the least recently used question which is evicted"""
+        if self._size < self.capacity:
+            return self._entries.index(None)
+        slot = int(np.argmin(self._used))
+        self._remove(slot)
+        self.evicted += 1
+        return slot
+
+    def _remove(self, slot: int) -> None:
+        entry = self._entries[slot]
+        for index in entry.terms:
+            self._df[index] -= 1
+        del self._slots[_normalize(entry.question)]
+        self._entries[slot] = None
+        self._vectors[slot] = 0
+        self._used[slot] = -np.inf
+        self._size -= 1
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "entries": self._size,
+                "capacity": self.capacity,
+                "threshold": self.threshold,
+                "lookups": self.lookups,
+                "hits": self.hits,
+                "hit_rate": self.hits / self.lookups if self.lookups else 0.0,
+                "stored": self.stored,
+                "evicted": self.evicted,
+                "audited": self.audited,
+                "false_hits": self.false_hits,
+                "false_hit_rate": self.false_hits / self.audited if self.audited else None,
+                "recent_false_hits": list(self._recent_false_hits),
+            }
+
+
+def _normalize(question: str) -> str:
+    return " ".join(question.split()).casefold()
+
+
+_cache: SemanticCache | None = None
+_cache_lock = threading.Lock()
+
+
+def get_semantic_cache() -> SemanticCache | None:
+    """
+    Returns the process-wide semantic cache, or None unless enabled with
+    SEMANTIC_CACHE_ENABLED=true
+    """
+    global _cache
+    if os.getenv("SEMANTIC_CACHE_ENABLED", "false").lower() != "true":
+        return None
+    if _cache is None:
+        with _cache_lock:
+            if _cache is None:
+                _cache = SemanticCache()
+    return _cache
@@ -0,0 +1,70 @@
+"""
+Trains the local question classifier from logged router labels and reports
+how it would perform in front of the LLM router.
+
+Usage:
+    python -m src.routing.train [--data .cache/router_labels.jsonl] [--model .cache/router_classifier.joblib]
+"""
+
+import argparse
+import os
+import time
+import numpy as np
+from sklearn.model_selection import train_test_split
+from .classifier import QuestionClassifier, normalize_label, read_labelled_questions
+
+
+def evaluate(classifier: QuestionClassifier, questions: list[str], labels: list[str], threshold: float) -> dict:
+    """
+    Scores the classifier as RouterAgent uses it
+    Returns:
+        accuracy: Accuracy of the local model on every question
+        local_accuracy: Accuracy on the questions answered locally
+        fallback_rate: Share of questions sent to the LLM
+        end_to_end_accuracy: Accuracy with fallbacks counted as correct (LLM labels are ground truth)
+        predict_us: Mean local prediction time in microseconds
+    """
+    start = time.perf_counter()
+    predictions = [classifier.predict(question) for question in questions]
+    predict_us = (time.perf_counter() - start) * 1e6 / max(len(questions), 1)
+
+    correct = np.array([label == expected for (label, _), expected in zip(predictions, labels)])
+    confident = np.array([confidence >= threshold for _, confidence in predictions])
+    return {
+        "accuracy": float(correct.mean()) if len(correct) else 0.0,
+        "local_accuracy": float(correct[confident].mean()) if confident.any() else 0.0,
+        "fallback_rate": float(1 - confident.mean()) if len(confident) else 1.0,
+        "end_to_end_accuracy": float((correct | ~confident).mean()) if len(correct) else 0.0,
+        "predict_us": predict_us,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Train the local router classifier")
+    parser.add_argument("--data", default=os.getenv("ROUTER_LABEL_LOG", ".cache/router_labels.jsonl"))
+    parser.add_argument("--model", default=os.getenv("ROUTER_MODEL_PATH", ".cache/router_classifier.joblib"))
+    parser.add_argument("--threshold", type=float, default=float(os.getenv("ROUTER_CONFIDENCE_THRESHOLD", 0.9)))
+    parser.add_argument("--test-size", type=float, default=0.2)
+    args = parser.parse_args()
+
+    # Latest label wins when a question was logged more than once
+    pairs = dict(read_labelled_questions(args.data))
+    questions = list(pairs)
+    labels = [normalize_label(pairs[question]) for question in questions]
+    train_q, test_q, train_y, test_y = train_test_split(
+        questions, labels, test_size=args.test_size, random_state=0, stratify=labels
+    )
+
+    classifier = QuestionClassifier.train(train_q, train_y)
+    report = evaluate(classifier, test_q, test_y, args.threshold)
+    print(f"Trained on {len(train_q)} questions, evaluated on {len(test_q)} (threshold {args.threshold})")
+    for name, value in report.items():
+        print(f"  {name:20s} {value:.4f}")
+
+    # The saved model uses every labelled question
+    QuestionClassifier.train(questions, labels).save(args.model)
+    print(f"Saved model to {args.model}")
+
+
+if __name__ == "__main__":
+    main()
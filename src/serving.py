@@ -0,0 +1,160 @@
+"""
+Process lifecycle of the servers: warm-up, readiness and pre-forked workers.
+
+warm() builds every piece of shared state a request needs (compiled
+workflows, the regulation index, the router classifier, the caches and the
+client pool) so the first request does not pay for it. Under gunicorn with
+preload_app (see gunicorn.conf.py) it runs once in the master; the forked
+workers then share those pages copy-on-write instead of each importing and
+loading everything again.
+
+What must not cross a fork is replaced in every worker by after_fork(): the
+HTTP connection pool and its locks, and the SQLite connections of the stores.
+Job worker threads are started there as well, threads do not survive a fork.
+
+State requests depend on across workers (sessions, jobs, cached responses,
+frames and semantic cache answers) lives in those SQLite files, so any worker
+can serve any request. Coalescing of identical in-flight questions and calls
+only happens within a worker.
+
+- SERVER_PREFORK: Set by gunicorn.conf.py, the app then leaves starting job workers to after_fork (default: false)
+"""
+
+import os
+import threading
+import time
+from dotenv import load_dotenv
+
+# Load environment variables from a .env file
+load_dotenv()
+
+
+class Readiness:
+    """Whether this process finished warming up, and how long that took"""
+
+    def __init__(self):
+        self.started = time.time()
+        self.warmup_seconds: float | None = None
+        self._ready = threading.Event()
+
+    def set(self, warmup_seconds: float | None = None) -> None:
+        if warmup_seconds is not None:
+            self.warmup_seconds = warmup_seconds
+        self._ready.set()
+
+    def clear(self) -> None:
+        self._ready.clear()
+
+    @property
+    def ready(self) -> bool:
+        return self._ready.is_set()
+
+    def to_dict(self) -> dict:
+        return {
+            "ready": self.ready,
+            "pid": os.getpid(),
+            "warmup_seconds": self.warmup_seconds,
+            "uptime_seconds": round(time.time() - self.started, 3),
+        }
+
+
+readiness = Readiness()
+
+
+def prefork() -> bool:
+    """True when the app is loaded by a pre-forking server master"""
+    return os.getenv("SERVER_PREFORK", "false").lower() == "true"
+
+
+def warm() -> float:
+    """
+    Loads all shared state of the servers, meant to be called once at startup
+    Returns:
+        Seconds spent warming up
+    """
+    from .flint import get_frame_store
+    from .jobs import get_job_store
+    from .jobs.worker import get_job_workers
+    from .llm import count_tokens, get_client_pool, get_response_cache
+    from .retrieval import get_regulation_index
+    from .routing import get_question_classifier, get_semantic_cache
+    from .workflows.registry import registry
+    from .workflows.sessions import get_session_store
+
+    start = time.perf_counter()
+    # Compile all workflows once, requests reuse the shared graphs
+    registry.warm()
+    get_client_pool()
+    get_response_cache()
+    get_frame_store()
+    get_job_store()
+    get_job_workers()
+    get_semantic_cache()
+    get_session_store()
+    # Loading the index and classifier imports scikit-learn, a first call loads the tokenizer tables
+    index = get_regulation_index()
+    if index is not None:
+        index.search("warm up", k=1)
+    classifier = get_question_classifier()
+    if classifier is not None:
+        classifier.predict("warm up")
+    count_tokens("warm up")
+    seconds = time.perf_counter() - start
+    if not prefork():
+        readiness.set(seconds)
+    else:
+        # Workers report ready once after_fork has run
+        readiness.warmup_seconds = seconds
+    return seconds
+
+
+def start_job_workers() -> None:
+    """Answers queued jobs in this process unless JOB_WORKERS=0 leaves them to worker processes"""
+    from .jobs.worker import get_job_workers
+    workers = get_job_workers()
+    if workers.workers > 0:
+        workers.start()
+
+
+def after_fork() -> None:
+    """Gives a forked worker its own connections and locks, then starts its job workers"""
+    from .flint import get_frame_store
+    from .jobs import get_job_store
+    from .llm import get_client_pool, get_response_cache
+    from .routing import get_semantic_cache
+    from .workflows.sessions import get_session_store
+
+    get_client_pool().reset()
+    stores = (get_frame_store(), get_response_cache(), get_job_store(), get_semantic_cache(), get_session_store())
+    for store in stores:
+        if store is not None:
+            store.reopen()
+    start_job_workers()
+    readiness.started = time.time()
+    readiness.set()
+
+
+def process_stats() -> dict:
+    """
+    Memory of this process from /proc, None on other platforms
+    rss counts every resident page, pss splits pages shared with the master
+    and sibling workers between them, private is what this worker alone holds
+    """
+    stats = {"pid": os.getpid(), "parent_pid": os.getppid(), "rss_kb": None, "pss_kb": None, "private_kb": None}
+    try:
+        with open("/proc/self/status", encoding="utf-8") as f:
+            for line in f:
+                if line.startswith("VmRSS:"):
+                    stats["rss_kb"] = int(line.split()[1])
+        with open("/proc/self/smaps_rollup", encoding="utf-8") as f:
+            private = 0
+            for line in f:
+                name, _, value = line.partition(":")
+                if name == "Pss":
+                    stats["pss_kb"] = int(value.split()[0])
+                elif name in ("Private_Clean", "Private_Dirty"):
+                    private += int(value.split()[0])
+            stats["private_kb"] = private
+    except OSError:
+        pass
+    return stats
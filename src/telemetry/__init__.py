@@ -0,0 +1,16 @@
+from .metrics import Counter, Histogram, MetricsRegistry, metrics
+from .tracing import Trace, current_trace, observe_call, record_cache_hit, traced, traced_node, tracing
+
+__all__ = [
+    "Counter",
+    "Histogram",
+    "MetricsRegistry",
+    "Trace",
+    "current_trace",
+    "metrics",
+    "observe_call",
+    "record_cache_hit",
+    "traced",
+    "traced_node",
+    "tracing",
+]
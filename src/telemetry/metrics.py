@@ -0,0 +1,170 @@
+"""
+In-process metrics rendered in the Prometheus text exposition format.
+
+Only counters and histograms are needed here, so they are implemented directly
+instead of pulling in a client library. Every metric is labelled, values are
+kept per label combination and updated under a lock.
+"""
+
+import math
+import threading
+
+# Latency buckets in seconds, from cached lookups up to long FLINT generations
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120)
+
+
+class Metric:
+    """Base of a labelled metric"""
+
+    type = ""
+
+    def __init__(self, name: str, help: str, labelnames: tuple[str, ...]):
+        self.name = name
+        self.help = help
+        self.labelnames = labelnames
+        self._lock = threading.Lock()
+        self._values = {}
+
+    def _key(self, labels: dict) -> tuple:
+        return tuple(str(labels.get(name, "")) for name in self.labelnames)
+
+    def _labels(self, key: tuple, extra: str = "") -> str:
+        pairs = [f'{name}="{_escape(value)}"' for name, value in zip(self.labelnames, key)]
+        if extra:
+            pairs.append(extra)
+        return "{" + ",".join(pairs) + "}" if pairs else ""
+
+    def render(self) -> list[str]:
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} {self.type}"]
+        with self._lock:
+            items = sorted(self._values.items())
+        for key, value in items:
+            lines.extend(self._render_value(key, value))
+        return lines
+
+    def _render_value(self, key: tuple, value) -> list[str]:
+        raise NotImplementedError
+
+
+class Counter(Metric):
+    """Monotonic count per label combination"""
+
+    type = "counter"
+
+    def inc(self, amount: float = 1, **labels) -> None:
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def value(self, **labels) -> float:
+        with self._lock:
+            return self._values.get(self._key(labels), 0)
+
+    def _render_value(self, key: tuple, value) -> list[str]:
+        return [f"{self.name}{self._labels(key)} {_number(value)}"]
+
+
+class Histogram(Metric):
+    """Distribution of observed values in cumulative buckets"""
+
+    type = "histogram"
+
+    def __init__(self, name: str, help: str, labelnames: tuple[str, ...], buckets: tuple[float, ...] = LATENCY_BUCKETS):
+        super().__init__(name, help, labelnames)
+        self.buckets = tuple(sorted(buckets))
+
+    def observe(self, value: float, **labels) -> None:
+        key = self._key(labels)
+        with self._lock:
+            entry = self._values.get(key)
+            if entry is None:
+                entry = self._values[key] = [[0] * len(self.buckets), 0.0, 0]
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    entry[0][i] += 1
+            entry[1] += value
+            entry[2] += 1
+
+    def _render_value(self, key: tuple, value) -> list[str]:
+        counts, total, count = value
+        lines = [
+            f"{self.name}_bucket{self._labels(key, _le(bound))} {n}"
+            for bound, n in zip(self.buckets, counts)
+        ]
+        lines.append(f"{self.name}_bucket{self._labels(key, _le(math.inf))} {count}")
+        lines.append(f"{self.name}_sum{self._labels(key)} {_number(total)}")
+        lines.append(f"{self.name}_count{self._labels(key)} {count}")
+        return lines
+
+
+class MetricsRegistry:
+    """Named collection of metrics, rendered together for the /metrics endpoint"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._metrics: dict[str, Metric] = {}
+
+    def counter(self, name: str, help: str, labelnames: tuple[str, ...] = ()) -> Counter:
+        return self._register(Counter(name, help, labelnames))
+
+    def histogram(
+        self,
+        name: str,
+        help: str,
+        labelnames: tuple[str, ...] = (),
+        buckets: tuple[float, ...] = LATENCY_BUCKETS,
+    ) -> Histogram:
+        return self._register(Histogram(name, help, labelnames, buckets))
+
+    def _register(self, metric: Metric):
+        with self._lock:
+            existing = self._metrics.get(metric.name)
+            if existing is not None:
+                return existing
+            self._metrics[metric.name] = metric
+            return metric
+
+    def render(self) -> str:
+        """Returns every metric in the Prometheus text format"""
+        with self._lock:
+            metrics = list(self._metrics.values())
+        return "\n".join(line for metric in metrics for line in metric.render()) + "\n"
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _le(bound: float) -> str:
+    return 'le="' + _number(float(bound)) + '"'
+
+
+def _number(value: float) -> str:
+    if isinstance(value, float) and math.isinf(value):
+        return "+Inf"
+    return repr(value) if isinstance(value, float) else str(value)
+
+
+metrics = MetricsRegistry()
+
+node_latency = metrics.histogram(
+    "workflow_node_duration_seconds", "Wall time of workflow nodes", ("workflow", "node")
+)
+node_errors = metrics.counter(
+    "workflow_node_errors_total", "Workflow nodes that set an error", ("workflow", "node")
+)
+llm_latency = metrics.histogram(
+    "llm_call_duration_seconds", "Wall time of LLM calls including queue time", ("agent",)
+)
+llm_queue = metrics.histogram(
+    "llm_queue_duration_seconds", "Time LLM calls waited for the scheduler and a connection slot", ("agent",)
+)
+llm_tokens = metrics.counter(
+    "llm_tokens_total", "Tokens used by LLM calls", ("agent", "kind")
+)
+llm_cache_hits = metrics.counter(
+    "llm_cache_hits_total", "LLM calls answered from the response cache", ("agent",)
+)
+llm_errors = metrics.counter(
+    "llm_errors_total", "LLM calls that failed after retries", ("agent",)
+)
@@ -0,0 +1,192 @@
+"""
+Per-node and per-LLM-call instrumentation.
+
+Every workflow node is wrapped with traced_node and every agent call goes
+through observe_call. Both feed the histograms in metrics.py and, while a
+request trace is active, append a span to it so a single slow request can be
+broken down into classify/extract/identify/format and the calls they made.
+
+The active trace lives in a context variable. LangGraph runs sync nodes in
+context-copying executors, so spans from parallel branches reach the trace of
+the request that started them.
+"""
+
+import functools
+import inspect
+import threading
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Callable, Iterator
+from langchain_core.runnables import RunnableLambda
+from .metrics import llm_cache_hits, llm_errors, llm_latency, llm_queue, llm_tokens, node_errors, node_latency
+
+
+class Trace:
+    """Spans recorded while handling one request"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._start = time.perf_counter()
+        self.spans: list[dict] = []
+
+    def add(self, span: dict) -> None:
+        with self._lock:
+            self.spans.append(span)
+
+    def offset_ms(self) -> float:
+        """Milliseconds since the trace started"""
+        return round((time.perf_counter() - self._start) * 1000, 3)
+
+    def to_dict(self) -> dict:
+        with self._lock:
+            return {"total_ms": self.offset_ms(), "spans": list(self.spans)}
+
+
+_current_trace: ContextVar[Trace | None] = ContextVar("current_trace", default=None)
+
+
+@contextmanager
+def tracing() -> Iterator[Trace]:
+    """Collects the spans of the code run inside the block into a new trace"""
+    trace = Trace()
+    token = _current_trace.set(trace)
+    try:
+        yield trace
+    finally:
+        _current_trace.reset(token)
+
+
+def current_trace() -> Trace | None:
+    return _current_trace.get()
+
+
+def _record_node(workflow: str, node: str, had_error: bool, result, start: float, start_ms: float | None) -> None:
+    elapsed = time.perf_counter() - start
+    node_latency.observe(elapsed, workflow=workflow, node=node)
+    # Nodes report failures through the state rather than raising
+    failed = not had_error and isinstance(result, dict) and bool(result.get("error"))
+    if failed:
+        node_errors.inc(workflow=workflow, node=node)
+    trace = current_trace()
+    if trace is not None:
+        span = {"kind": "node", "name": f"{workflow}.{node}", "start_ms": start_ms, "ms": round(elapsed * 1000, 3)}
+        if failed:
+            span["error"] = result["error"]
+        trace.add(span)
+
+
+def traced(workflow: str, node: str, func: Callable) -> Callable:
+    """
+    Wraps a node function (sync or async) so its wall time and errors are recorded
+    The wrapper keeps the signature, so LangGraph still passes config when the node takes it
+    """
+    if inspect.iscoroutinefunction(func):
+        @functools.wraps(func)
+        async def anode(state, *args, **kwargs):
+            trace = current_trace()
+            start_ms = trace.offset_ms() if trace is not None else None
+            had_error = bool(state.get("error"))
+            start = time.perf_counter()
+            result = await func(state, *args, **kwargs)
+            _record_node(workflow, node, had_error, result, start, start_ms)
+            return result
+        return anode
+
+    @functools.wraps(func)
+    def sync_node(state, *args, **kwargs):
+        trace = current_trace()
+        start_ms = trace.offset_ms() if trace is not None else None
+        # Nodes mutate the state in place, so an error they set must be told apart from an earlier one
+        had_error = bool(state.get("error"))
+        start = time.perf_counter()
+        result = func(state, *args, **kwargs)
+        _record_node(workflow, node, had_error, result, start, start_ms)
+        return result
+    return sync_node
+
+
+def traced_node(workflow: str, node: str, func: Callable, afunc: Callable | None = None):
+    """
+    Instrumented node for StateGraph.add_node
+    Args:
+        workflow: Workflow name used as metric label
+        node: Node name used as metric label
+        func: Sync node function
+        afunc: Async variant used by ainvoke, if any
+    Returns:
+        The wrapped function, or a RunnableLambda when an async variant is given
+    """
+    if afunc is None:
+        return traced(workflow, node, func)
+    return RunnableLambda(traced(workflow, node, func), afunc=traced(workflow, node, afunc))
+
+
+class CallObservation:
+    """Measurements of one LLM call, filled in while it runs"""
+
+    def __init__(self, agent: str):
+        self.agent = agent
+        self.queue_seconds = 0.0
+        self.prompt_tokens = 0
+        self.completion_tokens = 0
+        self.cached_tokens = 0
+
+    def waited(self, seconds: float) -> None:
+        """Slot wait reported by the client pool, summed over retries"""
+        self.queue_seconds += seconds
+
+    def tokens(self, prompt: int, completion: int, cached: int = 0) -> None:
+        self.prompt_tokens = prompt
+        self.completion_tokens = completion
+        self.cached_tokens = cached
+
+
+@contextmanager
+def observe_call(agent: str) -> Iterator[CallObservation]:
+    """
+    Records wall time, queue time, tokens and failure of the LLM call made inside the block
+    An abandoned stream (GeneratorExit) is not counted as a failure
+    """
+    observation = CallObservation(agent)
+    trace = current_trace()
+    start_ms = trace.offset_ms() if trace is not None else None
+    start = time.perf_counter()
+    error = None
+    try:
+        yield observation
+    except GeneratorExit:
+        raise
+    except Exception as e:
+        error = e
+        llm_errors.inc(agent=agent)
+        raise
+    finally:
+        elapsed = time.perf_counter() - start
+        llm_latency.observe(elapsed, agent=agent)
+        llm_queue.observe(observation.queue_seconds, agent=agent)
+        llm_tokens.inc(observation.prompt_tokens, agent=agent, kind="prompt")
+        llm_tokens.inc(observation.completion_tokens, agent=agent, kind="completion")
+        llm_tokens.inc(observation.cached_tokens, agent=agent, kind="cached_prompt")
+        if trace is not None:
+            span = {
+                "kind": "llm",
+                "name": agent,
+                "start_ms": start_ms,
+                "ms": round(elapsed * 1000, 3),
+                "queue_ms": round(observation.queue_seconds * 1000, 3),
+                "prompt_tokens": observation.prompt_tokens,
+                "completion_tokens": observation.completion_tokens,
+                "cached_prompt_tokens": observation.cached_tokens,
+            }
+            if error is not None:
+                span["error"] = str(error)
+            trace.add(span)
+
+
+def record_cache_hit(agent: str) -> None:
+    """Records an LLM call answered from the response cache"""
+    llm_cache_hits.inc(agent=agent)
+    trace = current_trace()
+    if trace is not None:
+        trace.add({"kind": "llm", "name": agent, "start_ms": trace.offset_ms(), "ms": 0.0, "cached": True})
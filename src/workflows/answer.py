@@ -0,0 +1,132 @@
+"""
+Answers single questions through the shared router workflow.
+
+Concurrent requests for the same question (compared after normalization) share
+one workflow run: the first request runs it and the others wait for its
+result, so a burst of identical questions costs one set of LLM calls.
+
+With SEMANTIC_CACHE_ENABLED=true a question close enough to an earlier one
+is answered from the semantic cache without running the workflow, and a
+sample of those hits is re-run in the background to audit the cache.
+
+Questions asked within a session are follow-ups: they run with the session's
+regulation context and are neither coalesced nor answered from the semantic
+cache, since their meaning depends on the conversation.
+"""
+
+import os
+import random
+from concurrent.futures import ThreadPoolExecutor
+from ..llm import caller_scope, get_single_flight
+from ..routing import SemanticCache, SemanticHit, get_semantic_cache
+from .batch import normalize_question
+from .registry import get_router_graph
+from .router_workflow import create_router_state
+from .sessions import get_session_store
+
+question_flight = get_single_flight("question")
+
+# Audit runs are rare, a small pool keeps them from competing with requests
+_audits = ThreadPoolExecutor(max_workers=2, thread_name_prefix="semantic-audit")
+
+
+def coalescing_enabled() -> bool:
+    """QUESTION_SINGLE_FLIGHT: Share workflow runs between concurrent identical questions (default: true)"""
+    return os.getenv("QUESTION_SINGLE_FLIGHT", "true").lower() == "true"
+
+
+def answer(message: str, session_id: str | None = None) -> dict:
+    """
+    Runs the router workflow for a question
+    Args:
+        message: User question
+        session_id: Conversation the question belongs to, None for a standalone question
+    Returns:
+        Final router state, shared with concurrent callers asking the same question
+    """
+    if session_id is not None:
+        sessions = get_session_store()
+        with caller_scope():
+            result = get_router_graph().invoke(create_router_state(message, session=sessions.get(session_id)))
+        sessions.update(session_id, message, result)
+        return result
+
+    def run() -> dict:
+        # The request's LLM calls are queued fairly against other requests
+        with caller_scope():
+            return get_router_graph().invoke(create_router_state(message))
+
+    cache = get_semantic_cache()
+    if cache is not None:
+        hit = cache.lookup(message)
+        if hit is not None:
+            return _cached(cache, message, hit)
+    if not coalescing_enabled():
+        result = run()
+    else:
+        result, _ = question_flight.do(normalize_question(message).casefold(), run)
+    if cache is not None:
+        _store(cache, message, result)
+    return result
+
+
+async def aanswer(message: str, session_id: str | None = None) -> dict:
+    """Async variant of answer"""
+    if session_id is not None:
+        sessions = get_session_store()
+        with caller_scope():
+            result = await get_router_graph().ainvoke(create_router_state(message, session=sessions.get(session_id)))
+        sessions.update(session_id, message, result)
+        return result
+
+    async def run() -> dict:
+        with caller_scope():
+            return await get_router_graph().ainvoke(create_router_state(message))
+
+    cache = get_semantic_cache()
+    if cache is not None:
+        hit = cache.lookup(message)
+        if hit is not None:
+            return _cached(cache, message, hit)
+    if not coalescing_enabled():
+        result = await run()
+    else:
+        result, _ = await question_flight.ado(normalize_question(message).casefold(), run)
+    if cache is not None:
+        _store(cache, message, result)
+    return result
+
+
+def _cached(cache: SemanticCache, message: str, hit: SemanticHit) -> dict:
+    """Final router state built from a semantic cache hit, audited now and then"""
+    if random.random() < cache.audit_rate:
+        _audits.submit(_audit, cache, message, hit)
+    state = create_router_state(message)
+    state["question_type"] = hit.question_type
+    state["response"] = hit.response
+    return state
+
+
+def _succeeded(result: dict) -> bool:
+    """
+    Whether a router run produced a real answer, failures of the sub-workflows
+    come back as a response holding the error message
+    """
+    response = result.get("response")
+    if result.get("error") or result.get("workflow_error") or not response:
+        return False
+    return response.get("classification") != "REGULATION_QUESTION" or bool(response.get("regulation"))
+
+
+def _store(cache: SemanticCache, message: str, result: dict) -> None:
+    """Caches a successful answer, regulation answers only when a regulation was found"""
+    if _succeeded(result):
+        cache.store(message, result["question_type"], result["response"])
+
+
+def _audit(cache: SemanticCache, message: str, hit: SemanticHit) -> None:
+    """Answers a cache hit with the workflow anyway and compares the outcomes"""
+    with caller_scope():
+        result = get_router_graph().invoke(create_router_state(message))
+    if _succeeded(result):
+        cache.audit(hit, message, result["question_type"], result["response"])
@@ -0,0 +1,90 @@
+"""
+Batch question processing.
+
+Questions are normalized and deduplicated, classified together with a single
+batched router call, then answered by the shared regulation and general
+workflows in parallel up to a concurrency limit. Wall time for a batch is
+therefore close to its slowest question rather than the sum of all of them.
+"""
+
+import os
+import re
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from ..agents import RouterAgent
+from ..llm import caller_scope
+from .registry import get_regulation_graph, get_general_graph
+from .router_workflow import regulation_input, general_input
+
+WHITESPACE = re.compile(r"\s+")
+
+_router: RouterAgent | None = None
+_router_lock = threading.Lock()
+
+
+def normalize_question(question: str) -> str:
+    """Collapses whitespace so trivially different copies of a question match"""
+    return WHITESPACE.sub(" ", question).strip()
+
+
+def get_router_agent() -> RouterAgent:
+    """Shared router agent used for batched classification"""
+    global _router
+    if _router is None:
+        with _router_lock:
+            if _router is None:
+                _router = RouterAgent()
+    return _router
+
+
+def answer_question(question: str, classification: dict) -> dict:
+    """
+    Runs the sub-workflow matching a classification
+    Returns:
+        {"response": ...} like /answer, or {"error": ...}
+    """
+    question_type = classification["type"]
+    try:
+        with caller_scope():
+            if question_type == "REGULATION_QUESTION":
+                result = get_regulation_graph().invoke(regulation_input(question))
+            else:
+                result = get_general_graph().invoke(general_input(question))
+        return {"response": {"classification": question_type, **result["final_response"]}}
+    except Exception as e:
+        return {"error": f"Request processing failed: {str(e)}"}
+
+
+def answer_batch(questions: list[str], concurrency: int | None = None) -> list[dict]:
+    """
+    Answers a batch of questions
+    Args:
+        questions: User questions, duplicates are answered once
+        concurrency: Maximum questions processed at the same time, capped by
+            BATCH_CONCURRENCY (default: 8)
+    Returns:
+        One {"question", "response"} or {"question", "error"} item per input question, in input order
+    """
+    limit = int(os.getenv("BATCH_CONCURRENCY", 8))
+    concurrency = max(1, min(concurrency or limit, limit))
+    normalized = [normalize_question(question) for question in questions]
+    # Case-insensitive dedupe, the first spelling of a question is the one answered
+    unique: dict[str, str] = {}
+    for question in normalized:
+        unique.setdefault(question.casefold(), question)
+    distinct = list(unique.values())
+
+    answers: dict[str, dict] = {}
+    if distinct:
+        try:
+            classifications = get_router_agent().classify_questions(distinct)
+        except Exception as e:
+            error = {"error": f"Question classification failed: {str(e)}"}
+            answers = {question.casefold(): error for question in distinct}
+        else:
+            with ThreadPoolExecutor(max_workers=min(concurrency, len(distinct))) as executor:
+                results = executor.map(answer_question, distinct, classifications)
+                answers = {question.casefold(): result for question, result in zip(distinct, results)}
+
+    return [{"question": question, **answers[normalized_question.casefold()]}
+            for question, normalized_question in zip(questions, normalized)]
@@ -4,8 +4,10 @@ through a simplified analysis pipeline.
 """
 
 from typing import TypedDict
+from langchain_core.runnables import RunnableConfig
 from langgraph.graph import StateGraph, Graph
 from ..agents import GeneralAgent
+from .nodes import node
 
 class GeneralState(TypedDict):
     """
@@ -14,11 +16,13 @@ class GeneralState(TypedDict):
     - analysis: Processed answer to question
     - final_response: Formatted response or error
     - error: Any processing errors
+    - deadline: Epoch seconds by which the request must finish
     """
     original_question: str
     analysis: str | None
     final_response: str | None
     error: str | None
+    deadline: float | None
 
 def create_general_graph() -> Graph:
     """
@@ -30,10 +34,39 @@ def create_general_graph() -> Graph:
     # Initialize agent
     general_agent = GeneralAgent()
     
-    def analyze_question(state: GeneralState) -> GeneralState:
-        """Processes general questions to generate appropriate response"""
+    def analyze_question(state: GeneralState, config: RunnableConfig) -> GeneralState:
+        """
+        Processes general questions to generate appropriate response
+        When an on_token callback is configured the answer is streamed to it
+        """
         try:
-            analysis = general_agent.answer(state["original_question"])
+            on_token = config.get("configurable", {}).get("on_token")
+            if on_token is None:
+                analysis = general_agent.answer(state["original_question"])
+            else:
+                parts = []
+                for token in general_agent.answer_stream(state["original_question"]):
+                    on_token(token)
+                    parts.append(token)
+                analysis = "".join(parts)
+            state["analysis"] = analysis
+            return state
+        except Exception as e:
+            state["error"] = f"General analysis failed: {str(e)}"
+            return state
+
+    async def aanalyze_question(state: GeneralState, config: RunnableConfig) -> GeneralState:
+        """Async variant of analyze_question"""
+        try:
+            on_token = config.get("configurable", {}).get("on_token")
+            if on_token is None:
+                analysis = await general_agent.aanswer(state["original_question"])
+            else:
+                parts = []
+                async for token in general_agent.aanswer_stream(state["original_question"]):
+                    on_token(token)
+                    parts.append(token)
+                analysis = "".join(parts)
             state["analysis"] = analysis
             return state
         except Exception as e:
@@ -55,9 +88,9 @@ def create_general_graph() -> Graph:
     # Create state graph
     workflow = StateGraph(GeneralState)
     
-    # Add nodes
-    workflow.add_node("analyze", analyze_question)
-    workflow.add_node("prepare", prepare_response)
+    # Add nodes, the LLM bound step gets an async variant used by ainvoke
+    workflow.add_node("analyze", node("general", "analyze", analyze_question, aanalyze_question))
+    workflow.add_node("prepare", node("general", "prepare", prepare_response))
 
     # Add edges
     workflow.add_edge("analyze", "prepare")
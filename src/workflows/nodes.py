@@ -0,0 +1,19 @@
+"""
+Node wrapper shared by the workflows.
+"""
+
+from typing import Callable
+from ..llm import with_deadline
+from ..telemetry import traced_node
+
+
+def node(workflow: str, name: str, func: Callable, afunc: Callable | None = None):
+    """
+    Workflow node that is traced and applies the request deadline in its state to its LLM calls
+    Args:
+        workflow: Workflow name used as metric label
+        name: Node name used as metric label
+        func: Sync node function
+        afunc: Async variant used by ainvoke, if any
+    """
+    return traced_node(workflow, name, with_deadline(func), with_deadline(afunc) if afunc else None)
@@ -0,0 +1,85 @@
+"""
+Process-wide registry of compiled workflows.
+
+Building a workflow compiles a StateGraph and constructs its agents, which is
+far more expensive than running it. The registry compiles the router,
+regulation and general graphs once and hands out the same instances to every
+request. Compiled graphs keep no per-run state (each invoke gets its own state
+dict) and the agents only hold configuration and a thread-safe OpenAI client,
+so the shared graphs can be invoked from concurrent requests.
+"""
+
+import threading
+from typing import Callable, Dict
+from langgraph.graph import Graph
+from .regulation_workflow import create_regulation_graph
+from .general_workflow import create_general_graph
+from .router_workflow import create_router_graph
+
+
+class WorkflowRegistry:
+    """
+    Lazily compiles each named workflow once and caches the compiled graph
+    - regulation: Regulation processing workflow
+    - general: General question workflow
+    - router: Router workflow embedding the two graphs above as sub-graphs
+    """
+
+    def __init__(self):
+        self._lock = threading.RLock()
+        self._graphs: Dict[str, Graph] = {}
+        self._builders: Dict[str, Callable[[], Graph]] = {
+            "regulation": create_regulation_graph,
+            "general": create_general_graph,
+            "router": lambda: create_router_graph(
+                regulation_graph=self.get("regulation"),
+                general_graph=self.get("general"),
+            ),
+        }
+
+    def get(self, name: str) -> Graph:
+        """
+        Returns the compiled workflow, compiling it on first use
+        Args:
+            name: Workflow name ("router", "regulation" or "general")
+        Returns:
+            Shared compiled graph
+        """
+        graph = self._graphs.get(name)
+        if graph is not None:
+            return graph
+        with self._lock:
+            # Another thread may have compiled it while we waited for the lock
+            if name not in self._graphs:
+                if name not in self._builders:
+                    raise KeyError(f"Unknown workflow: {name}")
+                self._graphs[name] = self._builders[name]()
+            return self._graphs[name]
+
+    def warm(self) -> None:
+        """Compiles every registered workflow, meant to be called at startup"""
+        for name in self._builders:
+            self.get(name)
+
+    def reset(self) -> None:
+        """Drops all compiled workflows so they are rebuilt on next use"""
+        with self._lock:
+            self._graphs.clear()
+
+
+registry = WorkflowRegistry()
+
+
+def get_router_graph() -> Graph:
+    """Returns the shared compiled router workflow"""
+    return registry.get("router")
+
+
+def get_regulation_graph() -> Graph:
+    """Returns the shared compiled regulation workflow"""
+    return registry.get("regulation")
+
+
+def get_general_graph() -> Graph:
+    """Returns the shared compiled general workflow"""
+    return registry.get("general")
@@ -1,6 +1,11 @@
+import os
+import threading
 from typing import TypedDict
+from langchain_core.runnables import RunnableConfig
 from langgraph.graph import StateGraph, Graph
 from ..agents import RegulationAgent, FlintFormatterAgent, ActorIdentificationAgent
+from ..flint import FlintFrames, content_hash, get_frame_store
+from .nodes import node
 
 """
 Regulation processing workflow that handles:
@@ -8,56 +13,151 @@ Regulation processing workflow that handles:
 2. Actor identification
 3. FLINT formatting
 4. Response preparation
+
+In speculative mode actor identification and FLINT formatting run in
+parallel after extraction; a join step keeps the FLINT frames only when the
+actor check would have routed to formatting.
 """
 
+
+class SpeculationStats:
+    """
+    Counters for speculative FLINT generation
+    - runs: Speculative FLINT generations joined
+    - accepted: Generations used in a response
+    - discarded: Generations thrown away because no actors were found
+    - wasted_prompt_tokens / wasted_completion_tokens: Tokens spent on discarded generations
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.runs = 0
+        self.accepted = 0
+        self.discarded = 0
+        self.wasted_prompt_tokens = 0
+        self.wasted_completion_tokens = 0
+
+    def record(self, accepted: bool, prompt_tokens: int = 0, completion_tokens: int = 0) -> None:
+        with self._lock:
+            self.runs += 1
+            if accepted:
+                self.accepted += 1
+            else:
+                self.discarded += 1
+                self.wasted_prompt_tokens += prompt_tokens
+                self.wasted_completion_tokens += completion_tokens
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "runs": self.runs,
+                "accepted": self.accepted,
+                "discarded": self.discarded,
+                "wasted_prompt_tokens": self.wasted_prompt_tokens,
+                "wasted_completion_tokens": self.wasted_completion_tokens,
+            }
+
+
+speculation_stats = SpeculationStats()
+
 class RegulationState(TypedDict):
     """
     State management for regulation processing:
     - original_question: Input question from user
     - regulation_text: Extracted regulation content
+    - regulation_sources: Source IDs of the retrieved regulation chunks
     - actor_analysis: Result of actor identification ("Yes"/"No")
-    - flint_format: Formatted regulation in FLINT
+    - flint_format: Formatted regulation in FLINT, formatting is skipped when already known
+    - speculative_flint: FLINT generated ahead of the actor check (speculative mode only)
     - final_response: Processed response or error message
     - error: Any processing errors
+    - deadline: Epoch seconds by which the request must finish
     """
     original_question: str
     regulation_text: str | None
+    regulation_sources: list[str] | None
     actor_analysis: str | None
     flint_format: str | None
+    speculative_flint: dict | None
     final_response: str | None
     error: str | None
+    deadline: float | None
 
 
-def create_regulation_graph() -> Graph:
+def create_regulation_graph(speculative: bool | None = None) -> Graph:
     """
     Creates a workflow for processing regulation questions:
     1. Extracts relevant regulation text
     2. Identifies actors in the regulation
     3. If actors found, formats to FLINT
     4. Prepares final response with all components
+    Args:
+        speculative: Run steps 2 and 3 in parallel and discard the FLINT
+            frames when no actors are found (default: REGULATION_SPECULATIVE env, false)
     """
+    if speculative is None:
+        speculative = os.getenv("REGULATION_SPECULATIVE", "false").lower() == "true"
     
     # Initialize specialized agents for each processing step
     regulation_agent = RegulationAgent()
     actor_agent = ActorIdentificationAgent()
     flint_agent = FlintFormatterAgent()
+    frame_store = get_frame_store()
+
+    def stored_frames(state: RegulationState) -> str | None:
+        """
+        Looks up precomputed FLINT frames, first for the exact regulation text,
+        then for the full current text of the best matching source
+        """
+        if frame_store is None:
+            return None
+        stored = frame_store.get(content_hash(state["regulation_text"]), flint_agent.variant)
+        if stored is None and state.get("regulation_sources"):
+            source_text = regulation_agent.source_text(state["regulation_sources"][0])
+            if source_text is not None:
+                stored = frame_store.get(content_hash(source_text), flint_agent.variant)
+        return stored.frames if stored is not None else None
 
     def extract_regulation(state: RegulationState) -> RegulationState:
-        """Extracts relevant regulation text from the question"""
+        """
+        Retrieves the regulation chunks relevant to the question from the index
+        Skipped when the caller already retrieved them (fused pipeline)
+        """
         try:
-            regulation = regulation_agent.analyze_regulation(state["original_question"])
-            state["regulation_text"] = regulation
+            if state.get("regulation_text") is None:
+                hits = regulation_agent.retrieve(state["original_question"])
+                state["regulation_text"] = regulation_agent.analyze_regulation(state["original_question"], hits)
+                state["regulation_sources"] = list(dict.fromkeys(hit.chunk.source for hit in hits))
+            return found_regulation(state)
+        except Exception as e:
+            state["error"] = f"Regulation extraction failed: {str(e)}"
             return state
+
+    async def aextract_regulation(state: RegulationState) -> RegulationState:
+        """Async variant of extract_regulation"""
+        try:
+            if state.get("regulation_text") is None:
+                hits = await regulation_agent.aretrieve(state["original_question"])
+                state["regulation_text"] = regulation_agent.analyze_regulation(state["original_question"], hits)
+                state["regulation_sources"] = list(dict.fromkeys(hit.chunk.source for hit in hits))
+            return found_regulation(state)
         except Exception as e:
             state["error"] = f"Regulation extraction failed: {str(e)}"
             return state
 
+    def found_regulation(state: RegulationState) -> RegulationState:
+        """Sets the error state when the index had no regulation matching the question"""
+        if not state["regulation_text"].strip():
+            state["error"] = "No matching regulation found for the question."
+        return state
+
     def identify_actors(state: RegulationState) -> RegulationState:
         """
         Analyzes regulation text to identify relevant actors
         Returns "Yes" if actors found, otherwise indicates no actors
+        Skipped when the verdict is already known (fused pipeline)
         """
-        if state.get("error"):
+        if state.get("error") or state.get("actor_analysis") is not None:
             return state
         try:
             actors = actor_agent.identify(state["regulation_text"])
@@ -67,17 +167,71 @@ def create_regulation_graph() -> Graph:
             state["error"] = f"Actor identification failed: {str(e)}"
             return state
 
+    async def aidentify_actors(state: RegulationState) -> RegulationState:
+        """Async variant of identify_actors"""
+        if state.get("error") or state.get("actor_analysis") is not None:
+            return state
+        try:
+            actors = await actor_agent.aidentify(state["regulation_text"])
+            state["actor_analysis"] = actors
+            return state
+        except Exception as e:
+            state["error"] = f"Actor identification failed: {str(e)}"
+            return state
+
     def handle_no_actors(state: RegulationState) -> RegulationState:
-        """Sets error state when no actors are identified in regulation"""
-        state["error"] = "Could not find actors for the regulations. Cannot proceed with the request."
+        """Sets error state when no actors are identified in regulation, an earlier error is kept"""
+        if not state.get("error"):
+            state["error"] = "Could not find actors for the regulations. Cannot proceed with the request."
         return state
 
-    def format_flint(state: RegulationState) -> RegulationState:
-        """Converts regulation text to FLINT format if actors were identified"""
+    def format_flint(state: RegulationState, config: RunnableConfig) -> RegulationState:
+        """
+        Converts regulation text to FLINT format if actors were identified
+        Precomputed frames from the frame store are used when available
+        When an on_token callback is configured the frames are streamed to it
+        Skipped when the caller already passes the frames
+        """
         if state.get("error"):
             return state
         try:
-            flint = flint_agent.format(state["regulation_text"])
+            on_token = config.get("configurable", {}).get("on_token")
+            flint = state.get("flint_format") or stored_frames(state)
+            if flint is not None:
+                if on_token is not None:
+                    on_token(flint)
+            elif on_token is None:
+                flint = flint_agent.format(state["regulation_text"], state.get("regulation_sources"))
+            else:
+                parts = []
+                for token in flint_agent.format_stream(state["regulation_text"], state.get("regulation_sources")):
+                    on_token(token)
+                    parts.append(token)
+                flint = "".join(parts)
+            state["flint_format"] = flint
+            return state
+        except Exception as e:
+            state["error"] = f"Flint formatting failed: {str(e)}"
+            return state
+
+    async def aformat_flint(state: RegulationState, config: RunnableConfig) -> RegulationState:
+        """Async variant of format_flint"""
+        if state.get("error"):
+            return state
+        try:
+            on_token = config.get("configurable", {}).get("on_token")
+            flint = state.get("flint_format") or stored_frames(state)
+            if flint is not None:
+                if on_token is not None:
+                    on_token(flint)
+            elif on_token is None:
+                flint = await flint_agent.aformat(state["regulation_text"], state.get("regulation_sources"))
+            else:
+                parts = []
+                async for token in flint_agent.aformat_stream(state["regulation_text"], state.get("regulation_sources")):
+                    on_token(token)
+                    parts.append(token)
+                flint = "".join(parts)
             state["flint_format"] = flint
             return state
         except Exception as e:
@@ -92,15 +246,23 @@ def create_regulation_graph() -> Graph:
         - FLINT formatted version (if applicable)
         - Any error messages
         """
-        print("Preparing response", state["error"])
         if state.get("error"):
             state["final_response"] = {"response": state["error"]}
             return state
 
+        flint = state["flint_format"]
+        if flint_agent.structured and flint:
+            # JSON mode returns the frames as an object, clients can ask for tables instead
+            try:
+                flint = FlintFrames.parse(flint).to_dict()
+            except ValueError as e:
+                state["error"] = f"Flint formatting failed: {str(e)}"
+                state["final_response"] = {"response": state["error"]}
+                return state
         state["final_response"] = {
             "regulation": state["regulation_text"],
             "actor_analysis": state["actor_analysis"],
-            "response": state["flint_format"],
+            "response": flint,
         }
         return state
 
@@ -114,15 +276,105 @@ def create_regulation_graph() -> Graph:
             return "no_actors"
         return "format"
 
+    def identify_branch(state: RegulationState) -> dict:
+        """Speculative mode: actor identification branch, only writes its own keys"""
+        state = identify_actors(state)
+        return {"actor_analysis": state["actor_analysis"], "error": state["error"]}
+
+    async def aidentify_branch(state: RegulationState) -> dict:
+        """Async variant of identify_branch"""
+        state = await aidentify_actors(state)
+        return {"actor_analysis": state["actor_analysis"], "error": state["error"]}
+
+    def speculate_flint(state: RegulationState) -> dict:
+        """
+        Speculative mode: generates FLINT frames before the actor check is known
+        Frames are not streamed here since they may still be discarded
+        """
+        if state.get("error"):
+            return {}
+        try:
+            frames = state.get("flint_format") or stored_frames(state)
+            if frames is not None:
+                return {"speculative_flint": {"text": frames}}
+            completion = flint_agent.format_completion(state["regulation_text"], state.get("regulation_sources"))
+            return {"speculative_flint": completion._asdict()}
+        except Exception as e:
+            return {"speculative_flint": {"error": f"Flint formatting failed: {str(e)}"}}
+
+    async def aspeculate_flint(state: RegulationState) -> dict:
+        """Async variant of speculate_flint"""
+        if state.get("error"):
+            return {}
+        try:
+            frames = state.get("flint_format") or stored_frames(state)
+            if frames is not None:
+                return {"speculative_flint": {"text": frames}}
+            completion = await flint_agent.aformat_completion(state["regulation_text"], state.get("regulation_sources"))
+            return {"speculative_flint": completion._asdict()}
+        except Exception as e:
+            return {"speculative_flint": {"error": f"Flint formatting failed: {str(e)}"}}
+
+    def join_speculation(state: RegulationState, config: RunnableConfig) -> RegulationState:
+        """
+        Speculative mode: keeps the FLINT frames if the actor check routes to
+        formatting, otherwise discards them and records the wasted tokens
+        """
+        speculative = state.get("speculative_flint")
+        state["speculative_flint"] = None
+        if speculative is None:
+            return state
+        if determine_flint_eligibility(state) != "format":
+            speculation_stats.record(
+                False, speculative.get("prompt_tokens", 0), speculative.get("completion_tokens", 0)
+            )
+            return state
+
+        speculation_stats.record(True)
+        if "error" in speculative:
+            state["error"] = speculative["error"]
+            return state
+        state["flint_format"] = speculative["text"]
+        on_token = config.get("configurable", {}).get("on_token")
+        if on_token is not None:
+            on_token(speculative["text"])
+        return state
+
+    def route_speculation(state: RegulationState) -> str:
+        """Speculative mode: FLINT is already done, only no-actor results need handling"""
+        if determine_flint_eligibility(state) == "no_actors":
+            return "no_actors"
+        return "prepare"
+
     # Build workflow graph with conditional routing based on actor identification
     workflow = StateGraph(RegulationState)
 
-    # Add nodes
-    workflow.add_node("extract", extract_regulation)
-    workflow.add_node("identify", identify_actors)
-    workflow.add_node("format", format_flint)
-    workflow.add_node("prepare", prepare_response)
-    workflow.add_node("no_actors", handle_no_actors)
+    if speculative:
+        workflow.add_node("extract", node("regulation", "extract", extract_regulation, aextract_regulation))
+        workflow.add_node("identify", node("regulation", "identify", identify_branch, aidentify_branch))
+        workflow.add_node("speculate", node("regulation", "speculate", speculate_flint, aspeculate_flint))
+        workflow.add_node("join", node("regulation", "join", join_speculation))
+        workflow.add_node("prepare", node("regulation", "prepare", prepare_response))
+        workflow.add_node("no_actors", node("regulation", "no_actors", handle_no_actors))
+
+        # Fan out after extraction, join once both branches finished
+        workflow.add_edge("extract", "identify")
+        workflow.add_edge("extract", "speculate")
+        workflow.add_edge(["identify", "speculate"], "join")
+        workflow.add_conditional_edges("join", route_speculation, ["prepare", "no_actors"])
+        workflow.add_edge("no_actors", "prepare")
+
+        workflow.set_entry_point("extract")
+        workflow.set_finish_point("prepare")
+
+        return workflow.compile()
+
+    # Add nodes, LLM bound steps get an async variant used by ainvoke
+    workflow.add_node("extract", node("regulation", "extract", extract_regulation, aextract_regulation))
+    workflow.add_node("identify", node("regulation", "identify", identify_actors, aidentify_actors))
+    workflow.add_node("format", node("regulation", "format", format_flint, aformat_flint))
+    workflow.add_node("prepare", node("regulation", "prepare", prepare_response))
+    workflow.add_node("no_actors", node("regulation", "no_actors", handle_no_actors))
 
     # Add edges with routing function
     workflow.add_edge("extract", "identify")
@@ -1,13 +1,29 @@
 """
 Main router workflow that handles incoming questions and directs them to appropriate processors.
 Determines if a question is regulation-related or general and routes accordingly.
+
+In the fused pipeline (PIPELINE_MODE=fused) the regulation is retrieved before
+classification, and one structured call returns both the question category and
+the actor verdict for that regulation. The regulation workflow then starts at
+FLINT formatting, one LLM round trip less on the critical path.
+
+Follow-up questions in a session replace classification with one call that
+checks whether the follow-up is about the session's regulation and, if it is,
+answers it from the session's regulation and FLINT frames. Retrieval, actor
+identification and FLINT formatting are skipped for those follow-ups.
 """
 
+import os
 from typing import TypedDict
-from langgraph.graph import StateGraph, Graph
-from ..agents import RouterAgent
+from langchain_core.runnables import RunnableConfig
+from langgraph.graph import StateGraph, Graph, END
+from ..agents import FollowUpAgent, RegulationAgent, RouterAgent, TriageAgent
+from ..agents.follow_up_agent import FollowUp
+from ..llm import request_deadline
+from .nodes import node
 from .regulation_workflow import create_regulation_graph
 from .general_workflow import create_general_graph
+from .sessions import SESSION_KEYS
 
 class RouterState(TypedDict):
     """
@@ -16,26 +32,102 @@ class RouterState(TypedDict):
     - question_type: Classification result determining question category
     - response: Final processed response from appropriate workflow
     - error: Any error messages during processing
+    - workflow_error: Error the regulation or general workflow reported in its response
+    - deadline: Epoch seconds by which the request must finish, passed on to the sub-graphs
+    - retrieved: Regulation text, sources, actor verdict and FLINT frames, passed
+      on to the regulation workflow when already known (fused classification)
+      and set to what it produced afterwards, or to the session's for follow-ups
+      answered from the session
+    - session: Regulation context of the conversation for follow-up questions
     """
     message: str
     question_type: dict | None
     response: dict | None
     error: str | None
+    workflow_error: str | None
+    deadline: float | None
+    retrieved: dict | None
+    session: dict | None
+
+def create_router_state(message: str, deadline: float | None = None, session: dict | None = None) -> RouterState:
+    """
+    Initial router state for a user question, the deadline defaults to REQUEST_DEADLINE from now
+    Args:
+        session: Regulation context of the conversation when the question is a follow-up
+    """
+    return {
+        "message": message,
+        "question_type": None,
+        "response": None,
+        "error": None,
+        "workflow_error": None,
+        "deadline": deadline or request_deadline(),
+        "retrieved": None,
+        "session": session
+    }
 
-def create_router_graph() -> Graph:
+def regulation_input(message: str, deadline: float | None = None, **known) -> dict:
+    """
+    Initial regulation sub-graph state for a user question
+    Args:
+        known: Values already determined (regulation_text, regulation_sources,
+            actor_analysis, flint_format), the workflow skips the steps producing them
+    """
+    return {
+        "original_question": message,
+        "regulation_text": None,
+        "regulation_sources": None,
+        "actor_analysis": None,
+        "flint_format": None,
+        "speculative_flint": None,
+        "final_response": None,
+        "error": None,
+        "deadline": deadline or request_deadline(),
+        **known
+    }
+
+def general_input(message: str, deadline: float | None = None) -> dict:
+    """Initial general sub-graph state for a user question"""
+    return {
+        "original_question": message,
+        "analysis": None,
+        "final_response": None,
+        "error": None,
+        "deadline": deadline or request_deadline()
+    }
+
+def create_router_graph(
+    regulation_graph: Graph | None = None,
+    general_graph: Graph | None = None,
+    fused: bool | None = None,
+) -> Graph:
     """
     Creates a workflow graph that:
     1. Classifies incoming questions
     2. Routes to appropriate processor (regulation or general)
     3. Returns processed response
+
+    The regulation and general workflows are embedded as sub-graph nodes.
+    Pass already compiled sub-graphs to share them between router graphs,
+    otherwise they are compiled once here together with the router.
+    Args:
+        fused: Classify and identify actors in one call (default: PIPELINE_MODE env is "fused")
     """
-    
-    # Initialize router agent
-    router = RouterAgent()
+    if fused is None:
+        fused = os.getenv("PIPELINE_MODE", "serial").lower() == "fused"
+
+    # Initialize router agent and the compiled sub-graphs
+    router = TriageAgent() if fused else RouterAgent()
+    regulation_agent = RegulationAgent() if fused else None
+    follow_up_agent = FollowUpAgent()
+    regulation_graph = regulation_graph or create_regulation_graph()
+    general_graph = general_graph or create_general_graph()
     
     def classify_question(state: RouterState) -> RouterState:
         """Determines if the question is regulation-related or general"""
         try:
+            if state.get("session"):
+                return followed_up(state, follow_up_agent.respond(state["message"], state["session"]))
             classification = router.classify_question(state["message"])
             state["question_type"] = classification
             return state
@@ -43,43 +135,148 @@ def create_router_graph() -> Graph:
             state["error"] = f"Question classification failed: {str(e)}"
             return state
 
-    def process_request(state: RouterState) -> RouterState:
+    async def aclassify_question(state: RouterState) -> RouterState:
+        """Async variant of classify_question"""
+        try:
+            if state.get("session"):
+                return followed_up(state, await follow_up_agent.arespond(state["message"], state["session"]))
+            classification = await router.aclassify_question(state["message"])
+            state["question_type"] = classification
+            return state
+        except Exception as e:
+            state["error"] = f"Question classification failed: {str(e)}"
+            return state
+
+    def triage_question(state: RouterState) -> RouterState:
+        """
+        Fused pipeline: retrieves the regulation, then classifies the question
+        and checks the regulation for actors in one call
+        Confident local classifications of general questions skip both
+        """
+        try:
+            if state.get("session"):
+                return followed_up(state, follow_up_agent.respond(state["message"], state["session"]))
+            local = router.classify_locally(state["message"])
+            if local is not None:
+                state["question_type"] = local
+                return state
+            hits = regulation_agent.retrieve(state["message"])
+            regulation = regulation_agent.analyze_regulation(state["message"], hits)
+            classification = router.triage(state["message"], regulation)
+            return triaged(state, classification, regulation, hits)
+        except Exception as e:
+            state["error"] = f"Question classification failed: {str(e)}"
+            return state
+
+    async def atriage_question(state: RouterState) -> RouterState:
+        """Async variant of triage_question"""
+        try:
+            if state.get("session"):
+                return followed_up(state, await follow_up_agent.arespond(state["message"], state["session"]))
+            local = router.classify_locally(state["message"])
+            if local is not None:
+                state["question_type"] = local
+                return state
+            hits = await regulation_agent.aretrieve(state["message"])
+            regulation = regulation_agent.analyze_regulation(state["message"], hits)
+            classification = await router.atriage(state["message"], regulation)
+            return triaged(state, classification, regulation, hits)
+        except Exception as e:
+            state["error"] = f"Question classification failed: {str(e)}"
+            return state
+
+    def triaged(state: RouterState, classification: dict, regulation: str, hits: list) -> RouterState:
+        """Stores a fused classification, keeping the regulation for the regulation workflow"""
+        state["retrieved"] = {
+            "regulation_text": regulation,
+            "regulation_sources": list(dict.fromkeys(hit.chunk.source for hit in hits)),
+            "actor_analysis": classification.pop("actor_analysis"),
+        }
+        state["question_type"] = classification
+        return state
+
+    def followed_up(state: RouterState, follow_up: FollowUp) -> RouterState:
+        """
+        Classifies a follow-up question, and answers it when it is about the
+        session's regulation, keeping the session's regulation context
+        """
+        if follow_up.label == "OTHER":
+            state["question_type"] = {"type": "OTHER", "source": "session"}
+            return state
+        state["question_type"] = {"type": "REGULATION_QUESTION", "source": "session"}
+        if follow_up.label == "SAME":
+            session = state["session"]
+            state["retrieved"] = {key: session[key] for key in SESSION_KEYS}
+            state["response"] = {
+                "classification": "REGULATION_QUESTION",
+                "regulation": session["regulation_text"],
+                "actor_analysis": session["actor_analysis"],
+                "response": follow_up.answer,
+            }
+        return state
+
+    def answered(state: RouterState, result: dict) -> RouterState:
+        """
+        Stores a sub-workflow's response, whose failures are reported inside
+        the response and kept apart in workflow_error
+        """
+        state["response"] = {
+            "classification": state["question_type"]["type"],
+            **result["final_response"]
+        }
+        state["workflow_error"] = result.get("error")
+        return state
+
+    def regulated(state: RouterState, result: dict) -> RouterState:
+        """Stores the regulation workflow's response and what it produced on the way"""
+        state["retrieved"] = {key: result.get(key) for key in SESSION_KEYS}
+        return answered(state, result)
+
+    def route_question(state: RouterState) -> str:
         """
         Routes the question to appropriate processor based on classification:
         - REGULATION_QUESTION: Handled by regulation workflow
         - Other: Handled by general workflow
+        Follow-ups already answered from their session are done
         """
-        if state.get("error"):
+        if state.get("error") or state.get("response") is not None:
+            return END
+        if state["question_type"]["type"] == "REGULATION_QUESTION":
+            return "regulation"
+        return "general"
+
+    def process_regulation(state: RouterState, config: RunnableConfig) -> RouterState:
+        """Runs the regulation sub-graph for regulation questions"""
+        try:
+            result = regulation_graph.invoke(regulation_input(state["message"], state.get("deadline"), **(state.get("retrieved") or {})), config)
+            return regulated(state, result)
+        except Exception as e:
+            state["error"] = f"Request processing failed: {str(e)}"
             return state
-            
+
+    def process_general(state: RouterState, config: RunnableConfig) -> RouterState:
+        """Runs the general sub-graph for all other questions"""
         try:
-            question_type = state["question_type"]["type"]
-            
-            if question_type == "REGULATION_QUESTION":
-                workflow = create_regulation_graph()
-                result = workflow.invoke({
-                    "original_question": state["message"],
-                    "regulation_text": None,
-                    "actor_analysis": None,
-                    "flint_format": None,
-                    "final_response": None,
-                    "error": None
-                })
-            else:
-                workflow = create_general_graph()
-                result = workflow.invoke({
-                    "original_question": state["message"],
-                    "analysis": None,
-                    "final_response": None,
-                    "error": None
-                })
-            
-            state["response"] = {
-                "classification": question_type,
-                **result["final_response"]
-            }
+            result = general_graph.invoke(general_input(state["message"], state.get("deadline")), config)
+            return answered(state, result)
+        except Exception as e:
+            state["error"] = f"Request processing failed: {str(e)}"
+            return state
+
+    async def aprocess_regulation(state: RouterState, config: RunnableConfig) -> RouterState:
+        """Async variant of process_regulation"""
+        try:
+            result = await regulation_graph.ainvoke(regulation_input(state["message"], state.get("deadline"), **(state.get("retrieved") or {})), config)
+            return regulated(state, result)
+        except Exception as e:
+            state["error"] = f"Request processing failed: {str(e)}"
             return state
-            
+
+    async def aprocess_general(state: RouterState, config: RunnableConfig) -> RouterState:
+        """Async variant of process_general"""
+        try:
+            result = await general_graph.ainvoke(general_input(state["message"], state.get("deadline")), config)
+            return answered(state, result)
         except Exception as e:
             state["error"] = f"Request processing failed: {str(e)}"
             return state
@@ -87,16 +284,20 @@ def create_router_graph() -> Graph:
     # Create state graph
     workflow = StateGraph(RouterState)
     
-    # Add nodes
-    workflow.add_node("classify", classify_question)
-    workflow.add_node("process", process_request)
+    # Add nodes, each with an async variant used by ainvoke
+    if fused:
+        workflow.add_node("classify", node("router", "classify", triage_question, atriage_question))
+    else:
+        workflow.add_node("classify", node("router", "classify", classify_question, aclassify_question))
+    workflow.add_node("regulation", node("router", "regulation", process_regulation, aprocess_regulation))
+    workflow.add_node("general", node("router", "general", process_general, aprocess_general))
 
-    # Add edges
-    workflow.add_edge("classify", "process")
+    # Add edges with routing function
+    workflow.add_conditional_edges("classify", route_question, ["regulation", "general", END])
 
     # Set entry and exit
     workflow.set_entry_point("classify")
-    workflow.set_finish_point("process")
+    workflow.set_finish_point("regulation")
+    workflow.set_finish_point("general")
 
     return workflow.compile()
-
@@ -0,0 +1,151 @@
+"""
+Conversation sessions for follow-up questions.
+
+A session keeps what the regulation workflow produced for the conversation's
+regulation: its text and sources, the actor verdict and the FLINT frames. A
+follow-up about the same regulation reuses all of it, so the only LLM call
+left is the one deciding whether the follow-up is about that regulation and
+answering it from the kept regulation and frames.
+
+Sessions live in a SQLite file shared by every server process, so a
+follow-up finds its session whichever pre-forked worker it reaches. Least
+recently used sessions are evicted beyond SESSION_MAX and idle sessions
+expire after SESSION_TTL.
+"""
+
+import json
+import os
+import sqlite3
+import threading
+import time
+from dotenv import load_dotenv
+
+# Load environment variables from a .env file
+load_dotenv()
+
+# Regulation workflow results a session keeps, passed back to the workflow on follow-ups
+SESSION_KEYS = ("regulation_text", "regulation_sources", "actor_analysis", "flint_format")
+
+
+class SessionStore:
+    """
+    Bounded SQLite store of conversation sessions
+    - SESSION_STORE_PATH: SQLite file, ":memory:" keeps sessions in this process (default: .cache/sessions.sqlite)
+    - SESSION_MAX: Sessions kept, least recently used are evicted (default: 1000)
+    - SESSION_TTL: Seconds an idle session is kept (default: 1800)
+    """
+
+    def __init__(self, path: str | None = None, max_sessions: int | None = None, ttl: float | None = None):
+        self.path = path or os.getenv("SESSION_STORE_PATH", ".cache/sessions.sqlite")
+        self.max_sessions = max_sessions or int(os.getenv("SESSION_MAX", 1000))
+        self.ttl = ttl or float(os.getenv("SESSION_TTL", 1800))
+        if self.path != ":memory:":
+            os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+        self._lock = threading.Lock()
+        # Autocommit, updates open their own IMMEDIATE transaction to lock out other processes
+        self._db = sqlite3.connect(self.path, check_same_thread=False, isolation_level=None, timeout=30)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute(
+            """CREATE TABLE IF NOT EXISTS sessions (
+                id TEXT PRIMARY KEY,
+                context TEXT NOT NULL,
+                used REAL NOT NULL
+            )"""
+        )
+        self._db.execute("CREATE INDEX IF NOT EXISTS sessions_used ON sessions (used)")
+        # Counters of this process
+        self.evicted = 0
+        self.expired = 0
+        self.follow_ups = 0
+        self.reused = 0
+
+    def reopen(self) -> None:
+        """Opens a new connection in a forked worker, SQLite connections must not cross a fork"""
+        if self.path == ":memory:":
+            # Nothing to reopen, the copied database is the worker's own
+            return
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(self.path, check_same_thread=False, isolation_level=None, timeout=30)
+
+    def get(self, session_id: str) -> dict | None:
+        """
+        Returns:
+            The session's regulation context (question and SESSION_KEYS), None
+            for a new or expired session
+        """
+        now = time.time()
+        with self._lock:
+            row = self._db.execute("SELECT context, used FROM sessions WHERE id = ?", (session_id,)).fetchone()
+            if row is None:
+                return None
+            if now - row[1] > self.ttl:
+                self._db.execute("DELETE FROM sessions WHERE id = ?", (session_id,))
+                self.expired += 1
+                return None
+            self._db.execute("UPDATE sessions SET used = ? WHERE id = ?", (now, session_id))
+            self.follow_ups += 1
+        return json.loads(row[0])
+
+    def update(self, session_id: str, question: str, result: dict) -> None:
+        """
+        Keeps the regulation context of a finished router run
+        Runs without a regulation (general questions, failed extraction) leave
+        the session's context as it was
+        """
+        retrieved = result.get("retrieved") or {}
+        now = time.time()
+        with self._lock:
+            self._db.execute("BEGIN IMMEDIATE")
+            try:
+                row = self._db.execute("SELECT context FROM sessions WHERE id = ?", (session_id,)).fetchone()
+                previous = json.loads(row[0]) if row is not None else None
+                context = previous
+                if retrieved.get("regulation_text") and retrieved.get("actor_analysis") is not None:
+                    if previous is not None and previous["regulation_text"] == retrieved["regulation_text"]:
+                        # Same regulation, the question that retrieved it stays the best context
+                        self.reused += 1
+                        question = previous["question"]
+                    context = {"question": question, **{key: retrieved.get(key) for key in SESSION_KEYS}}
+                if context is not None:
+                    self._db.execute(
+                        "INSERT OR REPLACE INTO sessions (id, context, used) VALUES (?, ?, ?)",
+                        (session_id, json.dumps(context, ensure_ascii=False), now),
+                    )
+                    self.expired += self._db.execute(
+                        "DELETE FROM sessions WHERE used < ?", (now - self.ttl,)
+                    ).rowcount
+                    self.evicted += self._db.execute(
+                        "DELETE FROM sessions WHERE id IN (SELECT id FROM sessions ORDER BY used DESC LIMIT -1 OFFSET ?)",
+                        (self.max_sessions,),
+                    ).rowcount
+                self._db.execute("COMMIT")
+            except BaseException:
+                self._db.execute("ROLLBACK")
+                raise
+
+    def stats(self) -> dict:
+        """Sessions in the shared store, and the counters of this process"""
+        with self._lock:
+            sessions = self._db.execute("SELECT COUNT(*) FROM sessions").fetchone()[0]
+            return {
+                "sessions": sessions,
+                "max_sessions": self.max_sessions,
+                "follow_ups": self.follow_ups,
+                "reused": self.reused,
+                "evicted": self.evicted,
+                "expired": self.expired,
+            }
+
+
+_store: SessionStore | None = None
+_store_lock = threading.Lock()
+
+
+def get_session_store() -> SessionStore:
+    """Returns the process-wide session store"""
+    global _store
+    if _store is None:
+        with _store_lock:
+            if _store is None:
+                _store = SessionStore()
+    return _store
@@ -0,0 +1,73 @@
+"""
+Streaming execution of the router workflow.
+
+Runs the shared router graph in a background thread and turns its progress
+into a stream of events: node progress from the router and its sub-graphs,
+generated tokens from the FLINT (or general) answer, and the final response.
+"""
+
+import queue
+import threading
+from typing import Iterator
+from ..llm import caller_scope
+from .registry import get_router_graph
+from .router_workflow import create_router_state
+
+# Sub-graph node updates reported to clients, with the state keys they carry
+PROGRESS_EVENTS = {
+    "classify": ("classified", "question_type"),
+    "extract": ("regulation_retrieved", "regulation_sources"),
+    "identify": ("actors_found", "actor_analysis"),
+}
+
+
+def stream_answer(message: str) -> Iterator[dict]:
+    """
+    Answers a question as a stream of events
+    Args:
+        message: User question
+    Returns:
+        Iterator of {"event": name, "data": payload} with events
+        - classified: Question classification
+        - regulation_retrieved: Source IDs of the retrieved regulation
+        - actors_found: Actor identification verdict
+        - token: Fragment of the generated answer
+        - response: Final response, same shape as /answer
+        - error: Processing error, ends the stream
+    """
+    events: queue.Queue = queue.Queue()
+
+    def on_token(token: str) -> None:
+        events.put({"event": "token", "data": token})
+
+    def run() -> None:
+        state = create_router_state(message)
+        try:
+            # The request's LLM calls are queued fairly against other requests
+            with caller_scope():
+                for _, update in get_router_graph().stream(
+                    state,
+                    config={"configurable": {"on_token": on_token}},
+                    stream_mode="updates",
+                    subgraphs=True,
+                ):
+                    for node, value in update.items():
+                        if value is None:
+                            continue
+                        if node in PROGRESS_EVENTS and not value.get("error"):
+                            name, key = PROGRESS_EVENTS[node]
+                            events.put({"event": name, "data": value.get(key)})
+                        if node in ("classify", "regulation", "general"):
+                            state.update(value)
+            if state.get("error"):
+                events.put({"event": "error", "data": state["error"]})
+            else:
+                events.put({"event": "response", "data": state["response"]})
+        except Exception as e:
+            events.put({"event": "error", "data": f"Request processing failed: {str(e)}"})
+        finally:
+            events.put(None)
+
+    threading.Thread(target=run, daemon=True).start()
+    while (event := events.get()) is not None:
+        yield event